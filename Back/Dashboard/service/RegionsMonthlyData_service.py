@@ -6,10 +6,7 @@
 import datetime as _dt
 from typing import Any, Dict, List
 from ...database.db_connector import get_connection
-from ...orders.service.Shipment_service import load_published_rules, _build_predicates_from_rules
-
-# Sentinel для NullOrEmpty
-NULL_EMPTY_SENTINEL = "__NULL_EMPTY__"
+from ...orders.service.Shipment_service import get_published_filter
 
 
 def get_regions_monthly_data(year: int = None) -> List[Dict[str, Any]]:
@@ -36,17 +33,8 @@ def get_regions_monthly_data(year: int = None) -> List[Dict[str, Any]]:
     
     try:
         with get_connection() as conn:
-            # Загружаем опубликованные правила
-            rules = load_published_rules(conn)
-            mapped_rules: List[Dict[str, Any]] = []
-            for r in rules:
-                if str(r.get("MatchType", "")).lower() == "equals" and str(r.get("Pattern", "")) == NULL_EMPTY_SENTINEL:
-                    mapped_rules.append({**r, "MatchType": "NullOrEmpty", "Pattern": ""})
-                else:
-                    mapped_rules.append(r)
-            
-            # Строим условия фильтрации для отгрузок
-            extra_sql, extra_params = _build_predicates_from_rules(mapped_rules)
+            # Опубликованные правила: предрасчитанные флаги или скомпилированный предикат
+            extra_sql, extra_params = get_published_filter(conn)
             
             # SQL для отгрузок по месяцам с применением правил
             shipment_sql = f"""
@@ -18,7 +18,7 @@
 from datetime import date
 from typing import Any, Dict
 from ...database.db_connector import get_connection
-from ...orders.service.OrderData.OrderStatistics_service import get_statistics_data
+from ...orders.service.SalePlan.SalePlan_Cube_service import get_plan_fact_cube, select_cells
 
 
 def get_dashboard_saleplan_ytd(user_id: int, base_statistics_data: Dict[str, Any] = None) -> Dict[str, Any]:
@@ -29,7 +29,7 @@ def get_dashboard_saleplan_ytd(user_id: int, base_statistics_data: Dict[str, Any
     
     Args:
         user_id: ID пользователя для применения фильтров отчета
-        base_statistics_data: Предзагруженные данные из get_statistics_data (опционально, для оптимизации)
+        base_statistics_data: Не используется (факт берется из куба); оставлен для совместимости вызовов
     
     Returns:
         Словарь с YTD данными по рынкам
@@ -73,75 +73,19 @@ def get_dashboard_saleplan_ytd(user_id: int, base_statistics_data: Dict[str, Any
         target_year = target_year_calc
         target_month = target_month_calc
     
+    # 1-2. План (активная версия) и факт (фильтры отчета ID=1) из агрегированного куба:
+    # YTD = target_year, месяцы <= target_month (с учетом Lead Time)
     with get_connection() as conn:
-        cur = conn.cursor()
-        
-        # 1. Получаем план продаж (активная версия, YTD)
-        # target_month уже вычислен выше с учетом Lead Time
-        cur.execute("""
-            SELECT 
-                Market,
-                SUM(QTY) AS YTD_Plan
-            FROM Orders.vw_SalesPlan_Details
-            WHERE YearNum = ? 
-              AND MonthNum <= ?
-              AND VersionID IN (
-                  SELECT VersionID 
-                  FROM Orders.SalesPlan_Versions 
-                  WHERE MinYear = ? AND IsActive = 1
-              )
-            GROUP BY Market
-        """, (target_year, target_month, target_year))
-        
-        plan_by_market = {}
-        for row in cur.fetchall():
-            market = row[0] or "Unknown"
-            ytd_plan = float(row[1] or 0)
-            plan_by_market[market] = ytd_plan
-    
-    # 2. Получаем факт размещения с применением ВСЕХ фильтров из отчета ID=1
-    # Используем переданные данные или получаем сами (для обратной совместимости)
-    if base_statistics_data is not None:
-        result = base_statistics_data
-    else:
-        result = get_statistics_data(user_id, additional_filters=None)
-    
-    # Фильтруем и группируем по Market для YTD
+        plan_cells, fact_cells = get_plan_fact_cube(conn)
+
+    plan_by_market = {}
+    for (_, _, market, _), qty in select_cells(plan_cells, target_year, target_month):
+        market = market or "Unknown"
+        plan_by_market[market] = plan_by_market.get(market, 0) + qty
+
     fact_by_market = {}
-    
-    for row in result.get('data', []):
-        market = row.get('Market', 'Unknown')
-        
-        # Проверяем дату для YTD (только текущий год, месяц <= текущего)
-        aggregated_date = row.get('AggregatedShipmentDate')
-        if not aggregated_date:
-            continue
-        
-        # Парсим дату (формат DD.MM.YYYY)
-        try:
-            if isinstance(aggregated_date, str):
-                day, month, year = aggregated_date.split('.')
-                date_year = int(year)
-                date_month = int(month)
-            else:
-                # Если это datetime объект
-                date_year = aggregated_date.year
-                date_month = aggregated_date.month
-            
-            # Фильтр YTD: только target_year и месяц <= target_month (с учетом Lead Time)
-            if date_year != target_year or date_month > target_month:
-                continue
-                
-        except Exception:
-            continue
-        
-        # Суммируем ToProduce_QTY
-        to_produce = float(row.get('ToProduce_QTY', 0) or 0)
-        
-        if market in fact_by_market:
-            fact_by_market[market] += to_produce
-        else:
-            fact_by_market[market] = to_produce
+    for (_, _, market, _), qty in select_cells(fact_cells, target_year, target_month):
+        fact_by_market[market] = fact_by_market.get(market, 0) + qty
     
     # 3. Объединяем план и факт
     all_markets = set(plan_by_market.keys()) | set(fact_by_market.keys())
@@ -8,6 +8,8 @@ Routes:
   POST /api/migration/restart/<script_id>    — request restart
   POST /api/migration/stop/<script_id>       — request stop
   POST /api/migration/run-now/<script_id>    — request immediate run (scheduled scripts)
+  GET  /api/migration/metrics                — per-script cycle timings (?hours=1)
+  GET  /api/migration/metrics/<script_id>    — cycle time series (?hours=24&bucket=0)
 """
 import traceback
 from functools import wraps
@@ -16,6 +18,8 @@ from flask import Blueprint, jsonify, request
 from Back.Users.service.auth_service import verify_jwt_token
 from Back.Migration.service.migration_service import (
     get_all_statuses,
+    get_cycle_metrics,
+    get_metrics_summary,
     get_script_logs,
     request_restart,
     request_stop,
@@ -24,6 +28,14 @@ from Back.Migration.service.migration_service import (
 
 migration_bp = Blueprint("migration", __name__, url_prefix="/api/migration")
 
+# Metrics query limits: CycleMetrics keeps 30 days; buckets up to one day
+METRICS_MAX_HOURS  = 30 * 24
+METRICS_MAX_BUCKET = 24 * 60
+
+
+def _clamp(value: int, low: int, high: int) -> int:
+    return max(low, min(value, high))
+
 
 def _require_admin(f):
     @wraps(f)
@@ -95,5 +107,27 @@ def run_now_script(current_user, script_id):
         return jsonify({"error": traceback.format_exc()}), 500
 
 
+@migration_bp.route("/metrics", methods=["GET"])
+@_require_admin
+def metrics_summary(current_user):
+    try:
+        hours = _clamp(int(request.args.get("hours", 1)), 1, METRICS_MAX_HOURS)
+        return jsonify(get_metrics_summary(hours)), 200
+    except Exception:
+        return jsonify({"error": traceback.format_exc()}), 500
+
+
+@migration_bp.route("/metrics/<script_id>", methods=["GET"])
+@_require_admin
+def metrics_series(current_user, script_id):
+    try:
+        hours  = _clamp(int(request.args.get("hours", 24)), 1, METRICS_MAX_HOURS)
+        bucket = _clamp(int(request.args.get("bucket", 0)), 0, METRICS_MAX_BUCKET)
+        data = get_cycle_metrics(script_id, hours, bucket)
+        return jsonify({"script_id": script_id, "points": data}), 200
+    except Exception:
+        return jsonify({"error": traceback.format_exc()}), 500
+
+
 def init_app(app):
     app.register_blueprint(migration_bp)
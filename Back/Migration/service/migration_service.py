@@ -136,8 +136,142 @@ def get_script_logs(script_id: str, lines: int = 100) -> list[str]:
         return [f"Error reading log: {e}"]
 
 
+_PHASE_COLUMNS = {
+    "source_query_ms":    "SourceQueryMs",
+    "transform_ms":       "TransformMs",
+    "staging_insert_ms":  "StagingInsertMs",
+    "applock_wait_ms":    "ApplockWaitMs",
+    "snapshot_switch_ms": "SnapshotSwitchMs",
+    "refresh_ms":         "RefreshMs",
+    "queue_wait_ms":      "QueueWaitMs",
+}
+
+
+def get_cycle_metrics(script_id: str, hours: int = 24, bucket_minutes: int = 0) -> list[dict]:
+    """
+    Time series from Migration.CycleMetrics for one script (or 'refresh:<id>').
+    bucket_minutes = 0 → one point per cycle; otherwise averages per bucket
+    (durations), sums (rows, bytes) and the error count.
+    """
+    conn = _get_conn()
+    try:
+        cur = conn.cursor()
+        if bucket_minutes > 0:
+            phases = ", ".join(f"AVG({c}) AS {c}" for c in _PHASE_COLUMNS.values())
+            cur.execute(
+                f"""
+                SELECT
+                    b.Bucket,
+                    COUNT(*), SUM(CASE WHEN Status = 'error' THEN 1 ELSE 0 END),
+                    AVG(DurationMs), MAX(DurationMs),
+                    SUM(Records), SUM(RowsFetched), SUM(BytesFetched),
+                    {phases}
+                FROM Migration.CycleMetrics
+                CROSS APPLY (
+                    SELECT DATEADD(MINUTE, DATEDIFF(MINUTE, 0, StartedAt) / ? * ?, 0) AS Bucket
+                ) AS b
+                WHERE ScriptID = ? AND StartedAt >= DATEADD(HOUR, -?, SYSDATETIME())
+                GROUP BY b.Bucket
+                ORDER BY b.Bucket
+                """,
+                (bucket_minutes, bucket_minutes, script_id, hours),
+            )
+            return [
+                {
+                    "time":            _fmt(r[0]),
+                    "cycles":          r[1],
+                    "errors":          r[2],
+                    "duration_ms":     r[3],
+                    "max_duration_ms": r[4],
+                    "records":         r[5],
+                    "rows_fetched":    r[6],
+                    "bytes_fetched":   r[7],
+                    **dict(zip(_PHASE_COLUMNS, r[8:])),
+                }
+                for r in cur.fetchall()
+            ]
+
+        cur.execute(
+            f"""
+            SELECT StartedAt, CycleNo, Mode, Status, DurationMs,
+                   Records, RowsFetched, BytesFetched,
+                   {", ".join(_PHASE_COLUMNS.values())}
+            FROM Migration.CycleMetrics
+            WHERE ScriptID = ? AND StartedAt >= DATEADD(HOUR, -?, SYSDATETIME())
+            ORDER BY StartedAt
+            """,
+            (script_id, hours),
+        )
+        return [
+            {
+                "time":          _fmt(r[0]),
+                "cycle_no":      r[1],
+                "mode":          r[2],
+                "status":        r[3],
+                "duration_ms":   r[4],
+                "records":       r[5],
+                "rows_fetched":  r[6],
+                "bytes_fetched": r[7],
+                **dict(zip(_PHASE_COLUMNS, r[8:])),
+            }
+            for r in cur.fetchall()
+        ]
+    finally:
+        conn.close()
+
+
+def get_metrics_summary(hours: int = 1) -> list[dict]:
+    """Per-script averages over the last N hours (slowest scripts first)."""
+    conn = _get_conn()
+    try:
+        cur = conn.cursor()
+        phases = ", ".join(f"AVG({c})" for c in _PHASE_COLUMNS.values())
+        cur.execute(
+            f"""
+            SELECT ScriptID, COUNT(*), SUM(CASE WHEN Status = 'error' THEN 1 ELSE 0 END),
+                   AVG(DurationMs), MAX(DurationMs), SUM(RowsFetched), SUM(BytesFetched),
+                   MAX(StartedAt),
+                   {phases}
+            FROM Migration.CycleMetrics
+            WHERE StartedAt >= DATEADD(HOUR, -?, SYSDATETIME())
+            GROUP BY ScriptID
+            ORDER BY AVG(DurationMs) DESC
+            """,
+            (hours,),
+        )
+        return [
+            {
+                "script_id":       r[0],
+                "cycles":          r[1],
+                "errors":          r[2],
+                "avg_duration_ms": r[3],
+                "max_duration_ms": r[4],
+                "rows_fetched":    r[5],
+                "bytes_fetched":   r[6],
+                "last_cycle":      _fmt(r[7]),
+                **{f"avg_{k}": v for k, v in zip(_PHASE_COLUMNS, r[8:])},
+            }
+            for r in cur.fetchall()
+        ]
+    finally:
+        conn.close()
+
+
+def _notify(script_id: str, command: str) -> bool:
+    """Deliver the command over the local control channel (core/control.py)."""
+    try:
+        from core.control import notify
+    except ImportError:
+        return False
+    return notify(script_id, command)
+
+
 def _set_command(script_id: str, command: str) -> dict:
-    """Generic helper: write a command flag into Migration.ScriptStatus."""
+    """
+    Generic helper: write a command flag into Migration.ScriptStatus and
+    deliver it to runner/scheduler at once.  If the channel is unreachable,
+    the flag is picked up by their fallback DB check.
+    """
     try:
         conn = _get_conn()
         cur  = conn.cursor()
@@ -155,7 +289,13 @@ def _set_command(script_id: str, command: str) -> dict:
         conn.close()
         if affected == 0:
             return {"success": False, "error": f"Script '{script_id}' not found in ScriptStatus table"}
-        return {"success": True, "message": f"{command} requested for {script_id}"}
+        delivered = _notify(script_id, command)
+        return {
+            "success":   True,
+            "delivered": delivered,
+            "message":   f"{command} requested for {script_id}"
+                         + ("" if delivered else " (will be picked up on the next status check)"),
+        }
     except Exception as e:
         return {"success": False, "error": str(e)}
 
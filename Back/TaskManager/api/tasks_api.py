@@ -1,7 +1,7 @@
 """
 Flask API: управление задачами Task Manager
 """
-from flask import Blueprint, jsonify, request, send_file
+from flask import Blueprint, jsonify, request
 from ..service.tasks_service import TasksService
 from ..service.custom_fields_service import CustomFieldsService
 from Back.Users.service.auth_service import verify_jwt_token
@@ -230,6 +230,7 @@ def export_project_tasks(project_id):
             return jsonify({"success": False, "error": "Не авторизован"}), 401
 
         from ..service.export_service import export_tasks_to_excel
+        from Back.database.export_engine import XLSX_MIMETYPE, file_response
 
         lang = request.args.get('lang', 'ru')
 
@@ -276,14 +277,9 @@ def export_project_tasks(project_id):
         cf_defs = CustomFieldsService.get_project_fields(project_id, user_data["user_id"], active_only=True)
         cf_values = CustomFieldsService.get_all_task_values_for_project(project_id)
 
-        buf = export_tasks_to_excel(all_tasks, cf_defs, cf_values, lang=lang)
+        chunks = export_tasks_to_excel(all_tasks, cf_defs, cf_values, lang=lang)
 
-        return send_file(
-            buf,
-            as_attachment=True,
-            download_name=f"tasks_project_{project_id}.xlsx",
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+        return file_response(chunks, f"tasks_project_{project_id}.xlsx", XLSX_MIMETYPE)
     except PermissionError as e:
         return jsonify({"success": False, "error": str(e)}), 403
     except Exception as e:
@@ -1,12 +1,9 @@
 """
 Сервис экспорта задач проекта в Excel (.xlsx)
 """
-from io import BytesIO
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
 
-import openpyxl
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+from Back.database.export_engine import xlsx_chunks
 
 
 # ── Переводы заголовков ─────────────────────────────────────────────────────
@@ -120,14 +117,38 @@ def _task_values(task: Dict, lang: str) -> List[Any]:
     ]
 
 
+def _iter_export_rows(
+    tasks: List[Dict],
+    cf_defs: List[Dict],
+    cf_values: Dict,
+    lang: str,
+) -> Iterator[List[Any]]:
+    """Строки выгрузки (только корневые задачи) — по одной, без сборки листа в памяти."""
+    std_len = len(HEADERS_I18N[lang])
+    for task in tasks:
+        if task.get('parent_task_id'):
+            continue
+        task_id = task['id']
+        cf_row_list = _build_cf_rows_for_task(task_id, cf_defs, cf_values)
+
+        yield _task_values(task, lang) + list(cf_row_list[0].values())
+
+        # Дополнительные строки если CF multi-row
+        for cf_row in cf_row_list[1:]:
+            extra = [''] * std_len + list(cf_row.values())
+            extra[0] = task_id  # оставляем ID
+            yield extra
+
+
 def export_tasks_to_excel(
     tasks: List[Dict],
     cf_defs: List[Dict],
     cf_values: Dict,
     lang: str = 'ru',
-) -> BytesIO:
+) -> Iterator[bytes]:
     """
-    Строит .xlsx файл и возвращает его как BytesIO.
+    Строит .xlsx файл (openpyxl write-only) и возвращает его кусками
+    для потоковой отдачи клиенту.
 
     tasks     — список задач проекта (только корневые)
     cf_defs   — список определений кастомных полей проекта
@@ -136,69 +157,16 @@ def export_tasks_to_excel(
     """
     lang = lang if lang in HEADERS_I18N else 'en'
 
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = SHEET_TITLE.get(lang, 'Tasks')
-
-    # ── Заголовки ──────────────────────────────────────────────────────────────
-    header_font = Font(bold=True, color='FFFFFF', size=10)
-    header_fill = PatternFill(fill_type='solid', fgColor='3B5BDB')
-    header_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
-    thin_border = Border(
-        left=Side(style='thin', color='000000'),
-        right=Side(style='thin', color='000000'),
-        top=Side(style='thin', color='000000'),
-        bottom=Side(style='thin', color='000000'),
-    )
-
     cf_headers = [f['field_name'] for f in cf_defs]
     all_headers = HEADERS_I18N[lang] + cf_headers
-    ws.append(all_headers)
-
-    for cell in ws[1]:
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_align
-        cell.border = thin_border
-    ws.row_dimensions[1].height = 24
-
-    # ── Стили строк ────────────────────────────────────────────────────────────
-    center = Alignment(horizontal='center', vertical='center')
-    wrap_left = Alignment(horizontal='left', vertical='center', wrap_text=True)
-
-    def write_row(values: List[Any]):
-        ws.append(values)
-        r = ws.max_row
-        for col_idx, cell in enumerate(ws[r], start=1):
-            cell.alignment = center if col_idx == 1 else wrap_left
-            cell.border = thin_border
-        ws.row_dimensions[r].height = 30.75
-
-    # ── Запись строк (только корневые задачи) ──────────────────────────────────
-    root_tasks = [t for t in tasks if not t.get('parent_task_id')]
-
-    for task in root_tasks:
-        task_id = task['id']
-        cf_row_list = _build_cf_rows_for_task(task_id, cf_defs, cf_values)
-        std = _task_values(task, lang)
-
-        write_row(std + list(cf_row_list[0].values()))
-
-        # Дополнительные строки если CF multi-row
-        for cf_row in cf_row_list[1:]:
-            extra = [''] * len(HEADERS_I18N[lang]) + list(cf_row.values())
-            extra[0] = task_id  # оставляем ID
-            write_row(extra)
-
-    # ── Ширина колонок ─────────────────────────────────────────────────────────
-    for col_idx in range(1, ws.max_column + 1):
-        width = COL_WIDTHS[col_idx - 1] if col_idx <= len(COL_WIDTHS) else 20
-        ws.column_dimensions[get_column_letter(col_idx)].width = width
-
-    ws.freeze_panes = 'A2'
-    ws.auto_filter.ref = f"A1:{get_column_letter(ws.max_column)}{ws.max_row}"
-
-    buf = BytesIO()
-    wb.save(buf)
-    buf.seek(0)
-    return buf
+    col_styles = ['export_center'] + ['export_wrap'] * (len(all_headers) - 1)
+
+    return xlsx_chunks(
+        all_headers,
+        _iter_export_rows(tasks, cf_defs, cf_values, lang),
+        sheet_title=SHEET_TITLE.get(lang, 'Tasks'),
+        col_widths=COL_WIDTHS + [20] * len(cf_headers),
+        col_styles=col_styles,
+        row_height=30.75,
+        header_height=24,
+    )
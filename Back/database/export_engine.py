@@ -0,0 +1,267 @@
+"""
+Общий движок выгрузки отчётов в CSV / XLSX.
+
+Строки читаются из курсора порциями (fetchmany) и сразу пишутся в файл,
+поэтому память не зависит от размера выгрузки:
+  - CSV собирается в небольшой буфер и отдаётся клиенту кусками;
+  - XLSX пишется через openpyxl в режиме write_only (строки уходят во
+    временный XML на диске), стили ячеек — заранее зарегистрированные
+    NamedStyle, а не отдельные Font/Fill на каждую ячейку.
+
+Пример использования в API:
+
+    columns, rows = stream_query(sql, params)
+    chunks = xlsx_chunks(columns, rows, col_styles=[...])
+    return file_response(chunks, 'report.xlsx', XLSX_MIMETYPE)
+"""
+import csv
+import io
+import tempfile
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import openpyxl
+from flask import Response
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+from .db_connector import get_connection
+
+
+FETCH_BATCH = 5000          # строк за один fetchmany
+CHUNK_SIZE = 64 * 1024      # размер куска, отдаваемого клиенту
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+CSV_MIMETYPE = 'text/csv; charset=utf-8'
+
+EXPORT_FORMATS = ('xlsx', 'csv')
+
+
+# ── Именованные стили ────────────────────────────────────────────────────────
+_THIN = Side(style='thin', color='000000')
+_BORDER = Border(left=_THIN, right=_THIN, top=_THIN, bottom=_THIN)
+
+STYLE_SPECS: Dict[str, Dict[str, Any]] = {
+    'export_header': {
+        'font': Font(bold=True, color='FFFFFF', size=10),
+        'fill': PatternFill(fill_type='solid', fgColor='3B5BDB'),
+        'alignment': Alignment(horizontal='center', vertical='center', wrap_text=True),
+        'border': _BORDER,
+    },
+    'export_text': {
+        'alignment': Alignment(horizontal='left', vertical='center'),
+        'border': _BORDER,
+    },
+    'export_wrap': {
+        'alignment': Alignment(horizontal='left', vertical='center', wrap_text=True),
+        'border': _BORDER,
+    },
+    'export_center': {
+        'alignment': Alignment(horizontal='center', vertical='center'),
+        'border': _BORDER,
+    },
+    'export_int': {
+        'alignment': Alignment(horizontal='right', vertical='center'),
+        'border': _BORDER,
+        'number_format': '#,##0',
+    },
+    'export_number': {
+        'alignment': Alignment(horizontal='right', vertical='center'),
+        'border': _BORDER,
+        'number_format': '#,##0.00',
+    },
+    'export_date': {
+        'alignment': Alignment(horizontal='center', vertical='center'),
+        'border': _BORDER,
+        'number_format': 'DD.MM.YYYY',
+    },
+}
+
+# Типы, которые openpyxl пишет без преобразования
+_NATIVE_TYPES = (int, float, Decimal, datetime, date, time, bool)
+
+
+def stream_query(sql: str, params: Sequence[Any] = (),
+                 batch_size: int = FETCH_BATCH) -> Tuple[List[str], Iterator[tuple]]:
+    """
+    Выполняет запрос и возвращает (колонки, генератор строк).
+
+    Запрос выполняется сразу, поэтому ошибки SQL всплывают до начала
+    отдачи файла. Соединение закрывается, когда генератор дочитан
+    (или закрыт при обрыве выгрузки клиентом).
+    """
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        columns = [col[0] for col in cursor.description]
+    except Exception:
+        conn.close()
+        raise
+
+    def rows() -> Iterator[tuple]:
+        try:
+            yield from iter_cursor(cursor, batch_size)
+        finally:
+            conn.close()
+
+    return columns, rows()
+
+
+def iter_cursor(cursor, batch_size: int = FETCH_BATCH) -> Iterator[tuple]:
+    """Читает уже выполненный курсор порциями по batch_size строк."""
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            return
+        for row in batch:
+            yield tuple(row)
+
+
+# ── CSV ──────────────────────────────────────────────────────────────────────
+
+def csv_chunks(headers: Sequence[str], rows: Iterable[Sequence[Any]],
+               chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    CSV (UTF-8 с BOM, чтобы Excel корректно открыл кириллицу/китайский)
+    кусками по ~chunk_size байт.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write('\ufeff')
+    writer.writerow(headers)
+    for row in rows:
+        writer.writerow(row)
+        if buf.tell() >= chunk_size:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode('utf-8')
+
+
+# ── XLSX ─────────────────────────────────────────────────────────────────────
+
+def _register_styles(wb, extra_styles: Optional[Dict[str, Dict[str, Any]]]) -> None:
+    specs = {**STYLE_SPECS, **(extra_styles or {})}
+    for name, spec in specs.items():
+        wb.add_named_style(NamedStyle(name=name, **spec))
+
+
+def _xlsx_value(value: Any) -> Any:
+    if value is None or isinstance(value, _NATIVE_TYPES):
+        return value
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return str(value)
+
+
+def xlsx_chunks(
+    headers: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    sheet_title: str = 'Data',
+    col_widths: Optional[Sequence[float]] = None,
+    col_styles: Optional[Sequence[Optional[str]]] = None,
+    header_style: str = 'export_header',
+    row_height: Optional[float] = None,
+    header_height: Optional[float] = None,
+    extra_styles: Optional[Dict[str, Dict[str, Any]]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """
+    Потоковая выгрузка в .xlsx (openpyxl write_only).
+
+    col_styles   — имя NamedStyle для каждой колонки (None — без стиля);
+    row_height   — высота строк данных (задаётся высотой листа по умолчанию,
+                   чтобы не хранить размеры каждой строки);
+    header_height — высота строки заголовка (иначе — та же row_height);
+    extra_styles — дополнительные стили {name: kwargs NamedStyle}, например
+                   свой цвет заголовка.
+    """
+    wb = openpyxl.Workbook(write_only=True)
+    _register_styles(wb, extra_styles)
+    ws = wb.create_sheet(title=sheet_title)
+
+    n_cols = len(headers)
+    for idx in range(1, n_cols + 1):
+        width = col_widths[idx - 1] if col_widths and idx <= len(col_widths) else 15
+        ws.column_dimensions[get_column_letter(idx)].width = width
+    if row_height:
+        ws.sheet_format.defaultRowHeight = row_height
+        ws.sheet_format.customHeight = True
+    if header_height:
+        ws.row_dimensions[1].height = header_height
+    ws.freeze_panes = 'A2'
+
+    header_cells = []
+    for title in headers:
+        cell = WriteOnlyCell(ws, value=_xlsx_value(title))
+        cell.style = header_style
+        header_cells.append(cell)
+    ws.append(header_cells)
+
+    # Стиль вычисляется один раз на колонку; ячейки получают готовый StyleArray
+    styles = list(col_styles or [])
+    styles += [None] * (n_cols - len(styles))
+    prototypes = []
+    for name in styles:
+        if name is None:
+            prototypes.append(None)
+            continue
+        proto = WriteOnlyCell(ws)
+        proto.style = name
+        prototypes.append(proto._style)
+
+    row_count = 1
+    for row in rows:
+        out = []
+        for value, style in zip(row, prototypes):
+            cell = WriteOnlyCell(ws, value=_xlsx_value(value))
+            if style is not None:
+                cell._style = style
+            out.append(cell)
+        ws.append(out)
+        row_count += 1
+
+    if n_cols:
+        ws.auto_filter.ref = f"A1:{get_column_letter(n_cols)}{row_count}"
+
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def export_chunks(fmt: str, headers: Sequence[str], rows: Iterable[Sequence[Any]],
+                  **xlsx_options: Any) -> Iterator[bytes]:
+    """Выбор писателя по формату ('xlsx' | 'csv')."""
+    if fmt == 'csv':
+        return csv_chunks(headers, rows)
+    if fmt == 'xlsx':
+        return xlsx_chunks(headers, rows, **xlsx_options)
+    raise ValueError(f"Неподдерживаемый формат выгрузки: {fmt}")
+
+
+def export_mimetype(fmt: str) -> str:
+    return CSV_MIMETYPE if fmt == 'csv' else XLSX_MIMETYPE
+
+
+def file_response(chunks: Iterable[bytes], filename: str, mimetype: str) -> Response:
+    """Flask-ответ, отдающий файл клиенту кусками по мере формирования."""
+    response = Response(chunks, mimetype=mimetype, direct_passthrough=True)
+    response.headers['Content-Disposition'] = (
+        f"attachment; filename*=UTF-8''{quote(filename)}"
+    )
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
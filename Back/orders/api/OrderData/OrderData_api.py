@@ -10,8 +10,10 @@ from ...service.OrderData.OrderData_service import (
     update_report,
     delete_report,
     execute_report,
+    export_report,
     get_available_fields
 )
+from Back.database.export_engine import EXPORT_FORMATS, export_mimetype, file_response
 
 bp = Blueprint("order_data_reports", __name__, url_prefix="/api/orders/reports")
 
@@ -236,6 +238,44 @@ def execute(report_id: int):
         return jsonify({"success": False, "error": f"Ошибка выполнения отчета: {str(e)}"}), 500
 
 
+@bp.route("/<int:report_id>/export", methods=["GET"])
+def export(report_id: int):
+    """
+    GET /api/orders/reports/{report_id}/export?format=xlsx|csv
+    
+    Headers:
+        Authorization: Bearer <token>
+    
+    Response:
+        Файл отчета, отдается потоком по мере чтения строк из БД
+    """
+    try:
+        auth_header = request.headers.get('Authorization')
+        
+        if not auth_header or not auth_header.startswith('Bearer '):
+            return jsonify({"success": False, "error": "Токен не предоставлен"}), 401
+        
+        token = auth_header.split(' ')[1]
+        user_data = verify_jwt_token(token)
+        
+        if not user_data:
+            return jsonify({"success": False, "error": "Невалидный токен"}), 401
+        
+        fmt = request.args.get('format', 'xlsx')
+        if fmt not in EXPORT_FORMATS:
+            return jsonify({"success": False, "error": f"Неподдерживаемый формат: {fmt}"}), 400
+        
+        filename, chunks = export_report(report_id, user_data['user_id'], fmt)
+        return file_response(chunks, filename, export_mimetype(fmt))
+        
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 404
+    except PermissionError as e:
+        return jsonify({"success": False, "error": str(e)}), 403
+    except Exception as e:
+        return jsonify({"success": False, "error": f"Ошибка выгрузки отчета: {str(e)}"}), 500
+
+
 @bp.route("/<int:report_id>", methods=["GET"])
 def get_report(report_id: int):
     """
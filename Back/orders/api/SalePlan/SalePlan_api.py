@@ -2,9 +2,14 @@
 API для получения данных Sale Plan
 """
 from flask import Blueprint, jsonify, request
+from ....database.export_engine import EXPORT_FORMATS, export_mimetype, file_response
 from ...service.SalePlan.SalePlan_Upload_service import get_versions
 from ...service.SalePlan.SalePlan_service import set_active_version, delete_version
-from ...service.SalePlan.SalePlan_Analytics_service import get_version_analytics, get_version_export_data
+from ...service.SalePlan.SalePlan_Analytics_service import (
+    get_version_analytics,
+    get_version_export_data,
+    stream_version_export,
+)
 from ...service.SalePlan.SalePlan_Data_service import get_active_version_data
 from ...service.SalePlan.SalePlan_PlanVsFact_service import get_plan_vs_fact_data
 
@@ -71,8 +76,21 @@ def get_analytics_endpoint(version_id: int):
 
 @bp.route('/versions/<int:version_id>/export', methods=['GET'])
 def get_export_endpoint(version_id: int):
-    """Получить полные данные версии для экспорта"""
+    """
+    Получить полные данные версии для экспорта.
+    ?format=xlsx|csv — сразу отдать файл потоком (без JSON на фронтенд).
+    """
     try:
+        fmt = request.args.get('format')
+        if fmt:
+            if fmt not in EXPORT_FORMATS:
+                return jsonify({
+                    'success': False,
+                    'error': f'Неподдерживаемый формат: {fmt}',
+                }), 400
+            filename, chunks = stream_version_export(version_id, fmt)
+            return file_response(chunks, filename, export_mimetype(fmt))
+
         data = get_version_export_data(version_id)
         return jsonify({
             'success': True,
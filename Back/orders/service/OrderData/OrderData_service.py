@@ -3,9 +3,10 @@
 """
 
 import json
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from decimal import Decimal
 from Back.database.db_connector import get_connection
+from Back.database.export_engine import export_chunks, stream_query
 
 
 def get_user_reports(user_id: int) -> List[Dict[str, Any]]:
@@ -288,6 +289,38 @@ def delete_report(report_id: int, user_id: int, is_admin: bool = False) -> bool:
         return True
 
 
+def _load_report_query(cursor, report_id: int, user_id: int):
+    """
+    Загружает настройки отчета, проверяет доступ и генерирует SQL.
+    
+    Returns:
+        (строка отчета, SQL запрос, фильтры)
+    """
+    get_sql = """
+        SELECT ReportID, ReportName, SourceTable, SelectedFields, Filters, Grouping, IsTemplate, UserID
+        FROM Users.UserReports
+        WHERE ReportID = ?
+    """
+    cursor.execute(get_sql, (report_id,))
+    row = cursor.fetchone()
+    
+    if not row:
+        raise ValueError("Отчет не найден")
+    
+    # Проверяем доступ (стандартный отчет или свой личный)
+    if not row.IsTemplate and row.UserID != user_id:
+        raise PermissionError("Нельзя выполнить чужой отчет")
+    
+    # Парсим настройки
+    selected_fields = json.loads(row.SelectedFields) if row.SelectedFields else []
+    filters = json.loads(row.Filters) if row.Filters else {}
+    grouping = json.loads(row.Grouping) if row.Grouping else None
+    
+    # Генерируем SQL запрос
+    sql_query = build_report_query(row.SourceTable, selected_fields, filters, grouping)
+    return row, sql_query, filters
+
+
 def execute_report(report_id: int, user_id: int) -> Dict[str, Any]:
     """
     Выполняет отчет - генерирует SQL и возвращает данные.
@@ -299,32 +332,9 @@ def execute_report(report_id: int, user_id: int) -> Dict[str, Any]:
     Returns:
         Данные отчета
     """
-    # Получаем отчет
-    get_sql = """
-        SELECT ReportID, ReportName, SourceTable, SelectedFields, Filters, Grouping, IsTemplate, UserID
-        FROM Users.UserReports
-        WHERE ReportID = ?
-    """
-    
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(get_sql, (report_id,))
-        row = cursor.fetchone()
-        
-        if not row:
-            raise ValueError("Отчет не найден")
-        
-        # Проверяем доступ (стандартный отчет или свой личный)
-        if not row.IsTemplate and row.UserID != user_id:
-            raise PermissionError("Нельзя выполнить чужой отчет")
-        
-        # Парсим настройки
-        selected_fields = json.loads(row.SelectedFields) if row.SelectedFields else []
-        filters = json.loads(row.Filters) if row.Filters else {}
-        grouping = json.loads(row.Grouping) if row.Grouping else None
-        
-        # Генерируем SQL запрос
-        sql_query = build_report_query(row.SourceTable, selected_fields, filters, grouping)
+        row, sql_query, filters = _load_report_query(cursor, report_id, user_id)
         
         # Логируем SQL для отладки
         print(f"=== EXECUTING REPORT SQL ===")
@@ -381,6 +391,30 @@ def execute_report(report_id: int, user_id: int) -> Dict[str, Any]:
         }
 
 
+def export_report(report_id: int, user_id: int, fmt: str) -> Tuple[str, Iterator[bytes]]:
+    """
+    Потоковая выгрузка отчета в файл (xlsx | csv).
+    
+    В отличие от execute_report строки не собираются в список словарей:
+    они читаются из курсора порциями и сразу пишутся в файл, поэтому
+    выгрузка сотен тысяч строк идет в ограниченной памяти.
+    
+    Returns:
+        (имя файла, генератор кусков файла)
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        _, sql_query, _ = _load_report_query(cursor, report_id, user_id)
+    
+    columns, rows = stream_query(sql_query)
+    chunks = export_chunks(
+        fmt, columns, rows,
+        sheet_title='Report',
+        col_widths=[18] * len(columns),
+    )
+    return f"report_{report_id}.{fmt}", chunks
+
+
 def build_report_query(source_table: str, selected_fields: List[str], filters: Any, grouping: Optional[Dict[str, Any]] = None) -> str:
     """
     Генерирует SQL запрос на основе выбранных полей, фильтров и группировок.
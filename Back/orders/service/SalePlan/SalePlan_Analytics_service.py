@@ -1,8 +1,34 @@
 """
 Service для получения аналитики по версии Sale Plan
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Tuple
+from openpyxl.styles import PatternFill
 from ....database.db_connector import get_connection
+from ....database.export_engine import STYLE_SPECS, export_chunks, stream_query
+
+EXPORT_SQL = """
+    SELECT 
+        YearNum,
+        MonthNum,
+        Market,
+        Article_number,
+        Name,
+        QTY,
+        LargeGroup
+    FROM Orders.vw_SalesPlan_Details
+    WHERE VersionID = ?
+    ORDER BY YearNum, MonthNum, Market, Article_number
+"""
+
+EXPORT_HEADERS = ['Year', 'Month', 'Market', 'Article_number', 'Name', 'QTY', 'LargeGroup']
+EXPORT_COL_WIDTHS = [8, 8, 18, 18, 35, 12, 20]
+EXPORT_COL_STYLES = ['export_center', 'export_center', 'export_text', 'export_text',
+                     'export_text', 'export_int', 'export_text']
+# Тот же заголовок, что и в выгрузке на фронтенде (тёмно-синий)
+SALEPLAN_HEADER_STYLE = {
+    **STYLE_SPECS['export_header'],
+    'fill': PatternFill(fill_type='solid', fgColor='002060'),
+}
 
 
 def get_version_analytics(version_id: int) -> Dict[str, Any]:
@@ -80,19 +106,7 @@ def get_version_export_data(version_id: int) -> List[Dict[str, Any]]:
         with get_connection() as conn:
             cur = conn.cursor()
             
-            cur.execute("""
-                SELECT 
-                    YearNum,
-                    MonthNum,
-                    Market,
-                    Article_number,
-                    Name,
-                    QTY,
-                    LargeGroup
-                FROM Orders.vw_SalesPlan_Details
-                WHERE VersionID = ?
-                ORDER BY YearNum, MonthNum, Market, Article_number
-            """, (version_id,))
+            cur.execute(EXPORT_SQL, (version_id,))
             
             columns = [col[0] for col in cur.description]
             rows = cur.fetchall()
@@ -102,3 +116,20 @@ def get_version_export_data(version_id: int) -> List[Dict[str, Any]]:
     except Exception as e:
         raise Exception(f"Ошибка при получении данных для экспорта: {str(e)}")
 
+
+def stream_version_export(version_id: int, fmt: str) -> Tuple[str, Iterator[bytes]]:
+    """
+    Потоковая выгрузка версии в файл (xlsx | csv).
+    Строки идут из курсора порциями, без сборки полного списка в памяти.
+    Возвращает (имя файла, генератор кусков файла).
+    """
+    _, rows = stream_query(EXPORT_SQL, (version_id,))
+    chunks = export_chunks(
+        fmt, EXPORT_HEADERS, rows,
+        sheet_title='Sale Plan',
+        col_widths=EXPORT_COL_WIDTHS,
+        col_styles=EXPORT_COL_STYLES,
+        header_style='saleplan_header',
+        extra_styles={'saleplan_header': SALEPLAN_HEADER_STYLE},
+    )
+    return f"sale_plan_v{version_id}.{fmt}", chunks
@@ -0,0 +1,153 @@
+"""
+Агрегированный куб План / Факт по ключу (Year, Month, Market, LargeGroup).
+
+План — сумма QTY активных версий Sale Plan (Orders.vw_SalesPlan_Details),
+Факт — сумма ToProduce_QTY из источника отчёта "Все заказы" (ReportID = 1,
+с его фильтрами) по году/месяцу AggregatedShipmentDate.
+
+Обе половины агрегируются на стороне SQL Server и держатся в памяти процесса.
+Каждая половина пересобирается только при смене своей версии:
+  - план — набор активных версий (Orders.SalesPlan_Versions);
+  - факт — снапшот импорта заказов (Import_1C.SnapshotPointer) и
+           настройки отчёта ID=1;
+  - обе — контрольная сумма Ref.Product_Guide: LargeGroup берётся из него
+    и в плане (vw_SalesPlan_Details), и в факте (Orders_1C_Svod).
+Версии читаются одним дешёвым запросом на вызов.
+"""
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from ....database.db_connector import get_connection
+from ..OrderData.OrderStatistics_service import build_statistics_query
+
+CubeKey = Tuple[int, int, Any, Any]  # (Year, Month, Market, LargeGroup)
+
+ORDERS_SNAPSHOT_TABLE = "Import_1C.Order_1C_v2"
+DEFAULT_FACT_SOURCE = "Orders.Orders_1C_Svod"
+
+CUBE_VERSION_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM Orders.SalesPlan_Versions WHERE IsActive = 1),
+        (SELECT ISNULL(CHECKSUM_AGG(CHECKSUM(VersionID, MinYear, TotalRecords)), 0)
+           FROM Orders.SalesPlan_Versions WHERE IsActive = 1),
+        (SELECT CONVERT(NVARCHAR(36), SnapshotID)
+           FROM Import_1C.SnapshotPointer WHERE TableName = ?),
+        (SELECT CHECKSUM(SourceTable, Filters)
+           FROM Users.UserReports WHERE ReportID = 1 AND IsTemplate = 1),
+        (SELECT ISNULL(CHECKSUM_AGG(CHECKSUM(FactoryNumber, LargeGroup, GroupName)), 0)
+           FROM Ref.Product_Guide)
+"""
+
+PLAN_CUBE_SQL = """
+    SELECT
+        d.YearNum,
+        d.MonthNum,
+        d.Market,
+        d.LargeGroup,
+        SUM(d.QTY) AS PlannedQty
+    FROM Orders.vw_SalesPlan_Details AS d
+    JOIN Orders.SalesPlan_Versions AS v
+      ON v.VersionID = d.VersionID
+     AND v.MinYear = d.YearNum
+     AND v.IsActive = 1
+    GROUP BY d.YearNum, d.MonthNum, d.Market, d.LargeGroup
+"""
+
+_cube_lock = threading.Lock()
+_plan_cache: Dict[str, Any] = {"version": None, "cells": None}
+_fact_cache: Dict[str, Any] = {"version": None, "cells": None}
+
+
+def _read_cube_versions(conn) -> Tuple[Tuple[Any, ...], Tuple[Any, ...]]:
+    cur = conn.cursor()
+    cur.execute(CUBE_VERSION_SQL, (ORDERS_SNAPSHOT_TABLE,))
+    row = cur.fetchone()
+    return (row[0], row[1], row[4]), (row[2], row[3], row[4])
+
+
+def _load_plan_cells(conn) -> Dict[CubeKey, float]:
+    cur = conn.cursor()
+    cur.execute(PLAN_CUBE_SQL)
+    return {
+        (int(r[0]), int(r[1]), r[2], r[3]): float(r[4]) if r[4] is not None else 0.0
+        for r in cur.fetchall()
+    }
+
+
+def _fact_source_query(conn) -> str:
+    """
+    Запрос-источник факта с фильтрами отчёта ID=1 (как в get_statistics_data),
+    но только с нужными кубу колонками. Нет отчёта — все данные без фильтров.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT SourceTable, Filters
+        FROM Users.UserReports
+        WHERE ReportID = 1 AND IsTemplate = 1
+    """)
+    row = cur.fetchone()
+    source_table = row.SourceTable if row else DEFAULT_FACT_SOURCE
+    filters = json.loads(row.Filters) if row and row.Filters else []
+    return build_statistics_query(
+        source_table=source_table,
+        selected_fields=['AggregatedShipmentDate', 'Market', 'LargeGroup', 'ToProduce_QTY'],
+        filters=filters,
+    )
+
+
+def _load_fact_cells(conn) -> Dict[CubeKey, float]:
+    cur = conn.cursor()
+    cur.execute(f"""
+        SELECT
+            YEAR(s.AggregatedShipmentDate)  AS YearNum,
+            MONTH(s.AggregatedShipmentDate) AS MonthNum,
+            s.Market,
+            s.LargeGroup,
+            SUM(ISNULL(s.ToProduce_QTY, 0)) AS ActualQty
+        FROM ({_fact_source_query(conn)}) AS s
+        WHERE s.AggregatedShipmentDate IS NOT NULL
+        GROUP BY YEAR(s.AggregatedShipmentDate), MONTH(s.AggregatedShipmentDate), s.Market, s.LargeGroup
+    """)
+    return {
+        (int(r[0]), int(r[1]), r[2], r[3]): float(r[4]) if r[4] is not None else 0.0
+        for r in cur.fetchall()
+    }
+
+
+def _refresh_half(cache: Dict[str, Any], version: Tuple[Any, ...], loader, conn) -> Dict[CubeKey, float]:
+    with _cube_lock:
+        if cache["version"] == version and cache["cells"] is not None:
+            return cache["cells"]
+    cells = loader(conn)
+    with _cube_lock:
+        cache["version"] = version
+        cache["cells"] = cells
+    return cells
+
+
+def get_plan_fact_cube(conn=None) -> Tuple[Dict[CubeKey, float], Dict[CubeKey, float]]:
+    """Возвращает (plan_cells, fact_cells); ячейки — {(Year, Month, Market, LargeGroup): qty}."""
+    if conn is None:
+        with get_connection() as own_conn:
+            return get_plan_fact_cube(own_conn)
+    plan_version, fact_version = _read_cube_versions(conn)
+    plan = _refresh_half(_plan_cache, plan_version, _load_plan_cells, conn)
+    fact = _refresh_half(_fact_cache, fact_version, _load_fact_cells, conn)
+    return plan, fact
+
+
+def invalidate_plan_cube() -> None:
+    """Сбрасывает план (после смены активной версии / удаления версии)."""
+    with _cube_lock:
+        _plan_cache["version"] = None
+        _plan_cache["cells"] = None
+
+
+def select_cells(cells: Dict[CubeKey, float], year: int,
+                 max_month: Optional[int] = None) -> List[Tuple[CubeKey, float]]:
+    """Ячейки куба за год (и, опционально, до месяца max_month включительно)."""
+    return [
+        (key, qty) for key, qty in cells.items()
+        if key[0] == year and (max_month is None or key[1] <= max_month)
+    ]
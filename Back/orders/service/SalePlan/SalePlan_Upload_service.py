@@ -1,12 +1,61 @@
 """
 Service для загрузки и парсинга Excel файлов Sale Plan
 """
+import itertools
+
 import pandas as pd  # type: ignore
 from datetime import datetime
 from typing import Dict, Any, List
 from ....database.db_connector import get_connection
 
 
+MONTH_MAP = {
+    'january': 1, 'jan': 1,
+    'february': 2, 'feb': 2,
+    'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4,
+    'may': 5,
+    'june': 6, 'jun': 6,
+    'july': 7, 'jul': 7,
+    'august': 8, 'aug': 8,
+    'september': 9, 'sep': 9,
+    'october': 10, 'oct': 10,
+    'november': 11, 'nov': 11,
+    'december': 12, 'dec': 12,
+}
+
+# Сколько номеров строк показывать в сообщении об ошибке по одной проверке
+MAX_ERROR_ROWS = 20
+
+
+def _parse_months(col: pd.Series) -> pd.Series:
+    """Month: число 1-12 или название месяца (January/Jan...). Невалидные → NaN."""
+    numeric = pd.to_numeric(col, errors='coerce')
+    numeric = numeric.where(numeric.between(1, 12) & (numeric % 1 == 0))
+    names = col.astype(str).str.strip().str.lower().map(MONTH_MAP)
+    return numeric.fillna(names)
+
+
+def _collect_errors(errors: List[str], df: pd.DataFrame, col: str, title: str,
+                    mask: pd.Series, message: str) -> None:
+    """Добавляет в errors строки Excel (с учётом заголовка) и значения, попавшие под mask."""
+    if not mask.any():
+        return
+    bad = df.loc[mask, col]
+    rows = (bad.index + 2).tolist()
+    shown = ', '.join(str(r) for r in rows[:MAX_ERROR_ROWS])
+    more = f" и ещё {len(rows) - MAX_ERROR_ROWS}" if len(rows) > MAX_ERROR_ROWS else ""
+    values = [v for v in bad.dropna().unique().tolist()[:5]]
+    values_part = f" (значения: {values})" if values else ""
+    errors.append(f"Колонка '{title}': {message} — строки {shown}{more}{values_part}")
+
+
+def _text_column(df: pd.DataFrame, col: str) -> List[str]:
+    if col not in df.columns:
+        return [''] * len(df)
+    return df[col].fillna('').astype(str).tolist()
+
+
 def parse_and_save_saleplan(file_path: str, uploaded_by: str, comment: str = None) -> Dict[str, Any]:
     """
     Парсит Excel файл Sale Plan и сохраняет в БД
@@ -57,86 +106,44 @@ def parse_and_save_saleplan(file_path: str, uploaded_by: str, comment: str = Non
         if actual_cols[:6] != expected_order:
             print(f"⚠️ Порядок колонок отличается от ожидаемого: {expected_order}")
         
-        # 2. Проверка на пустые значения (НЕ удаляем, выдаем ошибку)
-        empty_year = df[df[year_col].isna()]
-        if len(empty_year) > 0:
-            raise ValueError(f"Найдены пустые значения в колонке 'Year' (строки: {empty_year.index.tolist()[:5]}...)")
-        
-        empty_month = df[df['month'].isna()]
-        if len(empty_month) > 0:
-            raise ValueError(f"Найдены пустые значения в колонке 'Month' (строки: {empty_month.index.tolist()[:5]}...)")
-        
-        empty_qty = df[df['qty'].isna()]
-        if len(empty_qty) > 0:
-            raise ValueError(f"Найдены пустые значения в колонке 'QTY' (строки: {empty_qty.index.tolist()[:5]}...)")
-        
-        # Проверка Year на валидность (должно быть числом)
-        try:
-            df[year_col] = df[year_col].astype(int)
-        except Exception as e:
-            invalid_years = df[~df[year_col].apply(lambda x: str(x).replace('.', '', 1).isdigit())]
-            raise ValueError(f"Невалидные значения в колонке 'Year': {invalid_years[year_col].unique().tolist()[:5]}")
-        
-        # Преобразуем Month: если текст (January) → число (1), если уже число → оставляем
-        def month_to_number(val):
-            if pd.isna(val):
-                return None
-            if isinstance(val, (int, float)):
-                return int(val)
-            # Пробуем распарсить как название месяца
-            month_map = {
-                'january': 1, 'jan': 1,
-                'february': 2, 'feb': 2,
-                'march': 3, 'mar': 3,
-                'april': 4, 'apr': 4,
-                'may': 5,
-                'june': 6, 'jun': 6,
-                'july': 7, 'jul': 7,
-                'august': 8, 'aug': 8,
-                'september': 9, 'sep': 9,
-                'october': 10, 'oct': 10,
-                'november': 11, 'nov': 11,
-                'december': 12, 'dec': 12,
-            }
-            val_lower = str(val).strip().lower()
-            if val_lower in month_map:
-                return month_map[val_lower]
-            # Если не название - пытаемся преобразовать в число
-            try:
-                return int(val)
-            except:
-                return None
-        
-        df['month_parsed'] = df['month'].apply(month_to_number)
-        
-        # Проверяем, есть ли невалидные месяцы
-        invalid_months = df[df['month_parsed'].isna()]
-        if len(invalid_months) > 0:
-            invalid_values = invalid_months['month'].unique().tolist()
-            raise ValueError(f"Невалидные значения месяца: {invalid_values}. Используйте названия (January, February...) или числа (1-12)")
-        
-        df['month'] = df['month_parsed'].astype(int)
-        df = df.drop(columns=['month_parsed'])
-        
-        # Проверка QTY на числовые значения (СТРОГАЯ - ошибка если не число)
-        non_numeric_qty = df[~df['qty'].apply(lambda x: pd.api.types.is_number(x) if not pd.isna(x) else True)]
-        if len(non_numeric_qty) > 0:
-            invalid_values = non_numeric_qty['qty'].unique().tolist()[:5]
-            raise ValueError(f"Найдены не числовые значения в колонке 'QTY': {invalid_values}")
-        
-        df['qty'] = pd.to_numeric(df['qty'], errors='raise')  # raise вместо coerce
-        
-        # Проверка диапазона месяцев
-        if not df['month'].between(1, 12).all():
-            raise ValueError("Некорректные значения месяца (должны быть 1-12)")
-        
-        total_records = len(df)
-        if total_records == 0:
+        # 2. Валидация — векторно по колонкам, все ошибки собираются за один проход
+        if len(df) == 0:
             raise ValueError("Файл не содержит данных")
-        
+
+        errors: List[str] = []
+
+        years = pd.to_numeric(df[year_col], errors='coerce')
+        _collect_errors(errors, df, year_col, 'Year', df[year_col].isna(), 'пустые значения')
+        _collect_errors(errors, df, year_col, 'Year',
+                        df[year_col].notna() & (years.isna() | (years % 1 != 0)),
+                        'невалидные значения')
+
+        months = _parse_months(df['month'])
+        _collect_errors(errors, df, 'month', 'Month', df['month'].isna(), 'пустые значения')
+        _collect_errors(errors, df, 'month', 'Month',
+                        df['month'].notna() & months.isna(),
+                        'невалидные значения (используйте названия January, February... или числа 1-12)')
+
+        qty = df['qty']
+        qty_num = pd.to_numeric(qty, errors='coerce')
+        qty_bad = qty.notna() & qty_num.isna()
+        if not pd.api.types.is_numeric_dtype(qty):
+            # Строгая проверка: текст в ячейке — ошибка, даже если похож на число
+            qty_bad |= qty.map(type).eq(str)
+        _collect_errors(errors, df, 'qty', 'QTY', qty.isna(), 'пустые значения')
+        _collect_errors(errors, df, 'qty', 'QTY', qty_bad, 'не числовые значения')
+
+        if errors:
+            raise ValueError("Ошибки в файле:\n" + "\n".join(errors))
+
+        df[year_col] = years.astype(int)
+        df['month'] = months.astype(int)
+        df['qty'] = qty_num.astype(float)
+
+        total_records = len(df)
         min_year = int(df[year_col].min())
         max_year = int(df[year_col].max())
-        
+
         # 3. Генерируем VersionID
         with get_connection() as conn:
             cur = conn.cursor()
@@ -166,19 +173,18 @@ def parse_and_save_saleplan(file_path: str, uploaded_by: str, comment: str = Non
                 comment
             ))
             
-            # 5. Сохраняем детали
-            details = []
-            for _, row in df.iterrows():
-                details.append((
-                    version_id,
-                    int(row[year_col]),
-                    int(row['month']),
-                    str(row.get('market', '')),
-                    str(row.get('article_number', '')),
-                    str(row.get('name', '')),
-                    float(row['qty'])
-                ))
-            
+            # 5. Сохраняем детали — одним пакетом (fast_executemany)
+            details = list(zip(
+                itertools.repeat(version_id),
+                df[year_col].tolist(),
+                df['month'].tolist(),
+                _text_column(df, 'market'),
+                _text_column(df, 'article_number'),
+                _text_column(df, 'name'),
+                df['qty'].tolist(),
+            ))
+
+            cur.fast_executemany = True
             cur.executemany("""
                 INSERT INTO Orders.SalesPlan_Details 
                 (VersionID, YearNum, MonthNum, Market, Article_number, Name, QTY)
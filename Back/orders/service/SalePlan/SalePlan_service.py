@@ -3,6 +3,7 @@ Service для работы с Sale Plan (получение данных, уп
 """
 from typing import Dict, Any
 from ....database.db_connector import get_connection
+from .SalePlan_Cube_service import invalidate_plan_cube
 
 
 def set_active_version(version_id: int) -> Dict[str, Any]:
@@ -17,6 +18,7 @@ def set_active_version(version_id: int) -> Dict[str, Any]:
             # Вызываем процедуру
             cur.execute("EXEC Orders.sp_SalePlan_SetActive @VersionID = ?", (version_id,))
             conn.commit()
+            invalidate_plan_cube()
             
             return {
                 'success': True,
@@ -44,6 +46,7 @@ def delete_version(version_id: int) -> Dict[str, Any]:
             # Удаляем (детали удалятся автоматически благодаря ON DELETE CASCADE)
             cur.execute("DELETE FROM Orders.SalesPlan_Versions WHERE VersionID = ?", (version_id,))
             conn.commit()
+            invalidate_plan_cube()
             
             return {
                 'success': True,
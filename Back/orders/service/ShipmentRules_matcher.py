@@ -0,0 +1,252 @@
+"""
+Python-вычислитель правил фильтрации отгрузок (Orders.ShipmentsOrderFilter_Rules).
+
+Повторяет семантику SQL-предиката из Shipment_service._build_predicates_from_rules,
+чтобы уже загруженные строки можно было фильтровать в памяти, не обращаясь к БД:
+    keep = (include_match) OR NOT (exclude_match)
+
+Для сотен правил по одному полю сопоставление не перебирает шаблоны по одному:
+  - Equals     — множество значений;
+  - StartsWith — префиксное дерево (trie);
+  - EndsWith   — trie по перевёрнутым шаблонам;
+  - Contains   — автомат Ахо–Корасик.
+Сравнение регистронезависимое (как CI-collation SQL Server); шаблоны с
+LIKE-метасимволами (%, _, [) компилируются в регулярные выражения.
+"""
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+NULL_MATCH_TYPES = ("nullorempty", "isnullorempty", "null", "isnull")
+_LIKE_META = re.compile(r"[%_\[]")
+
+_END = object()  # маркер конца шаблона в узле trie
+
+
+def _norm(value: Any) -> str:
+    return str(value).casefold()
+
+
+class _Trie:
+    """Префиксное дерево: есть ли у строки префикс из набора шаблонов."""
+
+    def __init__(self) -> None:
+        self._root: Dict[Any, Any] = {}
+
+    def add(self, word: str) -> None:
+        node = self._root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[_END] = True
+
+    def __bool__(self) -> bool:
+        return bool(self._root)
+
+    def has_prefix_of(self, text: str) -> bool:
+        node = self._root
+        if _END in node:
+            return True
+        for ch in text:
+            node = node.get(ch)
+            if node is None:
+                return False
+            if _END in node:
+                return True
+        return False
+
+
+class _AhoCorasick:
+    """Автомат Ахо–Корасик: содержит ли строка хотя бы один из шаблонов."""
+
+    def __init__(self, words: Iterable[str]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[bool] = [False]
+        for word in words:
+            self._add(word)
+        self._build()
+
+    def _add(self, word: str) -> None:
+        state = 0
+        for ch in word:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(False)
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state] = True
+
+    def _build(self) -> None:
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] or self._out[self._fail[nxt]]
+
+    def __bool__(self) -> bool:
+        return len(self._goto) > 1
+
+    def search(self, text: str) -> bool:
+        goto, fail, out = self._goto, self._fail, self._out
+        if out[0]:
+            return True
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                return True
+        return False
+
+
+def _like_to_regex(pattern: str) -> str:
+    """Переводит LIKE-шаблон SQL Server (%, _, [..]) в регулярное выражение."""
+    out: List[str] = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == "%":
+            out.append(".*")
+        elif ch == "_":
+            out.append(".")
+        elif ch == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(ch))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("^"):
+                    body = "^" + re.escape(body[1:])
+                else:
+                    body = re.escape(body)
+                out.append(f"[{body.replace(chr(92) + '-', '-')}]")
+                i = end
+        else:
+            out.append(re.escape(ch))
+        i += 1
+    return "".join(out)
+
+
+class _FieldMatcher:
+    """Все правила одного направления (include или exclude) по одному полю."""
+
+    def __init__(self) -> None:
+        self.match_null = False          # IS NULL
+        self.match_null_or_empty = False  # IS NULL OR = N''
+        self.equals: Set[str] = set()
+        self.prefixes = _Trie()
+        self.suffixes = _Trie()
+        self._contains: List[str] = []
+        self._like: List[str] = []
+        self.contains: Optional[_AhoCorasick] = None
+        self.like: Optional[re.Pattern] = None
+
+    def add(self, match_type: str, pattern: str) -> None:
+        if match_type in ("nullorempty", "isnullorempty"):
+            self.match_null_or_empty = True
+            return
+        if match_type in ("null", "isnull"):
+            self.match_null = True
+            return
+        p = _norm(pattern)
+        if match_type == "equals":
+            self.equals.add(p.rstrip(" "))
+        elif _LIKE_META.search(p):
+            like = {"startswith": f"{p}%", "contains": f"%{p}%", "endswith": f"%{p}"}[match_type]
+            self._like.append(_like_to_regex(like))
+        elif match_type == "startswith":
+            self.prefixes.add(p)
+        elif match_type == "endswith":
+            self.suffixes.add(p[::-1])
+        elif match_type == "contains":
+            self._contains.append(p)
+
+    def freeze(self) -> None:
+        if self._contains:
+            self.contains = _AhoCorasick(self._contains)
+        if self._like:
+            self.like = re.compile("|".join(f"(?:{r})" for r in self._like), re.DOTALL)
+
+    def matches(self, value: Any) -> bool:
+        if value is None:
+            return self.match_null or self.match_null_or_empty
+        text = _norm(value)
+        if self.match_null_or_empty and text == "":
+            return True
+        if self.equals and text.rstrip(" ") in self.equals:
+            return True
+        if self.prefixes and self.prefixes.has_prefix_of(text):
+            return True
+        if self.suffixes and self.suffixes.has_prefix_of(text[::-1]):
+            return True
+        if self.contains is not None and self.contains.search(text):
+            return True
+        if self.like is not None and self.like.fullmatch(text):
+            return True
+        return False
+
+
+class RuleMatcher:
+    """
+    Скомпилированный набор правил для фильтрации строк (dict) в памяти.
+
+    rules          — правила в формате load_published_rules (MatchType уже
+                     развёрнут из NULL_EMPTY_SENTINEL);
+    default_field  — поле, если FieldName не задан или не из whitelist;
+    allowed_fields — whitelist полей (как для SQL-предиката).
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], default_field: str,
+                 allowed_fields: Iterable[str]) -> None:
+        allowed = set(allowed_fields)
+        self._include: Dict[str, _FieldMatcher] = {}
+        self._exclude: Dict[str, _FieldMatcher] = {}
+
+        for rule in rules or []:
+            if not rule.get("IsActive", 1):
+                continue
+            match_type = (rule.get("MatchType") or "").strip().lower()
+            pattern = (rule.get("Pattern") or "").strip()
+            if match_type not in NULL_MATCH_TYPES:
+                if not pattern or match_type not in ("startswith", "contains", "equals", "endswith"):
+                    continue
+            field = (rule.get("FieldName") or "").strip()
+            field = field if field in allowed else default_field
+            target = self._exclude if rule.get("IsExclude", 1) else self._include
+            target.setdefault(field, _FieldMatcher()).add(match_type, pattern)
+
+        for matcher in list(self._include.values()) + list(self._exclude.values()):
+            matcher.freeze()
+
+    @property
+    def is_empty(self) -> bool:
+        return not self._include and not self._exclude
+
+    @staticmethod
+    def _any(matchers: Dict[str, _FieldMatcher], row: Dict[str, Any]) -> bool:
+        for field, matcher in matchers.items():
+            if matcher.matches(row.get(field)):
+                return True
+        return False
+
+    def keep(self, row: Dict[str, Any]) -> bool:
+        if self._include and self._any(self._include, row):
+            return True
+        if self._exclude:
+            return not self._any(self._exclude, row)
+        # Только include-правила и ни одно не сработало
+        return not self._include
+
+    def filter(self, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.is_empty:
+            return list(rows)
+        keep = self.keep
+        return [row for row in rows if keep(row)]
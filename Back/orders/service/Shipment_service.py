@@ -4,13 +4,48 @@
 и предоставляет preview/publish API.
 """
 
+import threading
+import time
+from dataclasses import dataclass
 from datetime import date
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from ...database.db_connector import get_connection
+from .ShipmentRules_matcher import RuleMatcher
 
 # Sentinel to persist NullOrEmpty in DBs that do not allow custom MatchType values
 NULL_EMPTY_SENTINEL = "__NULL_EMPTY__"
 
+# Кэш скомпилированных правил: пересобирается только при смене версии набора
+# (COUNT + CHECKSUM_AGG по таблице правил — один дешёвый запрос вместо
+# чтения всех правил и пробы sys.columns на каждый вызов).
+_rules_lock = threading.Lock()
+_rules_cache: Dict[str, Any] = {"version": None, "rule_set": None}
+_has_field_name_column: Optional[bool] = None
+
+# Предрасчитанные флаги правил (Orders.ShipmentRule_Flags, см.
+# sql/create_ShipmentRule_Flags.sql): наличие проверяется один раз на процесс
+_has_rule_flags: Optional[bool] = None
+
+# Кэш строк отгрузок без правил — для интерактивного preview
+# (правила применяются в памяти, БД читается один раз на период)
+_PREVIEW_ROWS_TTL_SEC = 120.0
+_PREVIEW_ROWS_MAX_PERIODS = 4
+_preview_rows_lock = threading.Lock()
+_preview_rows_cache: Dict[Tuple[date, date], Tuple[float, List[Dict[str, Any]]]] = {}
+
+SHIPMENT_SELECT_SQL = """
+    SELECT
+        RealizationDoc, SpendingOrder_No, RealizationDate, SpendingOrder_Date,
+        ShipmentDate_Fact, Recipient_Name, Partner_Name, ShipmentDate_Fact_Svod,
+        LargeGroup, Order_No, Article_number, GroupName, Name_CN,
+        SpendingOrder_QTY, CBM, CBM_Total, CI_No, ContainerNO_Realization, Comment,
+        Market, Security_Scheme, ProductTagZh
+    FROM Orders.ShipmentData_Table
+    WHERE ShipmentDate_Fact_Svod BETWEEN ? AND ?
+    {extra}
+    ORDER BY ShipmentDate_Fact_Svod DESC
+"""
+
 
 def _fetch_query(conn, sql: str, params: Tuple = ()) -> List[Dict[str, Any]]:
     """Выполняет SELECT и возвращает список dict'ов (JSON-friendly)."""
@@ -36,9 +71,16 @@ def _table_has_column(conn, schema: str, table: str, column: str) -> bool:
         return False
 
 
-def load_published_rules(conn) -> List[Dict[str, Any]]:
-    has_field_name = _table_has_column(conn, "Orders", "ShipmentsOrderFilter_Rules", "FieldName")
-    if has_field_name:
+def _rules_have_field_name(conn) -> bool:
+    """Наличие колонки FieldName проверяется один раз на процесс."""
+    global _has_field_name_column
+    if _has_field_name_column is None:
+        _has_field_name_column = _table_has_column(conn, "Orders", "ShipmentsOrderFilter_Rules", "FieldName")
+    return _has_field_name_column
+
+
+def _read_published_rules(conn) -> List[Dict[str, Any]]:
+    if _rules_have_field_name(conn):
         sql = """
             SELECT RuleID, FieldName, MatchType, Pattern, IsExclude, IsActive, Priority, Comment
             FROM Orders.ShipmentsOrderFilter_Rules
@@ -63,6 +105,108 @@ def load_published_rules(conn) -> List[Dict[str, Any]]:
     return rows
 
 
+def _rules_version(conn) -> Tuple[int, int]:
+    """Версия набора правил: меняется при любой правке таблицы."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT COUNT(*), ISNULL(CHECKSUM_AGG(CHECKSUM(*)), 0)
+        FROM Orders.ShipmentsOrderFilter_Rules
+        """
+    )
+    row = cur.fetchone()
+    return int(row[0]), int(row[1])
+
+
+def _rule_flags_available(conn) -> bool:
+    global _has_rule_flags
+    if _has_rule_flags is None:
+        _has_rule_flags = _table_has_column(conn, "Orders", "ShipmentRule_FlagState", "ProductGuideChecksum")
+    return _has_rule_flags
+
+
+def _rule_flags_current(conn) -> bool:
+    """
+    Флаги посчитаны для текущих правил и текущих источников их полей
+    (снапшот заказов, Product_Guide — если правила их используют).
+    """
+    if not _rule_flags_available(conn):
+        return False
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT 1
+        FROM Orders.ShipmentRule_FlagState AS s
+        CROSS JOIN Orders.fn_ShipmentRule_FlagVersion() AS v
+        WHERE s.ID = 1
+          AND s.RulesCount = v.RulesCount
+          AND s.RulesChecksum = v.RulesChecksum
+          AND EXISTS (SELECT s.OrdersSnapshotID, s.ProductGuideChecksum
+                      INTERSECT SELECT v.OrdersSnapshotID, v.ProductGuideChecksum)
+        """
+    )
+    return cur.fetchone() is not None
+
+
+@dataclass(frozen=True)
+class CompiledRuleSet:
+    """Правила, SQL-предикат для них и Python-вычислитель для фильтрации в памяти."""
+    rules: Tuple[Dict[str, Any], ...]
+    sql: str
+    params: Tuple[Any, ...]
+    matcher: RuleMatcher
+
+
+def compile_rules(rules: List[Dict[str, Any]], field: str = "Order_No") -> CompiledRuleSet:
+    mapped = _map_sentinel_rules(rules)
+    extra_sql, extra_params = _build_predicates_from_rules(mapped, field)
+    return CompiledRuleSet(
+        rules=tuple(rules),
+        sql=extra_sql,
+        params=tuple(extra_params),
+        matcher=RuleMatcher(mapped, field, ALLOWED_FILTER_FIELDS),
+    )
+
+
+def get_published_rule_set(conn) -> CompiledRuleSet:
+    """Скомпилированные опубликованные правила (кэш по версии набора)."""
+    version = _rules_version(conn)
+    with _rules_lock:
+        if _rules_cache["version"] == version and _rules_cache["rule_set"] is not None:
+            return _rules_cache["rule_set"]
+
+    rule_set = compile_rules(_read_published_rules(conn))
+    with _rules_lock:
+        _rules_cache["version"] = version
+        _rules_cache["rule_set"] = rule_set
+    return rule_set
+
+
+def get_published_filter(conn) -> Tuple[str, Tuple[Any, ...]]:
+    """
+    Предикат опубликованных правил для запросов к ShipmentData_Table.
+    Если флаги актуальны — фильтр по RuleIncluded (без LIKE по каждой
+    строке); строки без флага (RuleIncluded IS NULL) проверяются самими
+    правилами.  Иначе — SQL-предикат из правил.
+    """
+    rule_set = get_published_rule_set(conn)
+    if not rule_set.sql:
+        return "", ()
+    if _rule_flags_current(conn):
+        return f" AND (RuleIncluded = 1 OR (RuleIncluded IS NULL{rule_set.sql}))", rule_set.params
+    return rule_set.sql, rule_set.params
+
+
+def invalidate_rules_cache() -> None:
+    with _rules_lock:
+        _rules_cache["version"] = None
+        _rules_cache["rule_set"] = None
+
+
+def load_published_rules(conn) -> List[Dict[str, Any]]:
+    return [dict(r) for r in get_published_rule_set(conn).rules]
+
+
 # Whitelist допустимых полей для фильтрации (защита от SQL injection)
 ALLOWED_FILTER_FIELDS = {
     'Order_No', 'Article_number', 'Market', 'Security_Scheme', 'ProductTagZh',
@@ -143,6 +287,16 @@ def _build_predicates_from_rules(rules: List[Dict[str, Any]], field: str = "Orde
     return " AND " + " AND ".join(parts), params
 
 
+def _map_sentinel_rules(rules: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    mapped_rules: List[Dict[str, Any]] = []
+    for r in rules or []:
+        if str(r.get("MatchType", "")).lower() == "equals" and str(r.get("Pattern", "")) == NULL_EMPTY_SENTINEL:
+            mapped_rules.append({**r, "MatchType": "NullOrEmpty", "Pattern": ""})
+        else:
+            mapped_rules.append(r)
+    return mapped_rules
+
+
 def _normalize_dates_in_rows(rows: List[Dict[str, Any]]) -> None:
     from datetime import datetime
     for row in rows:
@@ -164,33 +318,11 @@ def _normalize_dates_in_rows(rows: List[Dict[str, Any]]) -> None:
 
 def get_shipment_data(start_date: date, end_date: date) -> Dict[str, Any]:
     """Возвращает отгрузки за период с применением опубликованных правил."""
-    base_sql = (
-        """
-        SELECT
-            RealizationDoc, SpendingOrder_No, RealizationDate, SpendingOrder_Date,
-            ShipmentDate_Fact, Recipient_Name, Partner_Name, ShipmentDate_Fact_Svod,
-            LargeGroup, Order_No, Article_number, GroupName, Name_CN,
-            SpendingOrder_QTY, CBM, CBM_Total, CI_No, ContainerNO_Realization, Comment,
-            Market, Security_Scheme, ProductTagZh
-        FROM Orders.ShipmentData_Table
-        WHERE ShipmentDate_Fact_Svod BETWEEN ? AND ?
-        {extra}
-        ORDER BY ShipmentDate_Fact_Svod DESC
-        """
-    )
     import traceback as _tb
     try:
         with get_connection() as conn:
-            rules = load_published_rules(conn)
-            mapped_rules: List[Dict[str, Any]] = []
-            for r in rules:
-                if str(r.get("MatchType", "")).lower() == "equals" and str(r.get("Pattern", "")) == NULL_EMPTY_SENTINEL:
-                    mapped_rules.append({**r, "MatchType": "NullOrEmpty", "Pattern": ""})
-                else:
-                    mapped_rules.append(r)
-
-            extra_sql, extra_params = _build_predicates_from_rules(mapped_rules)
-            final_sql = base_sql.format(extra=extra_sql)
+            extra_sql, extra_params = get_published_filter(conn)
+            final_sql = SHIPMENT_SELECT_SQL.format(extra=extra_sql)
             params: Tuple = (start_date, end_date, *extra_params)
             print(f"[Shipment] SQL:\n{final_sql}")
             print(f"[Shipment] params: {params}")
@@ -208,41 +340,47 @@ def get_shipment_data(start_date: date, end_date: date) -> Dict[str, Any]:
         raise Exception(f"Ошибка при получении данных об отгрузках: {str(e)}\n---\n{detail}")
 
 
+def _get_unfiltered_rows(conn, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+    """Строки периода без правил; держатся в памяти _PREVIEW_ROWS_TTL_SEC секунд."""
+    key = (start_date, end_date)
+    now = time.time()
+    with _preview_rows_lock:
+        cached = _preview_rows_cache.get(key)
+        if cached and (now - cached[0]) < _PREVIEW_ROWS_TTL_SEC:
+            return cached[1]
+
+    rows = _fetch_query(conn, SHIPMENT_SELECT_SQL.format(extra=""), (start_date, end_date))
+    _normalize_dates_in_rows(rows)
+
+    with _preview_rows_lock:
+        # Вытесняем устаревшие и самые старые периоды
+        for k in [k for k, (ts, _) in _preview_rows_cache.items() if now - ts >= _PREVIEW_ROWS_TTL_SEC]:
+            _preview_rows_cache.pop(k, None)
+        while len(_preview_rows_cache) >= _PREVIEW_ROWS_MAX_PERIODS:
+            oldest = min(_preview_rows_cache, key=lambda k: _preview_rows_cache[k][0])
+            _preview_rows_cache.pop(oldest, None)
+        _preview_rows_cache[key] = (now, rows)
+    return rows
+
+
 def preview_shipment_data(start_date: date, end_date: date,
                           preview_rules: List[Dict[str, Any]],
                           mode: str = "merge") -> Dict[str, Any]:
-    """Возвращает данные с временными правилами: mode='override' или 'merge'."""
-    base_sql = (
-        """
-        SELECT
-            RealizationDoc, SpendingOrder_No, RealizationDate, SpendingOrder_Date,
-            ShipmentDate_Fact, Recipient_Name, Partner_Name, ShipmentDate_Fact_Svod,
-            LargeGroup, Order_No, Article_number, GroupName, Name_CN,
-            SpendingOrder_QTY, CBM, CBM_Total, CI_No, ContainerNO_Realization, Comment,
-            Market, Security_Scheme, ProductTagZh
-        FROM Orders.ShipmentData_Table
-        WHERE ShipmentDate_Fact_Svod BETWEEN ? AND ?
-        {extra}
-        ORDER BY ShipmentDate_Fact_Svod DESC
-        """
-    )
+    """
+    Возвращает данные с временными правилами: mode='override' или 'merge'.
+    Строки периода читаются из БД один раз и кэшируются, правила применяются
+    в памяти (RuleMatcher) — повторные preview при редактировании правил
+    не обращаются к ShipmentData_Table.
+    """
     try:
         with get_connection() as conn:
             if mode.lower() == "override":
                 effective_rules = preview_rules or []
             else:
-                effective_rules = (load_published_rules(conn) or []) + (preview_rules or [])
-
-            mapped_rules: List[Dict[str, Any]] = []
-            for r in effective_rules:
-                if str(r.get("MatchType", "")).lower() == "equals" and str(r.get("Pattern", "")) == NULL_EMPTY_SENTINEL:
-                    mapped_rules.append({**r, "MatchType": "NullOrEmpty", "Pattern": ""})
-                else:
-                    mapped_rules.append(r)
-            extra_sql, extra_params = _build_predicates_from_rules(mapped_rules)
-            params: Tuple = (start_date, end_date, *extra_params)
-            rows = _fetch_query(conn, base_sql.format(extra=extra_sql), params)
-            _normalize_dates_in_rows(rows)
+                effective_rules = list(get_published_rule_set(conn).rules) + (preview_rules or [])
+
+            matcher = compile_rules(effective_rules).matcher
+            rows = matcher.filter(_get_unfiltered_rows(conn, start_date, end_date))
             return {
                 "data": rows,
                 "start_date": start_date.isoformat(),
@@ -291,6 +429,7 @@ def publish_rules(new_rules: List[Dict[str, Any]]) -> int:
             "FieldName": field_name,
         })
 
+    global _has_field_name_column
     with get_connection() as conn:
         cur = conn.cursor()
         cur.execute("BEGIN TRAN")
@@ -314,6 +453,7 @@ def publish_rules(new_rules: List[Dict[str, Any]]) -> int:
                         ) for r in normalized]
                     )
                 except Exception:
+                    _has_field_name_column = False
                     cur.executemany(
                         (
                             """
@@ -327,7 +467,12 @@ def publish_rules(new_rules: List[Dict[str, Any]]) -> int:
                             r["IsActive"], r["Priority"], r["Comment"]
                         ) for r in normalized]
                     )
+            # Пересчёт флагов в той же транзакции: читатели не увидят новые
+            # правила со старыми флагами
+            if _rule_flags_available(conn):
+                cur.execute("EXEC Orders.sp_Refresh_ShipmentRule_Flags")
             cur.execute("COMMIT")
+            invalidate_rules_cache()
             return len(normalized)
         except Exception:
             cur.execute("ROLLBACK")
@@ -0,0 +1,376 @@
+-- =============================================
+-- Предрасчитанные флаги правил фильтрации отгрузок
+--
+-- Правила из Orders.ShipmentsOrderFilter_Rules вычисляются один раз:
+--   - при импорте отгрузок (миграция 1c_shipments / 1c_shipments_full)
+--   - при публикации правил (Shipment_service.publish_rules)
+--   - после смены заказов (1c_order_1c_v2) и Ref.Product_Guide
+--     (excel_product_time) — только если правила используют их поля
+-- и сохраняются в Orders.ShipmentRule_Flags по ключу строки отгрузки.
+-- Читатели (Shipment, RegionsMonthlyData) фильтруют по RuleIncluded
+-- вместо цепочки LIKE, пока версия в ShipmentRule_FlagState совпадает с
+-- текущей (Orders.fn_ShipmentRule_FlagVersion: правила + заказы /
+-- Product_Guide, от которых зависят правила).  RuleIncluded = NULL (строка
+-- ещё не пересчитана или строки одного ключа дают разный результат) —
+-- читатель применяет к строке сами правила.
+--
+-- Семантика совпадает с Shipment_service._build_predicates_from_rules:
+--   keep = (include_match) OR NOT (exclude_match)
+-- =============================================
+
+-- 1. Таблица флагов
+IF OBJECT_ID(N'Orders.ShipmentRule_Flags', N'U') IS NULL
+BEGIN
+    CREATE TABLE Orders.ShipmentRule_Flags (
+        SpendingOrder_ID                    VARBINARY(16) NOT NULL,
+        NomenclatureID                      VARBINARY(16) NOT NULL,
+        OrderID_SpendingOrder_TableProduct  VARBINARY(16) NOT NULL,
+        SpendingOrder_Date                  DATE          NULL,
+        IsIncluded                          BIT           NOT NULL,
+        UpdatedAt                           DATETIME2(0)  NOT NULL DEFAULT SYSDATETIME(),
+
+        CONSTRAINT PK_ShipmentRule_Flags
+            PRIMARY KEY CLUSTERED (SpendingOrder_ID, NomenclatureID, OrderID_SpendingOrder_TableProduct)
+    );
+
+    CREATE NONCLUSTERED INDEX IX_ShipmentRule_Flags_Date
+        ON Orders.ShipmentRule_Flags (SpendingOrder_Date) INCLUDE (IsIncluded);
+
+    PRINT 'Таблица Orders.ShipmentRule_Flags создана';
+END
+GO
+
+-- 2. Версия правил и источников, для которой посчитаны флаги (одна строка)
+IF OBJECT_ID(N'Orders.ShipmentRule_FlagState', N'U') IS NULL
+BEGIN
+    CREATE TABLE Orders.ShipmentRule_FlagState (
+        ID              TINYINT      NOT NULL CONSTRAINT PK_ShipmentRule_FlagState PRIMARY KEY DEFAULT 1,
+        RulesCount      INT          NOT NULL,
+        RulesChecksum   INT          NOT NULL,
+        OrdersSnapshotID     UNIQUEIDENTIFIER NULL,   -- NULL — правила не зависят от заказов
+        ProductGuideChecksum INT              NULL,   -- NULL — правила не зависят от Product_Guide
+        UpdatedAt       DATETIME2(0) NOT NULL DEFAULT SYSDATETIME(),
+        CONSTRAINT CK_ShipmentRule_FlagState_Single CHECK (ID = 1)
+    );
+    PRINT 'Таблица Orders.ShipmentRule_FlagState создана';
+END
+GO
+
+IF COL_LENGTH(N'Orders.ShipmentRule_FlagState', N'ProductGuideChecksum') IS NULL
+BEGIN
+    ALTER TABLE Orders.ShipmentRule_FlagState
+        ADD OrdersSnapshotID UNIQUEIDENTIFIER NULL,
+            ProductGuideChecksum INT NULL;
+    PRINT 'Orders.ShipmentRule_FlagState: добавлены версии источников';
+END
+GO
+
+-- 3. Текущая версия входных данных флагов: правила (тем же выражением, что
+--     и Shipment_service._rules_version) и источники полей, которые правила
+--     используют — снапшот заказов (Market, Security_Scheme, ProductTagZh)
+--     и Product_Guide (LargeGroup, GroupName)
+CREATE OR ALTER FUNCTION Orders.fn_ShipmentRule_FlagVersion()
+RETURNS TABLE
+AS
+RETURN
+    SELECT
+        rv.RulesCount,
+        rv.RulesChecksum,
+        OrdersSnapshotID = CASE WHEN d.UsesOrders = 1 THEN (
+            SELECT p.SnapshotID
+            FROM Import_1C.SnapshotPointer AS p
+            WHERE p.TableName = N'Import_1C.Order_1C_v2') END,
+        ProductGuideChecksum = CASE WHEN d.UsesGuide = 1 THEN (
+            SELECT ISNULL(CHECKSUM_AGG(CHECKSUM(g.FactoryNumber, g.LargeGroup, g.GroupName)), 0)
+            FROM Ref.Product_Guide AS g) END
+    FROM (
+        SELECT RulesCount = COUNT(*), RulesChecksum = ISNULL(CHECKSUM_AGG(CHECKSUM(*)), 0)
+        FROM Orders.ShipmentsOrderFilter_Rules
+    ) AS rv
+    CROSS JOIN (
+        SELECT
+            UsesOrders = MAX(CASE WHEN r.FieldName IN (N'Market', N'Security_Scheme', N'ProductTagZh') THEN 1 ELSE 0 END),
+            UsesGuide  = MAX(CASE WHEN r.FieldName IN (N'LargeGroup', N'GroupName') THEN 1 ELSE 0 END)
+        FROM Orders.ShipmentsOrderFilter_Rules AS r
+        WHERE r.IsActive = 1
+    ) AS d;
+GO
+
+-- 4. Процедура пересчёта флагов
+--    @DateFrom/@DateTo — окно по SpendingOrder_Date (как окно импорта);
+--    без параметров — полный пересчёт (публикация правил, full sync);
+--    @IfStale = 1 — полный пересчёт, только если версия в FlagState
+--    устарела (после загрузки заказов / Product_Guide).
+--    MERGE меняет только строки, у которых флаг действительно изменился.
+CREATE OR ALTER PROCEDURE Orders.sp_Refresh_ShipmentRule_Flags
+    @DateFrom DATE = NULL,
+    @DateTo   DATE = NULL,
+    @IfStale  BIT  = 0
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @Full BIT = CASE WHEN @DateFrom IS NULL OR @DateTo IS NULL THEN 1 ELSE 0 END;
+
+    -- Версия читается до расчёта: изменения источников во время пересчёта
+    -- оставят её устаревшей, и читатели перейдут на сами правила
+    DECLARE @RulesCount INT, @RulesChecksum INT,
+            @OrdersSnapshotID UNIQUEIDENTIFIER, @ProductGuideChecksum INT;
+    SELECT @RulesCount = RulesCount, @RulesChecksum = RulesChecksum,
+           @OrdersSnapshotID = OrdersSnapshotID, @ProductGuideChecksum = ProductGuideChecksum
+    FROM Orders.fn_ShipmentRule_FlagVersion();
+
+    IF @IfStale = 1 AND EXISTS (
+        SELECT 1 FROM Orders.ShipmentRule_FlagState AS s
+        WHERE s.ID = 1 AND s.RulesCount = @RulesCount AND s.RulesChecksum = @RulesChecksum
+          AND EXISTS (SELECT s.OrdersSnapshotID, s.ProductGuideChecksum
+                      INTERSECT SELECT @OrdersSnapshotID, @ProductGuideChecksum))
+        RETURN;
+
+    DECLARE @Rules TABLE (
+        FieldName SYSNAME       NOT NULL,
+        MatchType VARCHAR(16)   NOT NULL,
+        Pattern   NVARCHAR(255) NOT NULL,
+        IsExclude BIT           NOT NULL
+    );
+
+    -- NullOrEmpty хранится как Equals + '__NULL_EMPTY__' (publish_rules);
+    -- NullOrEmpty / IsNullOrEmpty / Null / IsNull, записанные напрямую, тоже учитываются
+    INSERT INTO @Rules (FieldName, MatchType, Pattern, IsExclude)
+    SELECT
+        CASE WHEN r.FieldName IN (
+                N'Order_No', N'Article_number', N'Market', N'Security_Scheme', N'ProductTagZh',
+                N'LargeGroup', N'GroupName', N'Name_CN', N'Recipient_Name', N'Partner_Name',
+                N'ContainerNO_Realization', N'CI_No', N'RealizationDoc', N'SpendingOrder_No')
+             THEN r.FieldName ELSE N'Order_No' END,
+        CASE
+            WHEN x.mt IN ('nullorempty', 'isnullorempty')
+              OR (x.mt = 'equals' AND x.pat = N'__NULL_EMPTY__') THEN 'nullorempty'
+            WHEN x.mt IN ('null', 'isnull') THEN 'null'
+            ELSE x.mt
+        END,
+        x.pat,
+        r.IsExclude
+    FROM Orders.ShipmentsOrderFilter_Rules AS r
+    CROSS APPLY (SELECT mt  = LOWER(LTRIM(RTRIM(r.MatchType))),
+                        pat = LTRIM(RTRIM(ISNULL(r.Pattern, N'')))) AS x
+    WHERE r.IsActive = 1
+      AND (   (x.mt IN ('startswith', 'contains', 'equals', 'endswith') AND x.pat <> N'')
+           OR x.mt IN ('nullorempty', 'isnullorempty', 'null', 'isnull'));
+
+    DECLARE @HasInclude BIT = CASE WHEN EXISTS (SELECT 1 FROM @Rules WHERE IsExclude = 0) THEN 1 ELSE 0 END;
+    DECLARE @HasExclude BIT = CASE WHEN EXISTS (SELECT 1 FROM @Rules WHERE IsExclude = 1) THEN 1 ELSE 0 END;
+
+    ;WITH Lines AS (
+        SELECT
+            s.SpendingOrder_ID,
+            s.NomenclatureID,
+            s.OrderID_SpendingOrder_TableProduct,
+            s.SpendingOrder_Date,
+            IncMatch = CASE WHEN EXISTS (
+                SELECT 1
+                FROM @Rules AS r
+                CROSS APPLY (SELECT v = CASE r.FieldName
+                    WHEN N'Order_No'                THEN s.Order_No
+                    WHEN N'Article_number'          THEN s.Article_number
+                    WHEN N'Market'                  THEN s.Market
+                    WHEN N'Security_Scheme'         THEN s.Security_Scheme
+                    WHEN N'ProductTagZh'            THEN s.ProductTagZh
+                    WHEN N'LargeGroup'              THEN s.LargeGroup
+                    WHEN N'GroupName'               THEN s.GroupName
+                    WHEN N'Name_CN'                 THEN s.Name_CN
+                    WHEN N'Recipient_Name'          THEN s.Recipient_Name
+                    WHEN N'Partner_Name'            THEN s.Partner_Name
+                    WHEN N'ContainerNO_Realization' THEN s.ContainerNO_Realization
+                    WHEN N'CI_No'                   THEN s.CI_No
+                    WHEN N'RealizationDoc'          THEN s.RealizationDoc
+                    WHEN N'SpendingOrder_No'        THEN s.SpendingOrder_No
+                END) AS f
+                WHERE r.IsExclude = 0
+                  AND (
+                    (r.MatchType = 'nullorempty' AND (f.v IS NULL OR f.v = N'')) OR
+                    (r.MatchType = 'null'        AND f.v IS NULL) OR
+                    (r.MatchType = 'equals'     AND f.v = r.Pattern) OR
+                    (r.MatchType = 'startswith' AND f.v LIKE r.Pattern + N'%') OR
+                    (r.MatchType = 'contains'   AND f.v LIKE N'%' + r.Pattern + N'%') OR
+                    (r.MatchType = 'endswith'   AND f.v LIKE N'%' + r.Pattern)
+                  )
+            ) THEN 1 ELSE 0 END,
+            ExcMatch = CASE WHEN EXISTS (
+                SELECT 1
+                FROM @Rules AS r
+                CROSS APPLY (SELECT v = CASE r.FieldName
+                    WHEN N'Order_No'                THEN s.Order_No
+                    WHEN N'Article_number'          THEN s.Article_number
+                    WHEN N'Market'                  THEN s.Market
+                    WHEN N'Security_Scheme'         THEN s.Security_Scheme
+                    WHEN N'ProductTagZh'            THEN s.ProductTagZh
+                    WHEN N'LargeGroup'              THEN s.LargeGroup
+                    WHEN N'GroupName'               THEN s.GroupName
+                    WHEN N'Name_CN'                 THEN s.Name_CN
+                    WHEN N'Recipient_Name'          THEN s.Recipient_Name
+                    WHEN N'Partner_Name'            THEN s.Partner_Name
+                    WHEN N'ContainerNO_Realization' THEN s.ContainerNO_Realization
+                    WHEN N'CI_No'                   THEN s.CI_No
+                    WHEN N'RealizationDoc'          THEN s.RealizationDoc
+                    WHEN N'SpendingOrder_No'        THEN s.SpendingOrder_No
+                END) AS f
+                WHERE r.IsExclude = 1
+                  AND (
+                    (r.MatchType = 'nullorempty' AND (f.v IS NULL OR f.v = N'')) OR
+                    (r.MatchType = 'null'        AND f.v IS NULL) OR
+                    (r.MatchType = 'equals'     AND f.v = r.Pattern) OR
+                    (r.MatchType = 'startswith' AND f.v LIKE r.Pattern + N'%') OR
+                    (r.MatchType = 'contains'   AND f.v LIKE N'%' + r.Pattern + N'%') OR
+                    (r.MatchType = 'endswith'   AND f.v LIKE N'%' + r.Pattern)
+                  )
+            ) THEN 1 ELSE 0 END
+        FROM Orders.ShipmentData_Table AS s
+        WHERE s.SpendingOrder_ID IS NOT NULL
+          AND s.NomenclatureID IS NOT NULL
+          AND (@Full = 1 OR s.SpendingOrder_Date BETWEEN @DateFrom AND @DateTo)
+    ),
+    LineFlags AS (
+        SELECT
+            SpendingOrder_ID,
+            NomenclatureID,
+            OrderID_SpendingOrder_TableProduct,
+            SpendingOrder_Date,
+            Included = CASE
+                WHEN @HasInclude = 1 AND IncMatch = 1 THEN 1
+                WHEN @HasExclude = 1 AND ExcMatch = 0 THEN 1
+                WHEN @HasInclude = 0 AND @HasExclude = 0 THEN 1
+                ELSE 0
+            END
+        FROM Lines
+    ),
+    -- Флаг хранится по ключу, только если все строки ключа (например, при
+    -- нескольких совпадениях в Product_Guide) дают один результат; у
+    -- остальных ключей флага нет — они фильтруются правилами построчно
+    Src AS (
+        SELECT
+            SpendingOrder_ID,
+            NomenclatureID,
+            OrderID_SpendingOrder_TableProduct,
+            SpendingOrder_Date = MAX(SpendingOrder_Date),
+            IsIncluded = CAST(MAX(Included) AS BIT)
+        FROM LineFlags
+        GROUP BY SpendingOrder_ID, NomenclatureID, OrderID_SpendingOrder_TableProduct
+        HAVING MIN(Included) = MAX(Included)
+    )
+    MERGE Orders.ShipmentRule_Flags AS t
+    USING Src AS s
+       ON t.SpendingOrder_ID = s.SpendingOrder_ID
+      AND t.NomenclatureID = s.NomenclatureID
+      AND t.OrderID_SpendingOrder_TableProduct = s.OrderID_SpendingOrder_TableProduct
+    WHEN MATCHED AND (t.IsIncluded <> s.IsIncluded
+                      OR ISNULL(t.SpendingOrder_Date, '19000101') <> ISNULL(s.SpendingOrder_Date, '19000101')) THEN
+        UPDATE SET IsIncluded = s.IsIncluded,
+                   SpendingOrder_Date = s.SpendingOrder_Date,
+                   UpdatedAt = SYSDATETIME()
+    WHEN NOT MATCHED BY TARGET THEN
+        INSERT (SpendingOrder_ID, NomenclatureID, OrderID_SpendingOrder_TableProduct, SpendingOrder_Date, IsIncluded)
+        VALUES (s.SpendingOrder_ID, s.NomenclatureID, s.OrderID_SpendingOrder_TableProduct, s.SpendingOrder_Date, s.IsIncluded)
+    WHEN NOT MATCHED BY SOURCE
+         AND (@Full = 1 OR t.SpendingOrder_Date BETWEEN @DateFrom AND @DateTo) THEN
+        DELETE;
+
+    -- Оконный пересчёт не подтверждает флаги вне окна, поэтому версию
+    -- фиксирует только полный пересчёт (или окно при неизменных правилах)
+    IF @Full = 1
+    BEGIN
+        MERGE Orders.ShipmentRule_FlagState AS t
+        USING (SELECT 1 AS ID) AS s ON t.ID = s.ID
+        WHEN MATCHED THEN UPDATE SET RulesCount = @RulesCount, RulesChecksum = @RulesChecksum,
+                                     OrdersSnapshotID = @OrdersSnapshotID,
+                                     ProductGuideChecksum = @ProductGuideChecksum,
+                                     UpdatedAt = SYSDATETIME()
+        WHEN NOT MATCHED THEN INSERT (ID, RulesCount, RulesChecksum, OrdersSnapshotID, ProductGuideChecksum)
+                              VALUES (1, @RulesCount, @RulesChecksum, @OrdersSnapshotID, @ProductGuideChecksum);
+    END
+END
+GO
+
+-- 5. Представление отгрузок: добавлены SpendingOrder_ID и RuleIncluded
+CREATE OR ALTER VIEW Orders.ShipmentData_Table
+AS
+SELECT
+    t1.RealizationDoc,
+    t1.SpendingOrder_No,
+    CAST(t1.RealizationDate_Real    AS date) AS RealizationDate,
+    CAST(t1.SpendingOrder_Date_Real AS date) AS SpendingOrder_Date,
+    CAST(t1.ShipmentDate_Fact_Real  AS date) AS ShipmentDate_Fact,
+    t1.Recipient_Name,
+    t1.Partner_Name,
+    CASE
+        WHEN t1.ShipmentDate_Fact_Real IS NOT NULL
+            THEN CAST(t1.ShipmentDate_Fact_Real  AS date)
+        ELSE     CAST(t1.SpendingOrder_Date_Real AS date)
+        END AS ShipmentDate_Fact_Svod,
+    t2.LargeGroup                                    AS LargeGroup,
+    t1.OrderNo_SpendingOrder_TableProduct            AS Order_No,
+    n.ArticleTrim                                    AS Article_number,
+    t2.GroupName                                     AS GroupName,
+    t1.Name_CN,
+    t1.SpendingOrder_QTY,
+    t1.CBM,
+    CAST(COALESCE(t1.SpendingOrder_QTY, 0) * COALESCE(t1.CBM, 0) AS DECIMAL(18,6)) AS CBM_Total,
+    t1.CI_No,
+    t1.ContainerNO_Realization,
+    t1.Comment,
+    t1.OrderID_SpendingOrder_TableProduct,
+    t1.NomenclatureID,
+    ISNULL(MK.Market,          N'-') AS Market,
+    MK.Security_Scheme,
+    MK.ProductTagZh,
+    t1.SpendingOrder_ID,
+    -- NULL — флага нет (строка не пересчитана / строки ключа расходятся):
+    -- читатель применяет к строке сами правила
+    fl.IsIncluded AS RuleIncluded
+FROM Import_1C.vw_Shipments_Current AS t1
+
+         CROSS APPLY (
+    SELECT
+        ArticleTrim =
+            REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
+                                                    LTRIM(RTRIM(
+                                                            REPLACE(REPLACE(REPLACE(t1.Article_number, CHAR(9), ' '),
+                                                                            CHAR(160), ' '),
+                                                                    CHAR(13), ' ')
+                                                          )),
+                                                    '  ', ' '), '  ', ' '), '  ', ' '), '  ', ' '), '  ', ' ')
+) AS n
+
+         LEFT JOIN Ref.Product_Guide AS t2
+                   ON n.ArticleTrim = LTRIM(RTRIM(t2.FactoryNumber))
+
+         OUTER APPLY (
+    SELECT TOP (1)
+        ord.Market,
+        ord.Security_Scheme,
+        ord.ProductTagZh
+    FROM Import_1C.vw_Order_1C_v2_Current AS ord
+    WHERE ord.OrderID        = t1.OrderID_SpendingOrder_TableProduct
+      AND ord.NomenclatureID = t1.NomenclatureID
+) AS MK
+
+         LEFT JOIN Orders.ShipmentRule_Flags AS fl
+                   ON  fl.SpendingOrder_ID                   = t1.SpendingOrder_ID
+                   AND fl.NomenclatureID                     = t1.NomenclatureID
+                   AND fl.OrderID_SpendingOrder_TableProduct = t1.OrderID_SpendingOrder_TableProduct
+
+WHERE t1.OrderID_SpendingOrder_TableProduct IS NOT NULL
+  AND t1.OrderNo_SpendingOrder_TableProduct IS NOT NULL
+  AND t1.OrderNo_SpendingOrder_TableProduct <> ''
+GO
+
+-- 6. Первичный полный расчёт
+EXEC Orders.sp_Refresh_ShipmentRule_Flags;
+GO
+
+PRINT '========================================='
+PRINT 'Флаги правил отгрузок: Orders.ShipmentRule_Flags'
+PRINT 'Пересчёт: EXEC Orders.sp_Refresh_ShipmentRule_Flags [@DateFrom, @DateTo] [@IfStale = 1]'
+PRINT '========================================='
+GO
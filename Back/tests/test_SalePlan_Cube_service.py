@@ -0,0 +1,66 @@
+"""
+Куб План / Факт пересобирается при смене только Ref.Product_Guide
+(LargeGroup в обеих половинах берётся из него).
+"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pyodbc")
+pytest.importorskip("dotenv")
+
+_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path[:0] = [_ROOT, os.path.join(_ROOT, "Back")]
+
+from Back.orders.service.SalePlan import SalePlan_Cube_service as cube  # noqa: E402
+
+
+class _Cursor:
+    def __init__(self, versions):
+        self._versions = versions
+
+    def execute(self, sql, params=None):
+        assert sql == cube.CUBE_VERSION_SQL
+
+    def fetchone(self):
+        return self._versions
+
+
+class _Conn:
+    def __init__(self, guide_checksum):
+        # active versions count/checksum, orders snapshot, report 1, Product_Guide
+        self.versions = (2, 12345, "snap-1", 777, guide_checksum)
+
+    def cursor(self):
+        return _Cursor(self.versions)
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    calls = {"plan": 0, "fact": 0}
+
+    def _counter(half):
+        def _load(conn):
+            calls[half] += 1
+            return {}
+        return _load
+
+    monkeypatch.setattr(cube, "_load_plan_cells", _counter("plan"))
+    monkeypatch.setattr(cube, "_load_fact_cells", _counter("fact"))
+    for cache in (cube._plan_cache, cube._fact_cache):
+        monkeypatch.setitem(cache, "version", None)
+        monkeypatch.setitem(cache, "cells", None)
+    return calls
+
+
+def test_unchanged_versions_reuse_cube(loads):
+    cube.get_plan_fact_cube(_Conn(guide_checksum=1))
+    cube.get_plan_fact_cube(_Conn(guide_checksum=1))
+    assert loads == {"plan": 1, "fact": 1}
+
+
+def test_product_guide_change_rebuilds_both_halves(loads):
+    cube.get_plan_fact_cube(_Conn(guide_checksum=1))
+    cube.get_plan_fact_cube(_Conn(guide_checksum=2))
+    assert loads == {"plan": 2, "fact": 2}
@@ -4,6 +4,7 @@ import { PageLayout } from '../../components/Layout';
 import { usePageView } from '../../hooks/usePageView';
 import { useTranslation } from 'react-i18next';
 import { fetchJsonGetDedup } from '../../utils/fetchDedup';
+import { ResponsiveContainer, BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend } from 'recharts';
 
 interface User {
   user_id: number;
@@ -45,6 +46,45 @@ interface Permission {
   can_edit: boolean;
 }
 
+// GET /api/migration/metrics — averages per script; phases as avg_<phase>_ms
+interface MigrationMetricsSummary {
+  script_id: string;
+  cycles: number;
+  errors: number;
+  avg_duration_ms: number | null;
+  max_duration_ms: number | null;
+  rows_fetched: number | null;
+  bytes_fetched: number | null;
+  last_cycle: string | null;
+  [phase: string]: string | number | null;
+}
+
+// GET /api/migration/metrics/<script_id> — one point per time bucket
+interface MigrationMetricsPoint {
+  time: string;
+  duration_ms: number | null;
+  [phase: string]: string | number | null;
+}
+
+// Cycle phases of Migration.CycleMetrics (Migration/core/metrics.py)
+const MIGRATION_PHASES = [
+  { key: 'source_query_ms',    label: 'Source query',    color: '#3b82f6' },
+  { key: 'transform_ms',       label: 'Transform',       color: '#8b5cf6' },
+  { key: 'staging_insert_ms',  label: 'Staging insert',  color: '#10b981' },
+  { key: 'applock_wait_ms',    label: 'Applock wait',    color: '#f59e0b' },
+  { key: 'snapshot_switch_ms', label: 'Snapshot switch', color: '#ef4444' },
+  { key: 'refresh_ms',         label: 'Refresh',         color: '#06b6d4' },
+  { key: 'queue_wait_ms',      label: 'Queue wait',      color: '#9ca3af' },
+];
+const METRICS_SERIES_HOURS  = 24;
+const METRICS_SERIES_BUCKET = 15;   // minutes
+
+const formatMs = (ms: number | string | null | undefined) => {
+  if (ms == null) return '—';
+  const v = Number(ms);
+  return v >= 1000 ? `${(v / 1000).toFixed(1)} s` : `${Math.round(v)} ms`;
+};
+
 const AdminPage: React.FC = () => {
   const { token } = useAuth();
   const { i18n } = useTranslation();
@@ -111,6 +151,10 @@ const AdminPage: React.FC = () => {
   const [stoppingId, setStoppingId] = useState<string | null>(null);
   const [runNowId, setRunNowId] = useState<string | null>(null);
   const [expandedMigGroups, setExpandedMigGroups] = useState<Set<string>>(new Set());
+  const [migrationMetrics, setMigrationMetrics] = useState<MigrationMetricsSummary[]>([]);
+  const [metricsHours, setMetricsHours] = useState(1);
+  const [metricsSeries, setMetricsSeries] = useState<{ scriptId: string; points: MigrationMetricsPoint[] } | null>(null);
+  const [metricsSeriesLoading, setMetricsSeriesLoading] = useState(false);
   
   // State для модального окна удаления
   const [isDeleteModalOpen, setIsDeleteModalOpen] = useState(false);
@@ -198,6 +242,23 @@ const AdminPage: React.FC = () => {
     }
   }, [token]);
 
+  const fetchMigrationMetrics = React.useCallback(async () => {
+    if (!token) return;
+    try {
+      const res = await fetch(`/api/migration/metrics?hours=${metricsHours}`, {
+        headers: { 'Authorization': `Bearer ${token}` },
+      });
+      const data = await res.json();
+      if (Array.isArray(data)) {
+        setMigrationMetrics(data);
+      } else {
+        setMigrationError(data.error || 'Failed to load migration metrics');
+      }
+    } catch (e: any) {
+      setMigrationError(e.message);
+    }
+  }, [token, metricsHours]);
+
   // Auto-refresh migration status every 30 s when tab is active
   useEffect(() => {
     if (activeTab !== 'migration') return;
@@ -206,6 +267,13 @@ const AdminPage: React.FC = () => {
     return () => clearInterval(interval);
   }, [activeTab, fetchMigrationStatus]);
 
+  useEffect(() => {
+    if (activeTab !== 'migration') return;
+    fetchMigrationMetrics();
+    const interval = setInterval(fetchMigrationMetrics, 30000);
+    return () => clearInterval(interval);
+  }, [activeTab, fetchMigrationMetrics]);
+
   useEffect(() => {
     if (activeTab !== 'departments') return;
     loadDepartmentsAndUnassigned();
@@ -227,6 +295,27 @@ const AdminPage: React.FC = () => {
     }
   };
 
+  const handleShowMetrics = async (scriptId: string) => {
+    setMetricsSeriesLoading(true);
+    setMetricsSeries({ scriptId, points: [] });
+    try {
+      const res = await fetch(
+        `/api/migration/metrics/${scriptId}?hours=${METRICS_SERIES_HOURS}&bucket=${METRICS_SERIES_BUCKET}`,
+        { headers: { 'Authorization': `Bearer ${token}` } },
+      );
+      const data = await res.json();
+      if (Array.isArray(data.points)) {
+        setMetricsSeries({ scriptId, points: data.points });
+      } else {
+        setMigrationError(data.error || 'Failed to load cycle metrics');
+      }
+    } catch (e: any) {
+      setMigrationError(e.message);
+    } finally {
+      setMetricsSeriesLoading(false);
+    }
+  };
+
   const handleRestartScript = async (scriptId: string) => {
     setRestartingId(scriptId);
     try {
@@ -1463,6 +1552,12 @@ const AdminPage: React.FC = () => {
                                       >
                                         Logs
                                       </button>
+                                      <button
+                                        onClick={() => handleShowMetrics(script.script_id)}
+                                        className="px-2 py-1 text-xs bg-blue-100 text-blue-700 rounded hover:bg-blue-200 transition"
+                                      >
+                                        Metrics
+                                      </button>
 
                                       {/* Continuous scripts: Start (if stopped) or Restart + Stop */}
                                       {isContinuous && script.status === 'stopped' && (
@@ -1517,6 +1612,133 @@ const AdminPage: React.FC = () => {
               </div>
             ));
           })()}
+
+          {/* Cycle metrics: per-script averages */}
+          <div className="bg-white rounded-lg shadow overflow-hidden">
+            <div className="px-4 py-2.5 bg-gray-50 flex items-center justify-between">
+              <span className="font-bold text-gray-800 text-sm">Cycle Metrics</span>
+              <select
+                value={metricsHours}
+                onChange={(e) => setMetricsHours(Number(e.target.value))}
+                className="px-2 py-1 text-xs border border-gray-300 rounded-md bg-white"
+              >
+                <option value={1}>Last hour</option>
+                <option value={6}>Last 6 hours</option>
+                <option value={24}>Last 24 hours</option>
+              </select>
+            </div>
+
+            {migrationMetrics.length === 0 ? (
+              <div className="p-6 text-center text-sm text-gray-400">
+                No cycles recorded in this period (Migration.CycleMetrics).
+              </div>
+            ) : (
+              <table className="min-w-full text-sm border-t border-gray-100">
+                <thead className="bg-gray-50">
+                  <tr>
+                    <th className="px-4 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Script</th>
+                    <th className="px-4 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Cycles</th>
+                    <th className="px-4 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Errors</th>
+                    <th className="px-4 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Avg</th>
+                    <th className="px-4 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Max</th>
+                    <th className="px-4 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Rows Fetched</th>
+                    <th className="px-4 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider w-1/4">Phases (avg)</th>
+                    <th className="px-4 py-2 text-left text-xs font-medium text-gray-500 uppercase tracking-wider">Last Cycle</th>
+                  </tr>
+                </thead>
+                <tbody className="bg-white divide-y divide-gray-100">
+                  {migrationMetrics.map((m) => {
+                    const phaseTotal = MIGRATION_PHASES.reduce((sum, p) => sum + Number(m[`avg_${p.key}`] ?? 0), 0);
+                    return (
+                      <tr
+                        key={m.script_id}
+                        onClick={() => handleShowMetrics(m.script_id)}
+                        className={`cursor-pointer hover:bg-gray-50 ${metricsSeries?.scriptId === m.script_id ? 'bg-blue-50' : ''}`}
+                      >
+                        <td className="px-4 py-2 text-xs text-gray-700 font-mono">{m.script_id}</td>
+                        <td className="px-4 py-2 text-gray-600">{m.cycles}</td>
+                        <td className={`px-4 py-2 ${m.errors ? 'text-red-600 font-medium' : 'text-gray-400'}`}>{m.errors}</td>
+                        <td className="px-4 py-2 text-gray-600">{formatMs(m.avg_duration_ms)}</td>
+                        <td className="px-4 py-2 text-gray-600">{formatMs(m.max_duration_ms)}</td>
+                        <td className="px-4 py-2 text-gray-600">{m.rows_fetched ?? '—'}</td>
+                        <td className="px-4 py-2">
+                          {phaseTotal > 0 ? (
+                            <div className="flex h-2.5 w-full rounded-full overflow-hidden bg-gray-100">
+                              {MIGRATION_PHASES.map((p) => {
+                                const value = Number(m[`avg_${p.key}`] ?? 0);
+                                return value > 0 ? (
+                                  <div
+                                    key={p.key}
+                                    style={{ width: `${(value / phaseTotal) * 100}%`, backgroundColor: p.color }}
+                                    title={`${p.label}: ${formatMs(value)}`}
+                                  />
+                                ) : null;
+                              })}
+                            </div>
+                          ) : (
+                            <span className="text-gray-400">—</span>
+                          )}
+                        </td>
+                        <td className="px-4 py-2 text-xs text-gray-500">{m.last_cycle ?? '—'}</td>
+                      </tr>
+                    );
+                  })}
+                </tbody>
+              </table>
+            )}
+          </div>
+
+          {/* Cycle metrics: per-phase time series of one script */}
+          {metricsSeries && (
+            <div className="bg-white rounded-lg shadow p-4">
+              <div className="flex items-center justify-between mb-3">
+                <div>
+                  <span className="font-semibold text-gray-800 text-sm">{metricsSeries.scriptId}</span>
+                  <span className="ml-2 text-xs text-gray-500">
+                    phase timings, last {METRICS_SERIES_HOURS} h, {METRICS_SERIES_BUCKET}-min averages
+                  </span>
+                </div>
+                <button
+                  onClick={() => setMetricsSeries(null)}
+                  className="text-gray-400 hover:text-gray-600 text-xl leading-none"
+                >
+                  ×
+                </button>
+              </div>
+
+              {metricsSeriesLoading ? (
+                <div className="py-10 text-center text-sm text-gray-400">Loading…</div>
+              ) : metricsSeries.points.length === 0 ? (
+                <div className="py-10 text-center text-sm text-gray-400">No cycles recorded in this period.</div>
+              ) : (
+                <div className="h-72">
+                  <ResponsiveContainer width="100%" height="100%">
+                    <BarChart data={metricsSeries.points} margin={{ top: 10, right: 20, left: 10, bottom: 0 }}>
+                      <CartesianGrid stroke="#EAEDF5" strokeDasharray="3 3" vertical={false} />
+                      <XAxis
+                        dataKey="time"
+                        tickFormatter={(v: string) => v.slice(11, 16)}
+                        tick={{ fontSize: 11, fill: '#A3A3A3' }}
+                        tickLine={false}
+                        minTickGap={20}
+                      />
+                      <YAxis
+                        tickFormatter={(v: number) => formatMs(v)}
+                        tick={{ fontSize: 11, fill: '#A3A3A3' }}
+                        tickLine={false}
+                        width={60}
+                      />
+                      <Tooltip formatter={(v: any) => formatMs(v)} />
+                      <Legend wrapperStyle={{ fontSize: 12 }} />
+                      {MIGRATION_PHASES.map((p) => (
+                        <Bar key={p.key} dataKey={p.key} name={p.label} stackId="phases" fill={p.color} />
+                      ))}
+                    </BarChart>
+                  </ResponsiveContainer>
+                </div>
+              )}
+            </div>
+          )}
         </div>
       )}
 
@@ -17,8 +17,60 @@ Usage in each module's copy_script.py:
 
     if __name__ == "__main__":
         MyScript().run()
+
+Incremental (change-data-capture) mode:
+
+    class MyScript(BaseMigration):
+        incremental     = True
+        reconcile_every = 10     # every 10th cycle re-reads the full window
+
+        def run_once(self) -> int:
+            # full window refresh; also stores the high-water mark
+            ...
+
+        def run_incremental(self) -> int:
+            since = self.load_watermark(cur_t, "source")
+            # fetch rows changed since the mark, apply_changes(...),
+            # save_watermark(...) in the same target transaction
+            ...
+
+The first cycle after start and every ``reconcile_every``-th cycle call
+``run_once()`` (catches physical deletes in the source); all other cycles
+call ``run_incremental()``.  High-water marks live in Migration.SyncWatermark.
+
+Hash-diff stage (windowed scripts that must re-read the whole window):
+
+    class MyScript(BaseMigration):
+        diff_keys = ("OrderID", "NomenclatureID")   # business key
+
+``self.differ`` (core.diff.RowDiffer) then tells which keys changed since the
+previous cycle; see core/diff.py for the cycle layout.
+
+Downstream refreshes (derived caches) are declared in scripts_config.py and
+queued with ``self.queue_refreshes(cur_t, changed_dates)`` inside the data
+transaction; runner.py runs them coalesced (see core/refresh.py).
+
+Adaptive interval (continuous scripts whose source is busy in bursts):
+
+    class MyScript(BaseMigration):
+        interval_seconds     = 60
+        adaptive             = True
+        min_interval_seconds = 30
+        max_interval_seconds = 600
+        calendar_aware       = True   # core/shifts.py
+
+After a cycle that found changes the pause is halved, after a quiet cycle
+it grows by half, within [min, max].  With ``calendar_aware`` the pause
+stays <= ``interval_seconds`` during working shifts and >= it outside them.
+"Found changes" is ``records > 0`` unless the cycle sets
+``self.cycle_changed`` itself (e.g. from the diff stage).
+
+Every cycle writes a row of per-phase timings and row counts to
+Migration.CycleMetrics (core/metrics.py); mark script-specific phases with
+``with metrics.phase("snapshot_switch"): ...``.
 """
 import abc
+import inspect
 import logging
 import os
 import time
@@ -26,12 +78,25 @@ from datetime import datetime
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
 
+from core import metrics
+from core.diff import RowDiffer
+
 
 class BaseMigration(abc.ABC):
     script_id: str = ""
     script_name: str = ""
     interval_seconds: int = 60
     category: str = "continuous"
+    incremental: bool = False
+    reconcile_every: int = 0   # 0 = only the first cycle runs the full window
+    diff_keys: tuple = ()      # business key for the hash-diff stage; () = off
+    adaptive: bool = False     # pause follows the observed change rate
+    min_interval_seconds: int = 0   # 0 = interval_seconds
+    max_interval_seconds: int = 0   # 0 = interval_seconds
+    calendar_aware: bool = False    # clamp by working shifts (core/shifts.py)
+
+    INTERVAL_SHRINK = 0.5
+    INTERVAL_GROW   = 1.5
 
     @staticmethod
     def acquire_applock(cur, resource: str, timeout_ms: int = 120_000) -> None:
@@ -47,23 +112,156 @@ class BaseMigration(abc.ABC):
 
         Example resource name: ``"Migration_Daily_PlanFact"``
         """
+        with metrics.phase("applock_wait"):
+            cur.execute(
+                """
+                DECLARE @res INT;
+                EXEC @res = sp_getapplock
+                    @Resource    = ?,
+                    @LockMode    = 'Exclusive',
+                    @LockOwner   = 'Transaction',
+                    @LockTimeout = ?;
+                IF @res < 0
+                    RAISERROR(N'Could not acquire app lock ''%s'' (sp_getapplock result=%d)',
+                              16, 1, ?, @res);
+                """,
+                (resource, timeout_ms, resource),
+            )
+
+    @staticmethod
+    def source_rowversion(cur) -> bytes:
+        """
+        MIN_ACTIVE_ROWVERSION() of the source database, read BEFORE the data.
+        Every row written by a still-open transaction gets a version >= this
+        value, so ``_Version >= mark`` on the next cycle misses nothing.
+        """
+        cur.execute("SELECT MIN_ACTIVE_ROWVERSION()")
+        return bytes(cur.fetchone()[0])
+
+    def load_watermark(self, cur, source: str):
+        """
+        Return the stored high-water mark of this script for ``source``:
+        ``bytes`` for a rowversion mark, ``datetime`` for a period mark,
+        ``None`` if nothing has been stored yet.
+        """
         cur.execute(
             """
-            DECLARE @res INT;
-            EXEC @res = sp_getapplock
-                @Resource    = ?,
-                @LockMode    = 'Exclusive',
-                @LockOwner   = 'Transaction',
-                @LockTimeout = ?;
-            IF @res < 0
-                RAISERROR(N'Could not acquire app lock ''%s'' (sp_getapplock result=%d)',
-                          16, 1, ?, @res);
+            SELECT RowVersionMark, PeriodMark
+            FROM Migration.SyncWatermark
+            WHERE ScriptID = ? AND SourceName = ?
             """,
-            (resource, timeout_ms, resource),
+            (self.script_id, source),
         )
+        row = cur.fetchone()
+        if row is None:
+            return None
+        return bytes(row[0]) if row[0] is not None else row[1]
+
+    def save_watermark(self, cur, source: str, mark) -> None:
+        """
+        Upsert the high-water mark.  Does NOT commit — call it inside the
+        transaction that applies the changes so data and mark move together.
+        """
+        is_version = isinstance(mark, (bytes, bytearray))
+        cur.execute(
+            """
+            MERGE Migration.SyncWatermark AS t
+            USING (SELECT ? AS ScriptID, ? AS SourceName) AS s
+               ON t.ScriptID = s.ScriptID AND t.SourceName = s.SourceName
+            WHEN MATCHED THEN
+                UPDATE SET RowVersionMark = ?, PeriodMark = ?, UpdatedAt = GETDATE()
+            WHEN NOT MATCHED THEN
+                INSERT (ScriptID, SourceName, RowVersionMark, PeriodMark)
+                VALUES (s.ScriptID, s.SourceName, ?, ?);
+            """,
+            (
+                self.script_id, source,
+                bytes(mark) if is_version else None, None if is_version else mark,
+                bytes(mark) if is_version else None, None if is_version else mark,
+            ),
+        )
+
+    def queue_refreshes(self, cur, dates=()) -> int:
+        """
+        Queue the derived refreshes this script feeds (its ``"refreshes"`` in
+        scripts_config.py) for ``dates``.  Does NOT commit — call it in the
+        transaction that switches the data, so data and request move together.
+        """
+        from core.refresh import queue_refreshes, refreshes_for
+        return queue_refreshes(cur, self.script_id, refreshes_for(inspect.getfile(type(self))), dates)
+
+    @staticmethod
+    def apply_changes(cur, staging: str, target: str, snapshot_id: str | None,
+                      key_column, changed_keys, columns) -> None:
+        """
+        Replace the rows of ``changed_keys`` in the current snapshot of
+        ``target`` with the staging rows of ``snapshot_id`` (upsert by key +
+        delete of keys that no longer have rows), then clear the staging.
+
+        ``key_column`` is a column name (keys are scalars) or a sequence of
+        names for a composite business key (keys are tuples; NULL parts
+        match NULL).
+
+        Keys present in ``changed_keys`` but absent from staging are simply
+        deleted — that is how unposted / filtered-out documents disappear.
+        ``snapshot_id=None`` is for plain tables without a SnapshotID column
+        (the whole staging table is applied).
+        Must be called under the module's app lock; does NOT commit.
+        """
+        with metrics.phase("snapshot_switch"):
+            composite = not isinstance(key_column, str)
+            key_cols = list(key_column) if composite else [key_column]
+            cur.execute(f"SELECT TOP (0) {', '.join(key_cols)} INTO #cdc_keys FROM {target}")
+            try:
+                if composite:
+                    keys = [tuple(k) for k in set(changed_keys)]
+                else:
+                    keys = [(k,) for k in set(changed_keys) if k is not None]
+                if keys:
+                    cur.fast_executemany = True
+                    cur.executemany(
+                        f"INSERT INTO #cdc_keys ({', '.join(key_cols)}) "
+                        f"VALUES ({', '.join('?' * len(key_cols))})",
+                        keys,
+                    )
+                if composite:
+                    match = " AND ".join(
+                        f"(k.{c} = t.{c} OR (k.{c} IS NULL AND t.{c} IS NULL))" for c in key_cols
+                    )
+                else:
+                    match = f"k.{key_column} = t.{key_column}"
+                if snapshot_id is None:
+                    where, params = "", ()
+                    col_list = ", ".join(columns)
+                else:
+                    where, params = "WHERE SnapshotID = ?", (snapshot_id,)
+                    col_list = ", ".join(["SnapshotID"] + [c for c in columns if c != "SnapshotID"])
+                cur.execute(
+                    f"""
+                    DELETE t FROM {target} AS t
+                    JOIN #cdc_keys AS k ON {match}
+                    {where.replace("SnapshotID", "t.SnapshotID")};
+                    """,
+                    *params,
+                )
+                cur.execute(
+                    f"""
+                    INSERT INTO {target} ({col_list})
+                    SELECT {col_list} FROM {staging} {where};
+                    """,
+                    *params,
+                )
+                cur.execute(f"DELETE FROM {staging} {where}", *params)
+            finally:
+                cur.execute("DROP TABLE IF EXISTS #cdc_keys")
 
     def __init__(self):
         self._logger: logging.Logger | None = None
+        self._cycle_no = 0
+        self.last_error: str | None = None   # error of the last cycle, None after success
+        self.cycle_changed: bool | None = None   # set by a cycle; None → records > 0
+        self.current_interval: float = self.interval_seconds
+        self.differ: RowDiffer | None = RowDiffer(self.diff_keys) if self.diff_keys else None
 
     # ── Abstract interface ────────────────────────────────────────────────────
 
@@ -72,22 +270,34 @@ class BaseMigration(abc.ABC):
         """Execute one sync cycle. Returns number of records processed."""
         ...
 
+    def run_incremental(self) -> int:
+        """
+        Execute one incremental cycle (only rows changed since the stored
+        high-water mark).  Override together with ``incremental = True``.
+        """
+        return self.run_once()
+
     # ── Public entry point ────────────────────────────────────────────────────
 
     def run(self) -> None:
         """
         Main entry point — called from each module's __main__ block.
-        Runs run_once() immediately, then loops with interval_seconds pause.
+        Runs run_once() immediately, then loops with a current_interval pause
+        (= interval_seconds unless ``adaptive``).
         """
+        from core.db import enable_process_pooling
+
         logger = self.get_logger()
         pid = os.getpid()
         logger.info(f"=== {self.script_name} started (PID={pid}) ===")
+        # Cycles and status writes reuse the same few sessions (core/db.py)
+        enable_process_pooling()
         self._report_status("running", pid=pid)
 
         try:
             self._execute_cycle(logger)
             while True:
-                time.sleep(self.interval_seconds)
+                time.sleep(self.current_interval)
                 self._execute_cycle(logger)
         except KeyboardInterrupt:
             logger.info(f"=== {self.script_name} stopped by user ===")
@@ -110,17 +320,65 @@ class BaseMigration(abc.ABC):
 
     # ── Internal helpers ──────────────────────────────────────────────────────
 
+    def _run_cycle(self) -> tuple[int, str]:
+        """Pick the cycle mode: full window (run_once) or incremental."""
+        self._cycle_no += 1
+        self.cycle_changed = None
+        if not self.incremental:
+            return self.run_once(), "full"
+        reconcile = self._cycle_no == 1 or (
+            self.reconcile_every > 0 and self._cycle_no % self.reconcile_every == 0
+        )
+        if reconcile:
+            return self.run_once(), "full"
+        metrics.current().mode = "incremental"
+        return self.run_incremental(), "incremental"
+
     def _execute_cycle(self, logger: logging.Logger) -> int:
+        cycle_metrics = metrics.CycleMetrics(self.script_id, self._cycle_no + 1)
+        metrics.set_current(cycle_metrics)
         try:
-            records = self.run_once()
+            records, mode = self._run_cycle()
             records = records if isinstance(records, int) else 0
-            logger.info(f"[OK] {records} records processed")
+            logger.info(f"[OK] {records} records processed ({mode})")
+            self.last_error = None
+            metrics.record(cycle_metrics, "success", records)
+            if self.adaptive:
+                self._adapt_interval(self.found_changes(records), logger)
             self._report_status("success", records=records)
             return records
         except Exception as e:
             logger.error(f"[ERROR] {e}", exc_info=True)
+            self.last_error = str(e)
+            metrics.record(cycle_metrics, "error")
             self._report_status("error", error=str(e))
             return 0
+        finally:
+            metrics.set_current(None)
+
+    def found_changes(self, records: int) -> bool:
+        """Did the last successful cycle change anything?"""
+        if self.cycle_changed is not None:
+            return self.cycle_changed
+        return records > 0
+
+    def _adapt_interval(self, changed: bool, logger: logging.Logger) -> None:
+        """Shrink the pause after changes, grow it after a quiet cycle."""
+        lo = self.min_interval_seconds or self.interval_seconds
+        hi = self.max_interval_seconds or self.interval_seconds
+        if self.calendar_aware:
+            from core.shifts import is_working_time
+            working = is_working_time()
+            if working is True:
+                hi = min(hi, self.interval_seconds)
+            elif working is False:
+                lo = max(lo, self.interval_seconds)
+
+        factor = self.INTERVAL_SHRINK if changed else self.INTERVAL_GROW
+        new = min(max(self.current_interval * factor, lo), hi)
+        if round(new) != round(self.current_interval):
+            logger.info(f"[INTERVAL] {self.current_interval:.0f}s → {new:.0f}s")
+        self.current_interval = new
 
     def _report_status(
         self,
@@ -129,7 +387,11 @@ class BaseMigration(abc.ABC):
         error: str | None = None,
         pid: int | None = None,
     ) -> None:
-        """Write/update row in Migration.ScriptStatus. Never raises."""
+        """
+        Write/update row in Migration.ScriptStatus. Never raises.
+        With pooling the write goes over the session the cycle just used.
+        """
+        conn = None
         try:
             from core.db import get_target_connection
             _pid = pid if pid is not None else os.getpid()
@@ -191,10 +453,15 @@ class BaseMigration(abc.ABC):
 
             conn.commit()
             cur.close()
-            conn.close()
         except Exception:
             # Status reporting must never crash the migration script itself
             pass
+        finally:
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
 
     def get_logger(self) -> logging.Logger:
         if self._logger is not None:
@@ -0,0 +1,149 @@
+"""
+Local control channel: admin commands → runner.py / scheduler.py.
+
+The admin API still records a command in Migration.ScriptStatus (the status
+the panel shows), then delivers it right away over HTTP on the loopback
+interface:
+
+    POST http://127.0.0.1:<port>/command   {"script_id": "...", "command": "restart_requested"}
+
+runner.py listens on ``RUNNER_PORT`` (continuous scripts), scheduler.py on
+``SCHEDULER_PORT`` (scheduled ones).  The server thread only validates the
+request and queues it; the main loop of the process takes it with
+``ControlServer.get(timeout)`` instead of sleeping, so a command is acted on
+within milliseconds and on the same thread as before.
+
+The DB is read only at startup and every ``FALLBACK_POLL_SECONDS`` by the
+processes, to pick up commands written while they were down or while the
+channel was unreachable (``notify`` returns False then).
+
+Set ``MIGRATION_CONTROL_TOKEN`` on both sides to require it in the
+``X-Control-Token`` header.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable
+
+HOST           = os.getenv("MIGRATION_CONTROL_HOST", "127.0.0.1")
+RUNNER_PORT    = int(os.getenv("MIGRATION_RUNNER_CONTROL_PORT", "8765"))
+SCHEDULER_PORT = int(os.getenv("MIGRATION_SCHEDULER_CONTROL_PORT", "8766"))
+TOKEN          = os.getenv("MIGRATION_CONTROL_TOKEN", "")
+
+FALLBACK_POLL_SECONDS = 300
+SEND_TIMEOUT          = 2
+
+COMMANDS = ("restart_requested", "stop_requested", "run_now_requested")
+
+_PORTS = {"continuous": RUNNER_PORT, "scheduled": SCHEDULER_PORT}
+
+# Loopback only — never through an HTTP(S)_PROXY from the environment
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+class ControlServer:
+    """HTTP listener that queues (script_id, command) for the owning process."""
+
+    def __init__(self, port: int, script_ids: Iterable[str], host: str = HOST,
+                 logger: logging.Logger | None = None):
+        self.host = host
+        self.port = port
+        self.script_ids = set(script_ids)
+        self.logger = logger or logging.getLogger(__name__)
+        self._commands: queue.Queue = queue.Queue()
+        self._server: ThreadingHTTPServer | None = None
+
+    def start(self) -> bool:
+        """Start listening; False (logged) if the port is taken — DB fallback only then."""
+        try:
+            self._server = ThreadingHTTPServer((self.host, self.port), self._handler())
+        except OSError as e:
+            self.logger.warning(f"Control channel unavailable on {self.host}:{self.port}: {e}")
+            return False
+        threading.Thread(target=self._server.serve_forever, name="control-channel", daemon=True).start()
+        self.logger.info(f"Control channel listening on {self.host}:{self.port}")
+        return True
+
+    def get(self, timeout: float) -> tuple[str, str] | None:
+        """Next queued command, waiting up to ``timeout`` seconds; None if none came."""
+        try:
+            return self._commands.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/health":
+                    self._reply(200, {"ok": True})
+                else:
+                    self._reply(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path != "/command":
+                    return self._reply(404, {"error": "not found"})
+                if TOKEN and self.headers.get("X-Control-Token") != TOKEN:
+                    return self._reply(403, {"error": "bad token"})
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    script_id, command = body["script_id"], body["command"]
+                except (ValueError, KeyError, TypeError):
+                    return self._reply(400, {"error": "expected JSON {script_id, command}"})
+                if command not in COMMANDS:
+                    return self._reply(400, {"error": f"unknown command '{command}'"})
+                if script_id not in server.script_ids:
+                    return self._reply(404, {"error": f"script '{script_id}' is not managed here"})
+                server._commands.put((script_id, command))
+                self._reply(202, {"queued": True})
+
+            def _reply(self, code: int, payload: dict) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        return Handler
+
+
+def port_for(script_id: str) -> int | None:
+    """Control port of the process that owns ``script_id`` (by its scripts_config category)."""
+    import scripts_config
+    for cfg in scripts_config.SCRIPTS:
+        if cfg["id"] == script_id:
+            return _PORTS.get(cfg.get("category"))
+    return None
+
+
+def notify(script_id: str, command: str, host: str = HOST, timeout: float = SEND_TIMEOUT) -> bool:
+    """Deliver ``command`` to the owning process.  True if it was queued there; never raises."""
+    try:
+        port = port_for(script_id)
+        if port is None:
+            return False
+        request = urllib.request.Request(
+            f"http://{host}:{port}/command",
+            data=json.dumps({"script_id": script_id, "command": command}).encode(),
+            headers={"Content-Type": "application/json", "X-Control-Token": TOKEN},
+            method="POST",
+        )
+        with _opener.open(request, timeout=timeout) as response:
+            return response.status == 202
+    except Exception:
+        return False
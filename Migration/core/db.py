@@ -1,9 +1,62 @@
 """
 Shared database connection helpers for all migration scripts.
+
+In the in-process runner (``runner.py --inprocess``) many jobs share one
+interpreter; ``enable_pooling()`` then makes ``get_*_connection()`` hand out
+connections from a bounded pool per server.  Scripts keep calling
+``conn.close()`` as usual — that returns the connection to the pool — and the
+pool size caps how many jobs can talk to one server at the same time.
+
+A continuous script run as its own process (``BaseMigration.run``) pools too,
+with ``enable_process_pooling()``: its cycles and status writes then reuse a
+few long-lived sessions instead of logging in to 1C and the target every
+cycle.  A connection idle for more than ``POOL_PING_SECONDS`` is checked with
+``SELECT 1`` before it is handed out; a dead one is closed and replaced.
+
+A job waiting for a free connection logs a warning every
+``POOL_WAIT_WARN_SECONDS`` and gives up with ``PoolTimeout`` after
+``POOL_ACQUIRE_TIMEOUT`` — a leaked or hung connection then fails the cycles
+waiting on that server instead of stalling them for good.
+
+Pooled connections also keep prepared statements: ``prepared_cursor(cur,
+sql)`` returns a cursor of the same connection reserved for ``sql``, so the
+driver prepares a repeated INSERT once per session, not once per cycle.
+
+Record / replay (``replay.py``): ``record_source("1c", path)`` makes
+``get_1c_connection()`` capture every result set the scripts read (cursor
+description and rows) and ``save_captures()`` writes them to a gzip-compressed
+fixture; ``replay_source("1c", path)`` then serves the same result sets from
+the fixture without a server, so a module's ``run_once`` can be repeated
+against a local target database.
 """
+import gzip
+import logging
+import pickle
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Sequence
+
 import pyodbc
+from core import metrics
 from core.config import db_config_1c, db_config_target, db_config_skud
 
+POOL_IDLE_SECONDS      = 300    # idle pooled connections older than this are closed
+POOL_PING_SECONDS      = 30     # idle longer than this → liveness check before reuse
+POOL_ACQUIRE_TIMEOUT   = 1800   # longest wait for a free connection (a full sync holds one for minutes)
+POOL_WAIT_WARN_SECONDS = 60     # warning this often while waiting
+MAX_STATEMENTS         = 32     # prepared cursors kept per pooled connection
+
+# Standalone continuous script: its own small pools, idle longer than any interval
+PROCESS_POOL_SIZES        = {"1c": 2, "target": 3, "skud": 1}
+PROCESS_POOL_IDLE_SECONDS = 7200
+
+# Undo per-script session settings before a connection goes back to the pool
+_RESET_SESSION_SQL = "SET XACT_ABORT OFF; SET LOCK_TIMEOUT -1;"
+
+logger = logging.getLogger(__name__)
+
 
 def _build_conn_str(cfg: dict) -> str:
     return (
@@ -16,19 +69,505 @@ def _build_conn_str(cfg: dict) -> str:
     )
 
 
+class PooledConnection:
+    """pyodbc connection proxy whose ``close()`` returns it to its pool."""
+
+    def __init__(self, pool: "ConnectionPool", conn: pyodbc.Connection):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+
+    def __getattr__(self, name):
+        conn = object.__getattribute__(self, "_conn")
+        if conn is None:
+            raise pyodbc.ProgrammingError("Attempt to use a closed connection.")
+        return getattr(conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Same semantics as pyodbc.Connection: commit on success, no close
+        if exc_type is None:
+            self._conn.commit()
+        else:
+            self._conn.rollback()
+
+    def close(self) -> None:
+        conn = object.__getattribute__(self, "_conn")
+        if conn is None:
+            return
+        object.__setattr__(self, "_conn", None)
+        self._pool._release(conn)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class PoolTimeout(TimeoutError):
+    """No pooled connection became free within ``POOL_ACQUIRE_TIMEOUT``."""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of connections to one server.  ``acquire()`` blocks while
+    ``size`` connections are checked out, at most ``acquire_timeout``
+    seconds.  Released connections are rolled back and reset; a connection
+    that fails that is dropped, not reused.
+    """
+
+    def __init__(self, conn_str: str, size: int, idle_seconds: int = POOL_IDLE_SECONDS,
+                 name: str = "", acquire_timeout: float = POOL_ACQUIRE_TIMEOUT):
+        self.conn_str = conn_str
+        self.size = size
+        self.idle_seconds = idle_seconds
+        self.name = name
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle: list[tuple[pyodbc.Connection, float]] = []
+
+    def _wait_slot(self) -> None:
+        start = time.monotonic()
+        while True:
+            left = self.acquire_timeout - (time.monotonic() - start)
+            if left <= 0:
+                raise PoolTimeout(
+                    f"no free '{self.name}' connection in {self.acquire_timeout:.0f} s "
+                    f"(pool size {self.size}): a connection is leaked or a query hangs"
+                )
+            if self._slots.acquire(timeout=min(POOL_WAIT_WARN_SECONDS, left)):
+                return
+            logger.warning("waiting %.0f s for a free '%s' connection (pool size %d)",
+                           time.monotonic() - start, self.name, self.size)
+
+    def acquire(self) -> PooledConnection:
+        self._wait_slot()
+        try:
+            conn = self._take_idle()
+            if conn is None:
+                conn = pyodbc.connect(self.conn_str)
+                _statements[id(conn)] = {}
+        except BaseException:
+            self._slots.release()
+            raise
+        return PooledConnection(self, conn)
+
+    def _take_idle(self) -> pyodbc.Connection | None:
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                if not self._idle:
+                    return None
+                conn, since = self._idle.pop()
+            if now - since > self.idle_seconds:
+                _close_quietly(conn)
+            elif now - since <= POOL_PING_SECONDS or _alive(conn):
+                return conn
+            else:
+                _close_quietly(conn)
+
+    def _release(self, conn: pyodbc.Connection) -> None:
+        try:
+            conn.rollback()
+            conn.autocommit = False
+            cur = conn.cursor()
+            cur.execute(_RESET_SESSION_SQL)
+            cur.close()
+        except Exception:
+            _close_quietly(conn)
+        else:
+            with self._lock:
+                self._idle.append((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            _close_quietly(conn)
+
+
+def _alive(conn) -> bool:
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT 1")
+        cur.fetchall()
+        cur.close()
+        return True
+    except Exception:
+        return False
+
+
+def _close_quietly(conn) -> None:
+    for cur in (_statements.pop(id(conn), None) or {}).values():
+        try:
+            cur.close()
+        except Exception:
+            pass
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+# id(pooled pyodbc connection) → {sql: cursor prepared for it}
+_statements: dict[int, dict[str, pyodbc.Cursor]] = {}
+
+
+def prepared_cursor(cur, sql: str):
+    """
+    Cursor for executing ``sql`` repeatedly in ``cur``'s session: on a pooled
+    connection a cursor kept for that statement text (fast_executemany on),
+    prepared once and reused by later cycles; otherwise ``cur`` itself.
+    Shares the transaction of ``cur``.
+    """
+    statements = _statements.get(id(cur.connection))
+    if statements is None:
+        return cur
+    prepared = statements.pop(sql, None)
+    if prepared is None:
+        prepared = cur.connection.cursor()
+        prepared.fast_executemany = True
+        if len(statements) >= MAX_STATEMENTS:
+            oldest = next(iter(statements))
+            try:
+                statements.pop(oldest).close()
+            except Exception:
+                pass
+    statements[sql] = prepared   # most recently used last
+    return prepared
+
+
+# ── Record / replay of source result sets ─────────────────────────────────────
+
+FIXTURE_VERSION = 1
+
+
+class ReplayMiss(LookupError):
+    """A replayed source was asked for more result sets than were recorded."""
+
+
+def _params(params: tuple) -> tuple:
+    """``execute(sql, a, b)`` and ``execute(sql, (a, b))`` → (a, b)."""
+    if len(params) == 1 and isinstance(params[0], (list, tuple)):
+        return tuple(params[0])
+    return tuple(params)
+
+
+class Fixture:
+    """Result sets of one source during a run, in execution order."""
+
+    def __init__(self, path, statements: list[dict] | None = None):
+        self.path = Path(path)
+        self.statements = statements if statements is not None else []
+        self._used: set[int] = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path) -> "Fixture":
+        with gzip.open(path, "rb") as f:
+            data = pickle.load(f)
+        if data.get("version") != FIXTURE_VERSION:
+            raise ValueError(f"{path}: fixture version {data.get('version')}, expected {FIXTURE_VERSION}")
+        return cls(path, data["statements"])
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.path, "wb", compresslevel=6) as f:
+            pickle.dump(
+                {"version": FIXTURE_VERSION, "recorded_at": datetime.now(), "statements": self.statements},
+                f, protocol=pickle.HIGHEST_PROTOCOL,
+            )
+
+    def add(self, sql: str, params: tuple, description) -> dict:
+        entry = {
+            "sql": sql,
+            "params": params,
+            "description": [tuple(c) for c in description] if description else None,
+            "rows": [],
+        }
+        with self._lock:
+            self.statements.append(entry)
+        return entry
+
+    def take(self, sql: str, params: tuple) -> dict:
+        """
+        The recorded result of ``sql``/``params``; if the text differs (the
+        date window moved since recording) the next unused result in order.
+        """
+        with self._lock:
+            pending = [i for i in range(len(self.statements)) if i not in self._used]
+            if not pending:
+                raise ReplayMiss(f"{self.path}: no recorded result left for: {sql.strip()[:80]}")
+            i = next(
+                (i for i in pending
+                 if self.statements[i]["sql"] == sql and self.statements[i]["params"] == params),
+                pending[0],
+            )
+            self._used.add(i)
+            return self.statements[i]
+
+    def rewind(self) -> None:
+        """Make every recorded result available again (before the next replayed cycle)."""
+        with self._lock:
+            self._used.clear()
+
+
+class _RecordingCursor:
+    """Real cursor that copies what is fetched from it into a Fixture."""
+
+    def __init__(self, cur, fixture: Fixture):
+        self._cur = cur
+        self._fixture = fixture
+        self._entry: dict | None = None
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+    def execute(self, sql, *params):
+        self._cur.execute(sql, *params)
+        self._entry = self._fixture.add(sql, _params(params), self._cur.description)
+        return self
+
+    def _keep(self, rows) -> None:
+        if self._entry is not None:
+            self._entry["rows"].extend(tuple(r) for r in rows)
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        if row is not None:
+            self._keep((row,))
+        return row
+
+    def fetchmany(self, size: int | None = None):
+        rows = self._cur.fetchmany(size) if size else self._cur.fetchmany()
+        self._keep(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cur.fetchall()
+        self._keep(rows)
+        return rows
+
+    def __iter__(self):
+        while (row := self.fetchone()) is not None:
+            yield row
+
+
+class _RecordingConnection:
+    """Connection proxy whose cursors record into a Fixture."""
+
+    def __init__(self, conn, fixture: Fixture):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_fixture", fixture)
+
+    def __getattr__(self, name):
+        return getattr(object.__getattribute__(self, "_conn"), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._conn.__exit__(exc_type, exc, tb)
+
+    def cursor(self):
+        return _RecordingCursor(self._conn.cursor(), self._fixture)
+
+
+class ReplayRow(tuple):
+    """Replayed row: a tuple that also answers ``row.ColumnName`` like pyodbc.Row."""
+    __slots__ = ()
+    _index: dict[str, int] = {}
+
+    def __getattr__(self, name):
+        try:
+            return self[self._index[name]]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+class _ReplayCursor:
+    """Cursor that serves recorded result sets; writes are not supported."""
+
+    def __init__(self, connection, fixture: Fixture):
+        self.connection = connection
+        self.description = None
+        self.rowcount = -1
+        self.arraysize = 1
+        self.fast_executemany = False
+        self._fixture = fixture
+        self._rows: list = []
+        self._pos = 0
+
+    def execute(self, sql, *params):
+        entry = self._fixture.take(sql, _params(params))
+        self.description = entry["description"]
+        if self.description:
+            row_type = type("ReplayRow", (ReplayRow,),
+                            {"__slots__": (), "_index": {c[0]: i for i, c in enumerate(self.description)}})
+            self._rows = [row_type(r) for r in entry["rows"]]
+        else:
+            self._rows = []
+        self.rowcount = len(self._rows)
+        self._pos = 0
+        return self
+
+    def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        self._pos += 1
+        return self._rows[self._pos - 1]
+
+    def fetchmany(self, size: int | None = None):
+        size = size or self.arraysize
+        rows = self._rows[self._pos:self._pos + size]
+        self._pos += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        while (row := self.fetchone()) is not None:
+            yield row
+
+    def nextset(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        self._rows = []
+
+
+class _ReplayConnection:
+    def __init__(self, fixture: Fixture):
+        self._fixture = fixture
+        self.autocommit = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def cursor(self) -> _ReplayCursor:
+        return _ReplayCursor(self, self._fixture)
+
+    def commit(self) -> None:
+        pass
+
+    def rollback(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+# source name → ("record" | "replay", Fixture)
+_captures: dict[str, tuple[str, Fixture]] = {}
+
+
+def record_source(name: str, path) -> None:
+    """Capture the result sets read through ``get_<name>_connection()``; see ``save_captures()``."""
+    _captures[name] = ("record", Fixture(path))
+
+
+def replay_source(name: str, path) -> Fixture:
+    """Serve ``get_<name>_connection()`` from the fixture at ``path`` — no server needed."""
+    fixture = Fixture.load(path)
+    _captures[name] = ("replay", fixture)
+    return fixture
+
+
+def save_captures() -> list[Path]:
+    """Write the recorded fixtures that got any result set and stop capturing; returns their paths."""
+    saved = []
+    for mode, fixture in _captures.values():
+        if mode == "record" and fixture.statements:
+            fixture.save()
+            saved.append(fixture.path)
+    _captures.clear()
+    return saved
+
+
+_pools: dict[str, ConnectionPool] = {}
+_CONFIGS = {"1c": db_config_1c, "target": db_config_target, "skud": db_config_skud}
+
+
+def enable_pooling(sizes: dict[str, int], idle_seconds: int = POOL_IDLE_SECONDS) -> None:
+    """
+    Serve ``get_{1c,target,skud}_connection()`` from shared pools, e.g.
+    ``enable_pooling({"1c": 4, "target": 8, "skud": 1})``.  Sources not
+    listed keep opening a fresh connection per call.
+    """
+    for name, size in sizes.items():
+        _pools[name] = ConnectionPool(_build_conn_str(_CONFIGS[name]), size, idle_seconds, name=name)
+
+
+def enable_process_pooling() -> None:
+    """Long-lived sessions for a standalone script process; no-op if pools already exist."""
+    if not _pools:
+        enable_pooling(PROCESS_POOL_SIZES, PROCESS_POOL_IDLE_SECONDS)
+
+
+def close_pools() -> None:
+    for pool in _pools.values():
+        pool.close_all()
+    _pools.clear()
+
+
+def _connect(name: str):
+    capture = _captures.get(name)
+    if capture is not None and capture[0] == "replay":
+        return _ReplayConnection(capture[1])
+    pool = _pools.get(name)
+    conn = pool.acquire() if pool is not None else pyodbc.connect(_build_conn_str(_CONFIGS[name]))
+    if capture is not None:
+        return _RecordingConnection(conn, capture[1])
+    return conn
+
+
 def get_1c_connection() -> pyodbc.Connection:
     """Return a connection to the 1C ERP source database."""
-    return pyodbc.connect(_build_conn_str(db_config_1c))
+    return _connect("1c")
 
 
 def get_target_connection() -> pyodbc.Connection:
     """Return a connection to the target (WeChat_APP) database."""
-    return pyodbc.connect(_build_conn_str(db_config_target))
+    return _connect("target")
 
 
 def get_skud_connection() -> pyodbc.Connection:
     """Return a connection to the SKUD source database."""
-    return pyodbc.connect(_build_conn_str(db_config_skud))
+    return _connect("skud")
+
+
+def fetch_rows(cur, query: str, params: Sequence = ()) -> tuple[list[str], list]:
+    """
+    Execute ``query`` and fetch the whole result set: (column names, rows).
+    Timed as the ``source_query`` phase of the current cycle (core.metrics).
+    """
+    m = metrics.current()
+    with m.phase("source_query"):
+        if params:
+            cur.execute(query, params)
+        else:
+            cur.execute(query)
+        columns = [c[0] for c in cur.description]
+        rows = cur.fetchall()
+    m.add_rows(rows)
+    return columns, rows
 
 
 # Backwards-compat alias used by helper functions inside modules
@@ -0,0 +1,162 @@
+"""
+Change detection and diff loading for Excel files on the network share.
+
+The Excel modules poll a workbook every minute.  Per cycle:
+
+    stat = file_stat(EXCEL_PATH)                 # os.stat — free
+    if stat == self._stat:
+        return 0
+    book = WorkbookSnapshot.read(EXCEL_PATH)     # one read of the file
+    changed = book.changed_sheets(self._sheet_hashes)
+    df = book.read_sheet("Heaters", usecols=...) # pandas, only changed sheets
+    diff = load_table_diff(cur, "Plan.Month_Plan_Heaters", columns, rows, differ)
+    conn.commit(); differ.accept(diff)
+
+Sheet fingerprints hash the raw worksheet XML inside the xlsx plus the
+shared strings the sheet references — no parsing, and an edit on one sheet
+leaves the fingerprints of the others alone.  The file is read into memory
+once, so hashes and parsed data always describe the same version.
+
+``load_table_diff`` writes only the keys that changed (core.diff.RowDiffer):
+changed rows go to a temp table and ``BaseMigration.apply_changes`` replaces
+them in one statement pair.  Without a baseline (first cycle) the table is
+replaced by DELETE + INSERT in the caller's transaction — no TRUNCATE, so
+readers never see a half-loaded table.
+
+Parsing uses the calamine engine when ``python-calamine`` is installed,
+otherwise openpyxl.
+"""
+import hashlib
+import io
+import os
+import posixpath
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+from typing import Any, Sequence
+
+import pandas as pd
+
+from core.base import BaseMigration
+from core.diff import RowDiffer, WindowDiff
+
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = "calamine"
+except ImportError:
+    EXCEL_ENGINE = "openpyxl"
+
+STAGING_TABLE = "#excel_stg"
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL  = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG  = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_SHARED_REF = re.compile(rb'<c\b[^>]*\bt="s"[^>]*>\s*<v>(\d+)</v>')
+_SHARED_SI  = re.compile(rb"<si>.*?</si>|<si/>", re.S)
+
+
+def file_stat(path: str) -> tuple[float, int]:
+    """(mtime, size) of the workbook; raises FileNotFoundError if unreachable."""
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        raise FileNotFoundError(f"Excel file not accessible: {path}") from e
+    return st.st_mtime, st.st_size
+
+
+class WorkbookSnapshot:
+    """One in-memory copy of an xlsx: per-sheet fingerprints and pandas reads."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self._hashes: dict[str, bytes] | None = None
+
+    @classmethod
+    def read(cls, path: str) -> "WorkbookSnapshot":
+        try:
+            with open(path, "rb") as f:
+                return cls(f.read())
+        except OSError as e:
+            raise FileNotFoundError(f"Excel file not accessible: {path}") from e
+
+    @property
+    def sheet_hashes(self) -> dict[str, bytes]:
+        if self._hashes is None:
+            self._hashes = self._fingerprints()
+        return self._hashes
+
+    def changed_sheets(self, known: dict[str, bytes]) -> set[str]:
+        """Sheets whose fingerprint differs from ``known`` (or is not in it)."""
+        return {name for name, h in self.sheet_hashes.items() if known.get(name) != h}
+
+    def read_sheet(self, sheet_name: str, **kwargs) -> pd.DataFrame:
+        return pd.read_excel(io.BytesIO(self.data), sheet_name=sheet_name,
+                             engine=EXCEL_ENGINE, **kwargs)
+
+    def _fingerprints(self) -> dict[str, bytes]:
+        with zipfile.ZipFile(io.BytesIO(self.data)) as zf:
+            names = set(zf.namelist())
+            shared = (
+                _SHARED_SI.findall(zf.read("xl/sharedStrings.xml"))
+                if "xl/sharedStrings.xml" in names else []
+            )
+            rels = {
+                r.get("Id"): r.get("Target")
+                for r in ET.fromstring(zf.read("xl/_rels/workbook.xml.rels")).iter(f"{_NS_PKG}Relationship")
+            }
+            hashes = {}
+            for sheet in ET.fromstring(zf.read("xl/workbook.xml")).iter(f"{_NS_MAIN}sheet"):
+                target = rels.get(sheet.get(f"{_NS_REL}id"), "")
+                part = target.lstrip("/") if target.startswith("/") else posixpath.normpath(f"xl/{target}")
+                if part not in names:
+                    continue
+                xml = zf.read(part)
+                h = hashlib.blake2b(xml, digest_size=16)
+                for ref in _SHARED_REF.findall(xml):
+                    i = int(ref)
+                    h.update(shared[i] if i < len(shared) else b"")
+                hashes[sheet.get("name")] = h.digest()
+        return hashes
+
+
+def frame_rows(df: pd.DataFrame) -> list[tuple]:
+    """DataFrame → list of tuples for pyodbc, NaN/NaT → None (column-wise, not per cell)."""
+    obj = df.astype(object)
+    return list(obj.where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def load_table_diff(cur, table: str, columns: Sequence[str], rows: Sequence[Sequence[Any]],
+                    differ: RowDiffer) -> WindowDiff:
+    """
+    Bring ``table`` to ``rows`` writing only keys that changed since the
+    differ's baseline (whole table without one).  Does NOT commit; call
+    ``differ.accept(diff)`` after the commit.
+    """
+    columns = list(columns)
+    diff = differ.diff(columns, rows, token=table)
+    if diff.is_empty:
+        return diff
+
+    col_list = ", ".join(columns)
+    placeholders = ", ".join("?" * len(columns))
+    cur.fast_executemany = True
+    if not diff.has_baseline:
+        cur.execute(f"DELETE FROM {table}")
+        if rows:
+            cur.executemany(f"INSERT INTO {table} ({col_list}) VALUES ({placeholders})", list(rows))
+        return diff
+
+    cur.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    cur.execute(f"SELECT TOP (0) {col_list} INTO {STAGING_TABLE} FROM {table}")
+    try:
+        if diff.changed_rows:
+            cur.executemany(
+                f"INSERT INTO {STAGING_TABLE} ({col_list}) VALUES ({placeholders})",
+                diff.changed_rows,
+            )
+        BaseMigration.apply_changes(cur, STAGING_TABLE, table, None,
+                                    differ.key_columns, diff.changed_keys, columns)
+    finally:
+        cur.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    return diff
@@ -0,0 +1,253 @@
+"""
+Per-cycle telemetry → Migration.CycleMetrics.
+
+BaseMigration._execute_cycle opens a ``CycleMetrics`` for every cycle and
+makes it the current one of the thread; shared helpers and scripts add to it
+without passing it around:
+
+    with metrics.phase("source_query"):
+        cur_1c.execute(query)
+        rows_1c = cur_1c.fetchall()
+    metrics.current().add_rows(rows_1c)
+
+Phases already timed by core code: ``transform`` (ColumnTransform.apply),
+``staging_insert`` / rows / bytes (stream_to_staging), ``applock_wait``
+(BaseMigration.acquire_applock).  ``snapshot_switch`` and ``source_query``
+are marked in the scripts.  Downstream refreshes are written by the
+RefreshCoordinator as cycles of ``refresh:<RefreshID>`` with a ``refresh``
+phase, scheduler.py runs as ``job:<ScriptID>`` with a ``queue_wait`` phase.
+
+Rows are not written one by one: the process-wide ``MetricsWriter`` buffers
+them and inserts them in batches (fast_executemany) from a background thread
+over one persistent connection.  Telemetry never fails a cycle — a write
+error drops the connection, the rows are retried on the next flush and the
+oldest are discarded beyond ``MAX_PENDING``.  runner.py calls ``purge()``
+hourly to keep ``RETENTION_DAYS`` of history.
+"""
+import atexit
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Sequence
+
+FLUSH_SECONDS = 30
+BATCH_ROWS    = 200
+MAX_PENDING   = 5_000
+
+BYTES_SAMPLE  = 100   # rows sampled to estimate the size of a batch
+
+RETENTION_DAYS = 30
+
+# phase → Migration.CycleMetrics column
+PHASES = {
+    "source_query":    "SourceQueryMs",
+    "transform":       "TransformMs",
+    "staging_insert":  "StagingInsertMs",
+    "applock_wait":    "ApplockWaitMs",
+    "snapshot_switch": "SnapshotSwitchMs",
+    "refresh":         "RefreshMs",
+    "queue_wait":      "QueueWaitMs",
+}
+
+_INSERT_SQL = f"""
+    INSERT INTO Migration.CycleMetrics
+        (ScriptID, CycleNo, Mode, Status, StartedAt, DurationMs,
+         Records, RowsFetched, BytesFetched, {", ".join(PHASES.values())})
+    VALUES ({", ".join(["?"] * (9 + len(PHASES)))})
+"""
+
+
+def estimate_bytes(rows: Sequence[Sequence]) -> int:
+    """Approximate payload size of ``rows`` (sampled; str/bytes by length, rest 8 bytes)."""
+    if not rows:
+        return 0
+    sample = rows[:BYTES_SAMPLE]
+    size = 0
+    for row in sample:
+        for v in row:
+            if v is None:
+                continue
+            size += len(v) if isinstance(v, (str, bytes, bytearray)) else 8
+    return size * len(rows) // len(sample)
+
+
+class CycleMetrics:
+    """Timings and counters of one cycle.  Phase times add up over repeats."""
+
+    def __init__(self, script_id: str, cycle_no: int = 0, mode: str = "full"):
+        self.script_id = script_id
+        self.cycle_no = cycle_no
+        self.mode = mode
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.rows_fetched = 0
+        self.bytes_fetched = 0
+        self._lock = threading.Lock()   # the stream reader thread adds too
+
+    @contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - t0)
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def add_rows(self, rows: Sequence[Sequence], nbytes: int | None = None) -> None:
+        with self._lock:
+            self.rows_fetched += len(rows)
+            self.bytes_fetched += estimate_bytes(rows) if nbytes is None else nbytes
+
+    def row(self, status: str, records: int) -> tuple:
+        duration = time.perf_counter() - self._t0
+        with self._lock:
+            phase_ms = [_ms(self.phases.get(p)) for p in PHASES]
+        return (
+            self.script_id, self.cycle_no, self.mode, status, self.started_at, _ms(duration),
+            records, self.rows_fetched, self.bytes_fetched, *phase_ms,
+        )
+
+
+def _ms(seconds: float | None) -> int | None:
+    return None if seconds is None else int(seconds * 1000)
+
+
+class _NullMetrics(CycleMetrics):
+    """Stand-in outside a cycle (helpers called from ad-hoc code): records nothing."""
+
+    def __init__(self):
+        super().__init__("")
+
+    def add_time(self, name: str, seconds: float) -> None:
+        pass
+
+    def add_rows(self, rows, nbytes=None) -> None:
+        pass
+
+
+_NULL = _NullMetrics()
+_local = threading.local()
+
+
+def current() -> CycleMetrics:
+    """The metrics of the cycle running in this thread (a no-op object if none)."""
+    return getattr(_local, "metrics", None) or _NULL
+
+
+def set_current(metrics: CycleMetrics | None) -> None:
+    _local.metrics = metrics
+
+
+def phase(name: str):
+    """``with metrics.phase("snapshot_switch"): ...`` on the current cycle."""
+    return current().phase(name)
+
+
+class MetricsWriter:
+    """Buffers CycleMetrics rows and inserts them in batches over one connection."""
+
+    def __init__(self, flush_seconds: int = FLUSH_SECONDS, batch_rows: int = BATCH_ROWS):
+        self.flush_seconds = flush_seconds
+        self.batch_rows = batch_rows
+        self._pending: list[tuple] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._conn = None
+        self._thread = threading.Thread(target=self._loop, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, row: tuple) -> None:
+        with self._lock:
+            self._pending.append(row)
+            if len(self._pending) > MAX_PENDING:
+                del self._pending[: len(self._pending) - MAX_PENDING]
+            full = len(self._pending) >= self.batch_rows
+        if full:
+            self._wake.set()
+
+    def _loop(self) -> None:
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                conn = self._connection()
+                cur = conn.cursor()
+                cur.fast_executemany = True
+                cur.executemany(_INSERT_SQL, batch)
+                conn.commit()
+                cur.close()
+            except Exception:
+                self._drop_connection()
+                with self._lock:
+                    self._pending[:0] = batch
+                    if len(self._pending) > MAX_PENDING:
+                        del self._pending[: len(self._pending) - MAX_PENDING]
+
+    def _connection(self):
+        if self._conn is None:
+            # Own connection, not from the pool: it lives as long as the process
+            from core.db import get_connection
+            from core.config import db_config_target
+            self._conn = get_connection(db_config_target)
+        return self._conn
+
+    def _drop_connection(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+_writer: MetricsWriter | None = None
+_writer_lock = threading.Lock()
+
+
+def writer() -> MetricsWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MetricsWriter()
+            atexit.register(_writer.flush)
+        return _writer
+
+
+def record(metrics: CycleMetrics, status: str, records: int = 0) -> None:
+    """Queue the row of a finished cycle.  Never raises."""
+    try:
+        writer().submit(metrics.row(status, records))
+    except Exception:
+        pass
+
+
+def purge(retention_days: int = RETENTION_DAYS) -> int:
+    """Delete metrics older than ``retention_days``; returns the number of rows."""
+    from core.db import get_target_connection
+    conn = get_target_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "DELETE FROM Migration.CycleMetrics WHERE StartedAt < DATEADD(DAY, -?, SYSDATETIME())",
+            (retention_days,),
+        )
+        deleted = cur.rowcount
+        conn.commit()
+        cur.close()
+        return deleted
+    finally:
+        conn.close()
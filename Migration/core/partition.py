@@ -0,0 +1,234 @@
+"""
+Partitioned, resumable full syncs of date-windowed 1C tables.
+
+A weekly full sync of a large table used to be one query over the whole
+history streamed through one connection pair.  ``PartitionedFullSync``
+splits the date range into ``partitions`` contiguous slices and loads them
+in parallel (``workers`` threads, each with its own 1C and target
+connection) into the staging table under one SnapshotID:
+
+    sync = PartitionedFullSync(self, TABLE_STAGING, START, today, load_partition)
+    snapshot_id, loaded = sync.load()       # raises if any partition failed
+    if loaded:
+        self.acquire_applock(cur_t, LOCK_NAME)
+        cur_t.execute("EXEC Import_1C.sp_SwitchSnapshot_... @SnapshotID=?, @Full=1, ...")
+        self.queue_refreshes(cur_t)
+    sync.finish(cur_t)                      # in the switch transaction
+    conn_t.commit()
+
+``load_partition(cur_1c, cur_t, snapshot_id, part)`` queries 1C for
+``part.date_from .. part.date_to`` (inclusive, real dates) and streams the
+rows into staging; its staging rows are committed together with the
+partition's row in Migration.FullSyncPartition, so a partition is either
+fully loaded or not at all.  When a partition fails the others still run,
+``load()`` raises and the progress rows stay: the next run within
+``RESUME_HOURS`` reuses the SnapshotID and the stored ranges and loads only
+the missing partitions.  An older unfinished run is discarded together with
+its staging rows.  Nothing reaches the live table until the caller switches
+the snapshot once all partitions are in.
+
+Every full sync gets a fresh SnapshotID, so the copy script — which reloads
+the staging rows of the pointer snapshot every cycle — never touches the
+partitions loaded so far.
+"""
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Callable
+
+from core import metrics
+
+PARTITIONS   = 8
+WORKERS      = 4
+RESUME_HOURS = 24
+
+
+@dataclass(frozen=True)
+class Partition:
+    no: int
+    date_from: date   # inclusive
+    date_to: date     # inclusive
+
+
+def date_partitions(start: date, end: date, n: int) -> list[Partition]:
+    """Split ``start .. end`` (inclusive) into at most ``n`` contiguous ranges of near-equal length."""
+    days = (end - start).days + 1
+    if days <= 0:
+        return []
+    n = max(1, min(n, days))
+    size, extra = divmod(days, n)
+    parts, cursor = [], start
+    for i in range(n):
+        length = size + (1 if i < extra else 0)
+        parts.append(Partition(i, cursor, cursor + timedelta(days=length - 1)))
+        cursor += timedelta(days=length)
+    return parts
+
+
+def to_1c_date(d: date) -> str:
+    """Real date → 1C literal with the +2000 year offset ('4025-01-31')."""
+    return f"{d.year + 2000}-{d.month:02d}-{d.day:02d}"
+
+
+LoadPartition = Callable[[object, object, str, Partition], int]
+
+
+class PartitionedFullSync:
+    """Parallel load of one full sync into staging, resumable per partition."""
+
+    def __init__(self, script, staging: str, start: date, end: date,
+                 load_partition: LoadPartition, partitions: int = PARTITIONS,
+                 workers: int = WORKERS, resume_hours: int = RESUME_HOURS):
+        self.script = script
+        self.staging = staging
+        self.start = start
+        self.end = end
+        self.load_partition = load_partition
+        self.partitions = partitions
+        self.workers = workers
+        self.resume_hours = resume_hours
+        self.snapshot_id: str | None = None
+        self.logger = script.get_logger()
+
+    # ── progress ─────────────────────────────────────────────
+
+    def _prepare(self) -> list[Partition]:
+        """Resume the unfinished run of this script or register a new one; returns pending partitions."""
+        from core.db import get_target_connection
+
+        conn = get_target_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("SET XACT_ABORT ON;")
+            self.script.acquire_applock(cur, f"Migration_FullSync_{self.script.script_id}")
+            cur.execute(
+                """
+                SELECT PartitionNo, SnapshotID, DateFrom, DateTo, CompletedAt,
+                       DATEDIFF(MINUTE, RunStartedAt, SYSDATETIME())
+                FROM Migration.FullSyncPartition
+                WHERE ScriptID = ?
+                ORDER BY PartitionNo
+                """,
+                (self.script.script_id,),
+            )
+            rows = cur.fetchall()
+
+            if rows and rows[0][5] < self.resume_hours * 60:
+                self.snapshot_id = str(rows[0][1])
+                pending = [Partition(r[0], r[2], r[3]) for r in rows if r[4] is None]
+                self.logger.info(
+                    f"[partition] Resuming snapshot {self.snapshot_id}: "
+                    f"{len(rows) - len(pending)}/{len(rows)} partitions already loaded"
+                )
+                conn.commit()
+                return pending
+
+            if rows:
+                stale = str(rows[0][1])
+                cur.execute(f"DELETE FROM {self.staging} WHERE SnapshotID = ?", (stale,))
+                cur.execute("DELETE FROM Migration.FullSyncPartition WHERE ScriptID = ?",
+                            (self.script.script_id,))
+                self.logger.info(f"[partition] Discarded stale unfinished snapshot {stale}")
+
+            self.snapshot_id = str(uuid.uuid4())
+            parts = date_partitions(self.start, self.end, self.partitions)
+            if parts:
+                cur.fast_executemany = True
+                cur.executemany(
+                    """
+                    INSERT INTO Migration.FullSyncPartition
+                        (ScriptID, PartitionNo, SnapshotID, DateFrom, DateTo)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    [(self.script.script_id, p.no, self.snapshot_id, p.date_from, p.date_to)
+                     for p in parts],
+                )
+            conn.commit()
+            return parts
+        finally:
+            conn.close()
+
+    def _run_partition(self, part: Partition, cycle_metrics) -> int:
+        from core.db import get_1c_connection, get_target_connection
+
+        metrics.set_current(cycle_metrics)
+        conn_1c = conn_t = None
+        try:
+            conn_1c = get_1c_connection()
+            conn_t  = get_target_connection()
+            cur_1c  = conn_1c.cursor()
+            cur_t   = conn_t.cursor()
+            cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 120000;")
+            loaded = self.load_partition(cur_1c, cur_t, self.snapshot_id, part)
+            cur_t.execute(
+                """
+                UPDATE Migration.FullSyncPartition
+                SET RowsLoaded = ?, CompletedAt = SYSDATETIME()
+                WHERE ScriptID = ? AND PartitionNo = ?
+                """,
+                (loaded, self.script.script_id, part.no),
+            )
+            conn_t.commit()
+            return loaded
+        finally:
+            metrics.set_current(None)
+            for conn in (conn_1c, conn_t):
+                try:
+                    if conn: conn.close()
+                except Exception:
+                    pass
+
+    # ── public ───────────────────────────────────────────────
+
+    def load(self) -> tuple[str, int]:
+        """
+        Load every pending partition into staging.  Returns
+        (snapshot_id, rows staged over all partitions of the run); raises
+        RuntimeError when a partition failed (the next run resumes).
+        """
+        pending = self._prepare()
+        cycle_metrics = metrics.current()
+        failed = []
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(pending)),
+                                    thread_name_prefix="partition") as pool:
+                futures = {pool.submit(self._run_partition, p, cycle_metrics): p for p in pending}
+                for future, part in futures.items():
+                    try:
+                        rows = future.result()
+                        self.logger.info(
+                            f"[partition] #{part.no} {part.date_from}..{part.date_to}: {rows} rows"
+                        )
+                    except Exception as e:
+                        failed.append(part)
+                        self.logger.error(
+                            f"[partition] #{part.no} {part.date_from}..{part.date_to} failed: {e}"
+                        )
+        if failed:
+            raise RuntimeError(
+                f"{len(failed)} of {len(pending)} partitions failed "
+                f"(snapshot {self.snapshot_id}); the next run resumes them"
+            )
+        return self.snapshot_id, self._total_rows()
+
+    def _total_rows(self) -> int:
+        from core.db import get_target_connection
+
+        conn = get_target_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                "SELECT COALESCE(SUM(RowsLoaded), 0) FROM Migration.FullSyncPartition WHERE ScriptID = ?",
+                (self.script.script_id,),
+            )
+            total = int(cur.fetchone()[0])
+            conn.commit()
+            return total
+        finally:
+            conn.close()
+
+    def finish(self, cur_t) -> None:
+        """Forget the progress of the run.  Call in the switch transaction; does NOT commit."""
+        cur_t.execute("DELETE FROM Migration.FullSyncPartition WHERE ScriptID = ?",
+                      (self.script.script_id,))
@@ -0,0 +1,173 @@
+"""
+Coalesced downstream refreshes (derived caches rebuilt after imports).
+
+scripts_config.py declares the dependency graph:
+
+  - DERIVED_REFRESHES — the derived caches: procedure call, whether it takes
+    a ``@date`` (``per_date``) and, optionally, a set-based variant taking
+    all dates at once as a JSON array (``exec_dates``, see
+    sql/tv_cache_refresh_dates.sql);
+  - ``"refreshes": [...]`` on a SCRIPTS entry — which of them that import feeds.
+
+An import does not run the procedures itself.  It queues them in the same
+transaction as its data:
+
+    self.acquire_applock(cur_t, ...)
+    cur_t.execute("EXEC Import_1C.sp_SwitchSnapshot_...")
+    self.queue_refreshes(cur_t, changed_dates)
+    conn_t.commit()
+
+and runner.py drains Migration.RefreshQueue (``RefreshCoordinator.drain``).
+A refresh runs once the queue has been quiet for ``DEBOUNCE_SECONDS``, or
+at the latest ``MAX_DELAY_SECONDS`` after its oldest request, and only once
+per burst no matter how many imports (copy + full sync, plan_fact +
+price_list, ...) asked for it: one ``exec_dates`` call for all queued dates,
+or one call per distinct date for plain ``per_date`` refreshes.
+Queue rows are deleted in the refresh transaction, so a failed refresh is
+retried on the next drain.  Each run is written to Migration.CycleMetrics
+as script ``refresh:<id>`` (``refresh`` phase, records = queued requests).
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Iterable
+
+from core import metrics
+from core.base import BaseMigration
+
+DEBOUNCE_SECONDS  = 10
+MAX_DELAY_SECONDS = 60
+
+MIGRATION_ROOT = Path(__file__).resolve().parent.parent
+
+logger = logging.getLogger("runner")
+
+
+def _manifest() -> tuple[list[dict], dict[str, dict]]:
+    import scripts_config
+    derived = {r["id"]: r for r in scripts_config.DERIVED_REFRESHES}
+    return scripts_config.SCRIPTS, derived
+
+
+def refreshes_for(script_file: str | Path) -> list[dict]:
+    """Derived refreshes fed by the script at ``script_file`` (SCRIPTS "refreshes")."""
+    path = Path(script_file).resolve()
+    scripts, derived = _manifest()
+    for cfg in scripts:
+        if (MIGRATION_ROOT / cfg["script"]).resolve() == path:
+            return [derived[r] for r in cfg.get("refreshes", ())]
+    return []
+
+
+def queue_refreshes(cur, requested_by: str, refreshes: Iterable[dict], dates: Iterable = ()) -> int:
+    """
+    Insert queue rows for ``refreshes``: one per date for ``per_date``
+    refreshes (none if ``dates`` is empty), one otherwise.  Does NOT commit.
+    """
+    dates = sorted(set(dates))
+    rows = []
+    for r in refreshes:
+        if r.get("per_date"):
+            rows.extend((r["id"], d, requested_by) for d in dates)
+        else:
+            rows.append((r["id"], None, requested_by))
+    if rows:
+        cur.fast_executemany = True
+        cur.executemany(
+            "INSERT INTO Migration.RefreshQueue (RefreshID, RefreshDate, RequestedBy) VALUES (?, ?, ?)",
+            rows,
+        )
+    return len(rows)
+
+
+class RefreshCoordinator:
+    """Runs queued refreshes once per burst, in DERIVED_REFRESHES order."""
+
+    def __init__(self, debounce_seconds: int = DEBOUNCE_SECONDS,
+                 max_delay_seconds: int = MAX_DELAY_SECONDS):
+        self.debounce_seconds = debounce_seconds
+        self.max_delay_seconds = max_delay_seconds
+
+    def drain(self) -> int:
+        """Run every refresh whose burst is over; returns the number of procedure calls."""
+        from core.db import get_target_connection
+
+        _, derived = _manifest()
+        conn = get_target_connection()
+        calls = 0
+        try:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SELECT RefreshID,
+                       MAX(QueueID),
+                       DATEDIFF(SECOND, MIN(RequestedAt), SYSDATETIME()),
+                       DATEDIFF(SECOND, MAX(RequestedAt), SYSDATETIME())
+                FROM Migration.RefreshQueue
+                GROUP BY RefreshID
+                """
+            )
+            ready = {
+                row[0]: row[1] for row in cur.fetchall()
+                if row[3] >= self.debounce_seconds or row[2] >= self.max_delay_seconds
+            }
+            conn.commit()
+
+            for refresh_id, r in derived.items():
+                if refresh_id in ready:
+                    calls += self._run(conn, r, ready[refresh_id])
+            for refresh_id in ready.keys() - derived.keys():
+                logger.warning(f"[refresh] Unknown RefreshID '{refresh_id}' in queue — ignored")
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        return calls
+
+    @staticmethod
+    def _run(conn, refresh: dict, max_queue_id: int) -> int:
+        cur = conn.cursor()
+        run_metrics = metrics.CycleMetrics(f"refresh:{refresh['id']}")
+        metrics.set_current(run_metrics)
+        requested = []
+        try:
+            cur.execute("SET XACT_ABORT ON;")
+            BaseMigration.acquire_applock(cur, f"Migration_Refresh_{refresh['id']}")
+            cur.execute(
+                """
+                DELETE FROM Migration.RefreshQueue
+                OUTPUT deleted.RefreshDate
+                WHERE RefreshID = ? AND QueueID <= ?
+                """,
+                (refresh["id"], max_queue_id),
+            )
+            requested = [row[0] for row in cur.fetchall()]
+            with run_metrics.phase("refresh"):
+                if refresh.get("per_date"):
+                    dates = sorted({d for d in requested if d is not None})
+                    if refresh.get("exec_dates"):
+                        if dates:
+                            cur.execute(refresh["exec_dates"], (json.dumps([d.isoformat() for d in dates]),))
+                        calls = 1 if dates else 0
+                    else:
+                        for d in dates:
+                            cur.execute(refresh["exec"], (d,))
+                        calls = len(dates)
+                else:
+                    cur.execute(refresh["exec"])
+                    calls = 1
+                conn.commit()
+            metrics.record(run_metrics, "success", len(requested))
+            logger.info(
+                f"[refresh] {refresh['id']}: {len(requested)} request(s) → {calls} call(s)"
+            )
+            return calls
+        except Exception as e:
+            conn.rollback()
+            logger.error(f"[refresh] {refresh['id']} failed, will retry: {e}")
+            metrics.record(run_metrics, "error", len(requested))
+            return 0
+        finally:
+            metrics.set_current(None)
+            cur.close()
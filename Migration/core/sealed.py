@@ -0,0 +1,71 @@
+"""
+Sealed days — read only the open tail of a date window from 1C.
+
+Windowed scripts re-query 14–60 days of 1C every cycle although all but
+the last day or two are closed and never change again.  A ``SealRule``
+says when a day is closed: ``after_days`` days after it, from ``at_hour``
+o'clock on (SealRule(2, 6): the 17th is sealed on the 19th at 06:00).
+
+``SealedDays`` keeps, per script and source, the last day that was read
+*after* it had sealed (Migration.SyncWatermark, ``sealed:<source>``).
+Everything up to that mark is final in the target; a cycle reads from the
+day after it:
+
+    SEALED = SealedDays("Daily_PlanFact", SealRule(after_days=2, at_hour=6))
+
+    now = datetime.now()
+    read_from = SEALED.open_from(self, cur_t, date_from_real, now)
+    # query 1C for read_from .. today, switch only those days
+    SEALED.advance(self, cur_t, now)                # in the switch transaction
+    conn_t.commit()
+
+The mark only moves when the cycle's read reached back to it, so a day is
+never skipped — after a pause the first cycle simply reads more.  A
+correction posted in 1C to a sealed day is picked up by the weekly full
+sync, which rewrites the whole history; tighten the rule if a module sees
+late postings more often.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+SOURCE_PREFIX = "sealed:"
+
+
+@dataclass(frozen=True)
+class SealRule:
+    after_days: int      # days after the day itself
+    at_hour: int = 0     # ... from this hour on
+
+    def sealed_through(self, now: datetime) -> date:
+        """Last sealed day at ``now``."""
+        return (now - timedelta(hours=self.at_hour)).date() - timedelta(days=self.after_days)
+
+
+class SealedDays:
+    """Persistent "sealed through" mark of one windowed source."""
+
+    def __init__(self, source: str, rule: SealRule):
+        self.source = SOURCE_PREFIX + source
+        self.rule = rule
+
+    def _mark(self, script, cur) -> date | None:
+        mark = script.load_watermark(cur, self.source)
+        return mark.date() if isinstance(mark, datetime) else None
+
+    def open_from(self, script, cur, window_from: date, now: datetime) -> date:
+        """First day to read: the day after the mark, never before ``window_from``."""
+        mark = self._mark(script, cur)
+        if mark is None:
+            return window_from
+        # Days sealed since the mark was set are read once more, then sealed
+        return max(window_from, min(mark, self.rule.sealed_through(now)) + timedelta(days=1))
+
+    def advance(self, script, cur, now: datetime) -> None:
+        """
+        Mark the days sealed at ``now`` as final — call after a cycle that read
+        ``open_from(...)`` .. today, in its switch transaction (does NOT commit).
+        """
+        sealed = self.rule.sealed_through(now)
+        mark = self._mark(script, cur)
+        if mark is None or mark < sealed:
+            script.save_watermark(cur, self.source, datetime.combine(sealed, datetime.min.time()))
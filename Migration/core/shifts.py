@@ -0,0 +1,79 @@
+"""
+Plant working-time check for adaptive intervals (BaseMigration.calendar_aware).
+
+Reads the working calendar (TimeLoss.WorkSchedules_ByDay → shift times in
+TimeLoss.Working_ScheduleType, the same source as the TV working spans).
+The plant counts as working while any WORKSHIFT of today — or a shift of
+yesterday that crosses midnight — is running, widened by ``MARGIN`` on both
+sides.
+
+Shifts are cached per process for ``CACHE_SECONDS``.  No shifts at all
+(weekend, holiday) → ``False``; a failed lookup → ``None`` (unknown —
+callers ignore the calendar).
+"""
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+MARGIN        = timedelta(minutes=30)
+CACHE_SECONDS = 900
+
+_lock = threading.Lock()
+_cache: Dict[str, Any] = {"date": None, "shifts": None, "loaded_at": 0.0}
+
+
+def _load_shifts(day) -> list[tuple[datetime, datetime]]:
+    from core.db import get_target_connection
+    conn = get_target_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT DISTINCT
+                   wsbd.OnlyDate,
+                   CAST(wst.StartTime AS time(0)),
+                   CAST(wst.EndTime   AS time(0)),
+                   wst.CrossesMidnight
+            FROM TimeLoss.WorkSchedules_ByDay wsbd
+            JOIN TimeLoss.Working_ScheduleType wst
+              ON wst.ScheduleID = wsbd.ScheduleID
+            WHERE wsbd.OnlyDate BETWEEN ? AND ?
+              AND wsbd.DeleteMark = 0
+              AND UPPER(wst.TypeID) = 'WORKSHIFT'
+            """,
+            (day - timedelta(days=1), day),
+        )
+        rows = cur.fetchall()
+        cur.close()
+        conn.commit()
+    finally:
+        conn.close()
+
+    shifts = []
+    for only_date, start, end, crosses in rows:
+        if start is None or end is None:
+            continue
+        shift_start = datetime.combine(only_date, start)
+        shift_end   = datetime.combine(only_date + timedelta(days=1 if crosses else 0), end)
+        shifts.append((shift_start, shift_end))
+    return shifts
+
+
+def is_working_time(now: datetime | None = None) -> bool | None:
+    """True during a shift (± MARGIN), False outside shifts, None if unknown."""
+    now = now or datetime.now()
+    today = now.date()
+    with _lock:
+        fresh = _cache["date"] == today and time.monotonic() - _cache["loaded_at"] < CACHE_SECONDS
+        shifts = _cache["shifts"]
+    if not fresh:
+        try:
+            shifts = _load_shifts(today)
+        except Exception:
+            return None
+        with _lock:
+            _cache["date"] = today
+            _cache["shifts"] = shifts
+            _cache["loaded_at"] = time.monotonic()
+    return any(start - MARGIN <= now < end + MARGIN for start, end in shifts)
@@ -0,0 +1,148 @@
+"""
+Streaming fetch → transform → load into a staging table.
+
+Instead of ``fetchall()`` + a shifted copy + a payload copy (≈3× the window
+in memory), rows are pulled with ``fetchmany(batch_size)``, transformed and
+inserted with fast_executemany one batch at a time:
+
+    cur_1c.execute(query)
+    loaded = stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id,
+                               rules=DATE_RULES)
+    if not loaded:
+        return 0
+
+Peak memory stays at a few batches.  By default the copy is pipelined: a
+reader thread fetches and transforms batches from 1C into a bounded queue
+(back-pressure: at most ``QUEUE_DEPTH`` batches ahead) while the calling
+thread inserts them into the target, so both servers work at the same time.
+An error on either side stops the other one and is re-raised in the caller.
+Nothing is committed here — the caller commits staging as before.
+"""
+import queue
+import threading
+from typing import Any, Callable, Iterator, Sequence
+
+from core import metrics
+from core.db import prepared_cursor
+from core.transform import ColumnTransform
+
+BATCH_SIZE  = 5_000
+QUEUE_DEPTH = 4
+
+_DONE = object()
+
+RowTransform = Callable[[Sequence[Any]], Sequence[Any]]
+
+
+def fetch_batches(cur, batch_size: int = BATCH_SIZE) -> Iterator[list]:
+    """Yield the result set of an executed cursor in ``batch_size`` chunks."""
+    m = metrics.current()
+    while True:
+        with m.phase("source_query"):
+            rows = cur.fetchmany(batch_size)
+        if not rows:
+            return
+        m.add_rows(rows)
+        yield rows
+
+
+class _ReaderFailed:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def pipelined_batches(cur, batch_size: int = BATCH_SIZE,
+                      prepare: Callable[[list], list] | None = None,
+                      depth: int = QUEUE_DEPTH) -> Iterator[list]:
+    """
+    Same batches as ``fetch_batches`` (passed through ``prepare``), but read
+    ahead by a reader thread.  The source cursor must not be touched by the
+    caller until the iterator is exhausted or closed.
+    """
+    q: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    cycle_metrics = metrics.current()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _read():
+        metrics.set_current(cycle_metrics)
+        try:
+            for batch in fetch_batches(cur, batch_size):
+                if prepare is not None:
+                    batch = prepare(batch)
+                if not _put(batch):
+                    return
+            _put(_DONE)
+        except BaseException as e:
+            _put(_ReaderFailed(e))
+
+    reader = threading.Thread(target=_read, name="migration-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _ReaderFailed):
+                raise item.exc
+            yield item
+    finally:
+        # Writer failed or finished early: let the reader drop out and wait for it
+        stop.set()
+        reader.join()
+
+
+def stream_to_staging(cur_src, cur_t, staging: str, snapshot_id: str,
+                      transform: RowTransform | None = None,
+                      rules: ColumnTransform | None = None,
+                      columns: Sequence[str] | None = None,
+                      batch_size: int = BATCH_SIZE,
+                      pipelined: bool = True) -> int:
+    """
+    Copy the result set of the executed ``cur_src`` into ``staging`` under
+    ``snapshot_id``.  Returns the number of rows inserted.
+
+    ``rules`` (core.transform) are applied column-wise to each source batch
+    first; ``transform(row)`` then returns the values to insert, with
+    ``columns`` naming them when they differ from the source columns.
+    ``pipelined=False`` reads and writes strictly in turn on one thread.
+    """
+    src_columns = [c[0] for c in cur_src.description]
+    if columns is None:
+        columns = src_columns
+    insert_cols  = ['SnapshotID'] + list(columns)
+    placeholders = ",".join(["?"] * len(insert_cols))
+    insert_sql   = f"INSERT INTO {staging} ({', '.join(insert_cols)}) VALUES ({placeholders})"
+
+    def _payload(batch):
+        if rules is not None:
+            batch = rules.apply(src_columns, batch)
+        if transform is None:
+            return [(snapshot_id, *row) for row in batch]
+        return [(snapshot_id, *transform(row)) for row in batch]
+
+    if pipelined:
+        batches = pipelined_batches(cur_src, batch_size, prepare=_payload)
+    else:
+        batches = (_payload(b) for b in fetch_batches(cur_src, batch_size))
+
+    cur_ins = prepared_cursor(cur_t, insert_sql)   # prepared once per pooled session
+    cur_ins.fast_executemany = True
+    m = metrics.current()
+    total = 0
+    try:
+        for payload in batches:
+            with m.phase("staging_insert"):
+                cur_ins.executemany(insert_sql, payload)
+            total += len(payload)
+    finally:
+        batches.close()
+    return total
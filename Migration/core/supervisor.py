@@ -0,0 +1,221 @@
+"""
+In-process supervisor — runs the continuous BaseMigration jobs as threads of
+one process instead of one Python subprocess per script.
+
+    python runner.py --inprocess
+
+Each script file is imported once (under a unique module name, so module
+globals like ``_last_mtime`` stay per script) and its BaseMigration subclass
+is instantiated.  A small thread pool executes the cycles:
+
+  - a job never runs two cycles at once; the next cycle is due
+    ``current_interval`` after the previous one finished (like ``run()``);
+  - the pool size caps how many cycles run at the same time;
+  - connections come from the shared per-server pools of core.db
+    (``enable_pooling``), which also cap concurrent sessions per server.
+
+Crash isolation: an exception stays inside its cycle (``_execute_cycle``).
+After ``RESTART_AFTER_FAILURES`` failed cycles in a row the job is
+"restarted" — the instance is dropped and rebuilt with fresh state (diff
+baseline, cycle counter) after an exponential back-off, the same
+30 s → … → 300 s schedule the subprocess runner uses.
+
+Jobs expose ``restart()`` / ``stop_permanently()`` like runner.ManagedProcess,
+so the admin-panel command polling works unchanged.
+"""
+import importlib.util
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from core.base import BaseMigration
+
+BASE_BACKOFF           = 30
+MAX_BACKOFF            = 300
+RESTART_AFTER_FAILURES = 3
+DEFAULT_WORKERS        = 6
+
+logger = logging.getLogger("runner")
+
+_load_lock = threading.Lock()
+
+
+def load_migration_class(script_path: Path, module_name: str) -> type[BaseMigration]:
+    """
+    Import a module script and return its BaseMigration subclass.
+
+    Scripts import their query module as a top-level ``sql``; it is dropped
+    from ``sys.modules`` around each import so every script gets its own.
+    """
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Cannot load {script_path}")
+    module = importlib.util.module_from_spec(spec)
+    with _load_lock:
+        sys.modules.pop("sql", None)
+        sys.modules[module_name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            sys.modules.pop(module_name, None)
+            raise
+        finally:
+            sys.modules.pop("sql", None)
+
+    classes = [
+        obj for obj in vars(module).values()
+        if inspect.isclass(obj)
+        and issubclass(obj, BaseMigration)
+        and obj.__module__ == module_name
+        and not inspect.isabstract(obj)
+    ]
+    if len(classes) != 1:
+        raise ImportError(f"{script_path}: expected one BaseMigration subclass, found {len(classes)}")
+    return classes[0]
+
+
+class InProcessJob:
+    def __init__(self, config: dict, migration_root: Path):
+        self.script_id   = config["id"]
+        self.name        = config.get("name", config["id"])
+        self.script_path = migration_root / config["script"]
+        self.instance: BaseMigration | None = None
+        self.backoff     = BASE_BACKOFF
+        self.failures    = 0
+        self.next_due    = 0.0
+        self.running     = False
+        self._cls: type[BaseMigration] | None = None
+        self._lock = threading.Lock()
+        self._restart_pending = False
+        self._permanently_stopped = False
+
+    # ── Scheduling (called from the supervisor loop) ──────────────────────────
+
+    def claim(self, now: float) -> bool:
+        """Mark the job as running if a cycle is due; True → submit run_cycle."""
+        with self._lock:
+            if self.running or self._permanently_stopped or now < self.next_due:
+                return False
+            self.running = True
+            return True
+
+    def run_cycle(self) -> None:
+        """One cycle in a worker thread; never raises."""
+        failed = True
+        try:
+            if self.instance is None:
+                self._start_instance()
+            inst = self.instance
+            inst._execute_cycle(inst.get_logger())
+            failed = inst.last_error is not None
+        except BaseException as e:
+            logger.error(f"[{self.script_id}] Cycle crashed: {e!r}", exc_info=True)
+        finally:
+            self._finish(failed)
+
+    def _start_instance(self) -> None:
+        if self._cls is None:
+            self._cls = load_migration_class(self.script_path, f"migration_job_{self.script_id}")
+        inst = self._cls()
+        # Own log file only; don't duplicate every line into runner.log
+        inst.get_logger().propagate = False
+        inst._report_status("running", pid=os.getpid())
+        logger.info(f"[{self.script_id}] Started in-process (interval={inst.interval_seconds}s)")
+        self.instance = inst
+
+    def _finish(self, failed: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.running = False
+            if self._restart_pending:
+                self._reset(now)
+                return
+            if not failed:
+                self.failures = 0
+                self.backoff = BASE_BACKOFF
+                self.next_due = now + self.instance.current_interval
+                return
+            self.failures += 1
+            if self.instance is not None and self.failures < RESTART_AFTER_FAILURES:
+                self.next_due = now + self.instance.current_interval
+                return
+            logger.warning(
+                f"[{self.script_id}] {self.failures} failed cycle(s). "
+                f"Restarting in {self.backoff}s…"
+            )
+            self.instance = None
+            self.failures = 0
+            self.next_due = now + self.backoff
+            self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+
+    def _reset(self, now: float) -> None:
+        self._restart_pending = False
+        self.instance = None
+        self.failures = 0
+        self.backoff = BASE_BACKOFF
+        self.next_due = now
+
+    # ── Admin commands (same interface as runner.ManagedProcess) ──────────────
+
+    def restart(self) -> None:
+        """Fresh instance on the next tick; a running cycle is allowed to finish."""
+        with self._lock:
+            self._permanently_stopped = False
+            if self.running:
+                self._restart_pending = True
+            else:
+                self._reset(time.monotonic())
+        self._update_status("running")
+
+    def stop_permanently(self) -> None:
+        """No further cycles; a running cycle is allowed to finish."""
+        with self._lock:
+            self._permanently_stopped = True
+        logger.info(f"[{self.script_id}] Stopped permanently")
+        self._update_status("stopped")
+
+    def _update_status(self, status: str) -> None:
+        try:
+            from core.db import get_target_connection
+            conn = get_target_connection()
+            cur = conn.cursor()
+            cur.execute(
+                """
+                UPDATE Migration.ScriptStatus
+                SET Status = ?, UpdatedAt = GETDATE()
+                WHERE ScriptID = ?
+                """,
+                (status, self.script_id),
+            )
+            conn.commit()
+            cur.close()
+            conn.close()
+        except Exception as e:
+            logger.warning(f"[{self.script_id}] Failed to update status in DB: {e}")
+
+
+class Supervisor:
+    def __init__(self, configs: list[dict], migration_root: Path, workers: int = DEFAULT_WORKERS):
+        self.jobs: dict[str, InProcessJob] = {
+            cfg["id"]: InProcessJob(cfg, migration_root) for cfg in configs
+        }
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="migration-job")
+
+    def tick(self) -> None:
+        """Submit every job whose cycle is due."""
+        now = time.monotonic()
+        for job in self.jobs.values():
+            if job.claim(now):
+                self._pool.submit(job.run_cycle)
+
+    def shutdown(self) -> None:
+        """Stop scheduling and wait for running cycles to finish."""
+        for job in self.jobs.values():
+            with job._lock:
+                job._permanently_stopped = True
+        self._pool.shutdown(wait=True, cancel_futures=True)
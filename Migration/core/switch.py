@@ -0,0 +1,159 @@
+"""
+Partition-switch mode for day-partitioned Import_1C tables.
+
+sql/partition_switch.sql partitions a target table by a DATE column on
+``ps_Import1C_Day`` (one partition per day) and creates two empty clones,
+``<table>_SwitchIn`` and ``<table>_SwitchOut``, aligned to the same scheme.
+A copy script then replaces whole days without row-by-row DELETE/INSERT:
+
+    switch = DaySwitch("Import_1C.FactScan_OnAssembly", "OnlyDate")
+    parts = switch.partitions(cur_t, days) if switch.available(cur_t) else None
+    if parts is not None:
+        switch.load(cur_t, parts, columns, rows)     # rows of those days → _SwitchIn
+        conn_t.commit()
+        self.acquire_applock(cur_t, LOCK_NAME)
+        switch.switch(cur_t, parts)                  # metadata only
+        conn_t.commit()
+
+Per day: the live partition is switched out to ``_SwitchOut`` and the loaded
+one switched in, then ``_SwitchOut`` is truncated — three metadata
+operations instead of a logged delete of the day, and readers wait only for
+the short schema lock of the switch.  Rows keep the SnapshotID of the
+pointer, so the ``vw_*_Current`` views are unchanged.
+
+``available()`` returns False until the setup script has been run; scripts
+fall back to the DELETE + sp_SwitchSnapshot path then, and whenever a day has
+no partition of its own (``partitions()`` returns None).  Empty future
+partitions are added ahead of time by ``ensure_boundaries()``.
+"""
+import time
+from datetime import date, timedelta
+from typing import Iterable, Sequence
+
+from core.db import prepared_cursor
+
+PARTITION_FUNCTION = "pf_Import1C_Day"
+PARTITION_SCHEME   = "ps_Import1C_Day"
+AHEAD_DAYS         = 30    # empty day partitions kept beyond today
+SPLIT_BELOW_DAYS   = 7     # split when fewer than this remain
+RECHECK_SECONDS    = 600   # how long an "available" answer is cached
+
+
+class DaySwitch:
+    """Replace day partitions of ``target`` with rows staged in ``<target>_SwitchIn``."""
+
+    def __init__(self, target: str, date_column: str):
+        self.target = target
+        self.date_column = date_column
+        self.switch_in = f"{target}_SwitchIn"
+        self.switch_out = f"{target}_SwitchOut"
+        self._available: bool | None = None
+        self._checked_at = 0.0
+
+    def available(self, cur) -> bool:
+        """Target partitioned on the day scheme and both switch tables present (cached)."""
+        if self._available is None or time.monotonic() - self._checked_at >= RECHECK_SECONDS:
+            cur.execute(
+                """
+                SELECT CASE WHEN OBJECT_ID(?) IS NOT NULL AND OBJECT_ID(?) IS NOT NULL
+                             AND EXISTS (
+                                 SELECT 1
+                                 FROM sys.indexes i
+                                 JOIN sys.partition_schemes ps ON ps.data_space_id = i.data_space_id
+                                 WHERE i.object_id = OBJECT_ID(?) AND i.index_id IN (0, 1)
+                                   AND ps.name = ?)
+                            THEN 1 ELSE 0 END
+                """,
+                (self.switch_in, self.switch_out, self.target, PARTITION_SCHEME),
+            )
+            self._available = bool(cur.fetchone()[0])
+            self._checked_at = time.monotonic()
+        return self._available
+
+    @staticmethod
+    def _boundaries(cur) -> list[date]:
+        cur.execute(
+            """
+            SELECT CAST(rv.value AS date)
+            FROM sys.partition_range_values rv
+            JOIN sys.partition_functions pf ON pf.function_id = rv.function_id
+            WHERE pf.name = ?
+            ORDER BY rv.boundary_id
+            """,
+            (PARTITION_FUNCTION,),
+        )
+        return [row[0] for row in cur.fetchall()]
+
+    def partitions(self, cur, days: Iterable[date]) -> dict[date, int] | None:
+        """Partition number of each day, or None if a day does not have a partition of its own."""
+        days = sorted(set(days))
+        bounds = self._boundaries(cur)
+        known = set(bounds)
+        parts = {}
+        for d in days:
+            if d not in known or d + timedelta(days=1) not in known:
+                return None
+            # RANGE RIGHT: partition n holds [boundary n-1, boundary n)
+            parts[d] = 1 + sum(1 for b in bounds if b <= d)
+        return parts
+
+    def load(self, cur, parts: dict[date, int], columns: Sequence[str],
+             rows: Sequence[Sequence]) -> int:
+        """
+        Empty the ``_SwitchIn`` partitions of ``parts`` and insert the rows of
+        those days (``columns`` must include the date column).  Rows of other
+        days are ignored.  Does NOT commit; returns the rows inserted.
+        """
+        if not parts:
+            return 0
+        idx = list(columns).index(self.date_column)
+        payload = [tuple(r) for r in rows if r[idx] in parts]
+        cur.execute(f"TRUNCATE TABLE {self.switch_in} WITH (PARTITIONS ({_numbers(parts)}))")
+        if payload:
+            insert_sql = (
+                f"INSERT INTO {self.switch_in} ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})"
+            )
+            cur_ins = prepared_cursor(cur, insert_sql)
+            cur_ins.fast_executemany = True
+            cur_ins.executemany(insert_sql, payload)
+        return len(payload)
+
+    def switch(self, cur, parts: dict[date, int]) -> None:
+        """Swap the loaded day partitions into the target.  Under the module app lock; does NOT commit."""
+        if not parts:
+            return
+        numbers = _numbers(parts)
+        cur.execute(f"TRUNCATE TABLE {self.switch_out} WITH (PARTITIONS ({numbers}))")
+        for n in sorted(set(parts.values())):
+            cur.execute(f"ALTER TABLE {self.target} SWITCH PARTITION {n} TO {self.switch_out} PARTITION {n}")
+            cur.execute(f"ALTER TABLE {self.switch_in} SWITCH PARTITION {n} TO {self.target} PARTITION {n}")
+        cur.execute(f"TRUNCATE TABLE {self.switch_out} WITH (PARTITIONS ({numbers}))")
+
+
+def _numbers(parts: dict[date, int]) -> str:
+    return ", ".join(str(n) for n in sorted(set(parts.values())))
+
+
+def ensure_boundaries(cur, today: date | None = None) -> int:
+    """
+    Keep AHEAD_DAYS empty day partitions beyond ``today`` (split of the
+    empty last partition — metadata only).  Returns the number of
+    boundaries added.  Does NOT commit — commit before loading, so the
+    schema locks of a split are not held through the cycle.
+    """
+    today = today or date.today()
+    bounds = DaySwitch._boundaries(cur)
+    if not bounds or bounds[-1] >= today + timedelta(days=SPLIT_BELOW_DAYS):
+        return 0
+
+    from core.base import BaseMigration
+    BaseMigration.acquire_applock(cur, "Migration_Import1C_DayPartitions")
+    bounds = DaySwitch._boundaries(cur)   # another process may have split meanwhile
+    added, d = 0, bounds[-1]
+    while d < today + timedelta(days=AHEAD_DAYS):
+        d += timedelta(days=1)
+        cur.execute(f"ALTER PARTITION SCHEME {PARTITION_SCHEME} NEXT USED [PRIMARY]")
+        cur.execute(f"ALTER PARTITION FUNCTION {PARTITION_FUNCTION}() SPLIT RANGE ('{d.isoformat()}')")
+        added += 1
+    return added
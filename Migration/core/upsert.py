@@ -0,0 +1,88 @@
+"""
+Set-based upsert into a keyed table.
+
+Instead of one MERGE round-trip per source row, the rows are shipped with
+fast_executemany into a session temp table shaped like the target and merged
+by one statement:
+
+    counts = bulk_merge(cur_t, "[Import_SKUD].[empinfo]", columns, data,
+                        key_columns=("empcode",), touch_column="LastUpdated")
+    conn_t.commit()
+
+Matched rows are only updated when a value actually differs (NULL-safe
+``EXCEPT`` comparison), so unchanged rows are not rewritten and keep their
+``touch_column`` timestamp.  Duplicate keys in the source keep the last row,
+as the row-by-row MERGE did.  Nothing is committed here.
+"""
+from typing import Sequence
+
+from core import metrics
+from core.db import prepared_cursor
+
+TEMP_TABLE = "#bulk_merge_src"
+
+
+def bulk_merge(cur, target: str, columns: Sequence[str], rows: Sequence[Sequence],
+               key_columns: Sequence[str], touch_column: str | None = None,
+               delete_missing: bool = False) -> dict[str, int]:
+    """
+    Upsert ``rows`` (values in ``columns`` order) into ``target`` by
+    ``key_columns``.  ``touch_column`` is set to GETDATE() on insert/update;
+    ``delete_missing`` also deletes target rows whose key is not in ``rows``.
+    Returns ``{"inserted": n, "updated": n, "deleted": n}``.
+    """
+    columns = list(columns)
+    key_idx = [columns.index(k) for k in key_columns]
+    data = list({tuple(r[i] for i in key_idx): tuple(r) for r in rows}.values())
+
+    col_list = ", ".join(f"[{c}]" for c in columns)
+    cur.execute(f"DROP TABLE IF EXISTS {TEMP_TABLE}")
+    cur.execute(f"SELECT TOP (0) {col_list} INTO {TEMP_TABLE} FROM {target}")
+    try:
+        with metrics.phase("staging_insert"):
+            if data:
+                insert_sql = f"INSERT INTO {TEMP_TABLE} ({col_list}) VALUES ({', '.join('?' * len(columns))})"
+                cur_ins = prepared_cursor(cur, insert_sql)
+                cur_ins.fast_executemany = True
+                cur_ins.executemany(insert_sql, data)
+
+        value_cols = [c for c in columns if c not in key_columns]
+        on = " AND ".join(f"t.[{k}] = s.[{k}]" for k in key_columns)
+        set_list = [f"t.[{c}] = s.[{c}]" for c in value_cols]
+        insert_cols, insert_vals = col_list, ", ".join(f"s.[{c}]" for c in columns)
+        if touch_column:
+            set_list.append(f"t.[{touch_column}] = GETDATE()")
+            insert_cols += f", [{touch_column}]"
+            insert_vals += ", GETDATE()"
+
+        when_matched = ""
+        if value_cols:
+            changed = (
+                f"EXISTS (SELECT {', '.join(f's.[{c}]' for c in value_cols)} "
+                f"EXCEPT SELECT {', '.join(f't.[{c}]' for c in value_cols)})"
+            )
+            when_matched = f"WHEN MATCHED AND {changed} THEN UPDATE SET {', '.join(set_list)}"
+        when_missing = "WHEN NOT MATCHED BY SOURCE THEN DELETE" if delete_missing else ""
+
+        with metrics.phase("snapshot_switch"):
+            cur.execute(
+                f"""
+                MERGE {target} AS t
+                USING {TEMP_TABLE} AS s
+                   ON {on}
+                {when_matched}
+                WHEN NOT MATCHED BY TARGET THEN
+                    INSERT ({insert_cols}) VALUES ({insert_vals})
+                {when_missing}
+                OUTPUT $action;
+                """
+            )
+            actions = [row[0] for row in cur.fetchall()]
+    finally:
+        cur.execute(f"DROP TABLE IF EXISTS {TEMP_TABLE}")
+
+    return {
+        "inserted": actions.count("INSERT"),
+        "updated":  actions.count("UPDATE"),
+        "deleted":  actions.count("DELETE"),
+    }
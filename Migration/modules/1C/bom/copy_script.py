@@ -6,16 +6,14 @@ sys.path.insert(0, _MIG_ROOT)
 sys.path.insert(0, os.path.dirname(__file__))  # for local sql.py
 
 import uuid
-from datetime import datetime, date as dt_date
+from datetime import datetime
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
+from core.stream import stream_to_staging
+from core.transform import ColumnTransform, shift_1c
 from sql import QUERY_BOM_TEMPLATE
 
-
-def _shift_date_minus_2000(y):
-    if y is None:
-        return None
-    return y.replace(year=y.year - 2000)
+DATE_RULES = ColumnTransform({'Start_Day': shift_1c, 'Finish_Day': shift_1c})
 
 
 class BomCopy(BaseMigration):
@@ -36,34 +34,11 @@ class BomCopy(BaseMigration):
             cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 60000;")
 
             cur_1c.execute(QUERY_BOM_TEMPLATE)
-            columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c    = cur_1c.fetchall()
-
-            if not rows_1c:
-                return 0
-
-            idx_start  = columns_1c.index('Start_Day')  if 'Start_Day'  in columns_1c else None
-            idx_finish = columns_1c.index('Finish_Day') if 'Finish_Day' in columns_1c else None
-
-            prepped = []
-            for row in rows_1c:
-                row = list(row)
-                if idx_start  is not None and isinstance(row[idx_start],  dt_date):
-                    row[idx_start]  = _shift_date_minus_2000(row[idx_start])
-                if idx_finish is not None and isinstance(row[idx_finish], dt_date):
-                    row[idx_finish] = _shift_date_minus_2000(row[idx_finish])
-                prepped.append(tuple(row))
-            rows_1c = prepped
 
             snapshot_id = str(uuid.uuid4())
             cur_t.execute(f"DELETE FROM {self.TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-
-            insert_cols  = ['SnapshotID'] + columns_1c
-            placeholders = ",".join(["?"] * len(insert_cols))
-            insert_sql   = f"INSERT INTO {self.TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-            payload = [(snapshot_id,) + tuple(row) for row in rows_1c]
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            if not stream_to_staging(cur_1c, cur_t, self.TABLE_STAGING, snapshot_id, rules=DATE_RULES):
+                return 0
             conn_t.commit()
 
             self.acquire_applock(cur_t, "Migration_Import_BOM")
@@ -71,8 +46,7 @@ class BomCopy(BaseMigration):
                 "EXEC Import_1C.sp_SwitchSnapshot_Import_BOM @SnapshotID=?, @Full=1, @CleanupPrev=1",
                 (snapshot_id,)
             )
-            conn_t.commit()
-            cur_t.execute("EXEC QC.sp_Refresh_QC_Repainting_Bom")
+            self.queue_refreshes(cur_t)
             conn_t.commit()
 
             cur_t.execute("SELECT COUNT(*) FROM Import_1C.vw_Import_BOM_Current")
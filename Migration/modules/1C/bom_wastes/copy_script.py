@@ -1,4 +1,5 @@
 """BOM Wastes Copy Script — TRUNCATE + INSERT every 24 hours."""
+import itertools
 import sys
 import os
 _MIG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
@@ -7,6 +8,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
+from core.stream import fetch_batches
 from sql import QUERY_BOM_WASTES
 
 
@@ -29,9 +31,10 @@ class BomWastesCopy(BaseMigration):
 
             cur_1c.execute(QUERY_BOM_WASTES)
             columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c    = cur_1c.fetchall()
+            batches    = fetch_batches(cur_1c)
+            first      = next(batches, None)
 
-            if not rows_1c:
+            if not first:
                 return 0
 
             cur_t.execute(f"TRUNCATE TABLE {self.TABLE_TARGET}")
@@ -43,7 +46,8 @@ class BomWastesCopy(BaseMigration):
                 f"VALUES ({placeholders})"
             )
             cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, rows_1c)
+            for batch in itertools.chain([first], batches):
+                cur_t.executemany(insert_sql, batch)
             conn_t.commit()
 
             cur_t.execute(f"SELECT COUNT(*) FROM {self.TABLE_TARGET}")
@@ -1,4 +1,4 @@
-"""Fact Scan Copy Script — 14-day window refresh every 60 seconds."""
+"""Fact Scan Copy Script — 14-day window refresh every 60 seconds (open days only)."""
 import sys
 import os
 _MIG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
@@ -7,34 +7,80 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 import uuid
 from datetime import datetime, timedelta, date as dt_date
+from core import metrics
 from core.base import BaseMigration
-from core.db import get_1c_connection, get_target_connection
-from sql import QUERY_FACTSCAN_ONASSEMBLY_TEMPLATE
+from core.db import fetch_rows, get_1c_connection, get_target_connection
+from core.diff import row_hash
+from core.sealed import SealRule, SealedDays
+from core.switch import DaySwitch, ensure_boundaries
+from core.transform import ColumnTransform, normalize_1c
+from sql import QUERY_FACTSCAN_ONASSEMBLY_TEMPLATE, QUERY_FACTSCAN_ONASSEMBLY_SINCE_TEMPLATE
 
 WINDOW_DAYS   = 14
 TABLE_STAGING = "Import_1C.stg_FactScan_OnAssembly"
 TABLE_TARGET  = "Import_1C.FactScan_OnAssembly"
 POINTER_NAME  = "Import_1C.FactScan_OnAssembly"
+CDC_SOURCE    = "_InfoRg108073X1"
+CDC_OVERLAP   = timedelta(minutes=5)   # re-read late-committed scans
+DATE_RULES    = ColumnTransform({"ScanMinute": normalize_1c})
+LOCK_NAME     = "Migration_FactScan_OnAssembly"
+# Day partitions swapped by ALTER TABLE ... SWITCH once sql/partition_switch.sql has run
+SWITCH        = DaySwitch(TABLE_TARGET, "OnlyDate")
+# Scans are posted live; a day is final once the night shift has closed it
+SEALED        = SealedDays("FactScan_OnAssembly", SealRule(after_days=1, at_hour=2))
 
 
-def _normalize_date_like(val):
-    if val is None:
-        return None
-    if isinstance(val, datetime):
-        y = val.year
-        if y >= 3000:
-            return val.replace(year=y - 2000)
-        if y < 1900:
-            return val.replace(year=y + 2000)
-        return val
-    if isinstance(val, dt_date):
-        y = val.year
-        if y >= 3000:
-            return val.replace(year=y - 2000)
-        if y < 1900:
-            return val.replace(year=y + 2000)
-        return val
-    return val
+def _prep_rows(columns_1c, rows_1c):
+    """Normalize ScanMinute dates and append OnlyDate."""
+    idx_scan = columns_1c.index("ScanMinute") if "ScanMinute" in columns_1c else -1
+    rows_1c = DATE_RULES.apply(columns_1c, rows_1c)
+
+    if "OnlyDate" not in columns_1c and idx_scan >= 0:
+        columns_1c = list(columns_1c) + ["OnlyDate"]
+        rows_1c = [
+            tuple(list(r) + [r[idx_scan].date() if isinstance(r[idx_scan], datetime) else r[idx_scan]])
+            for r in rows_1c
+        ]
+    return columns_1c, rows_1c, idx_scan
+
+
+def _max_scan_minute(rows_1c, idx_scan):
+    minutes = [r[idx_scan] for r in rows_1c if isinstance(r[idx_scan], datetime)] if idx_scan >= 0 else []
+    return max(minutes) if minutes else None
+
+
+def _minute_hashes(rows_1c, idx_scan):
+    """{ScanMinute: content digest of its rows} — what a cycle shipped per minute."""
+    groups = {}
+    for r in rows_1c:
+        if isinstance(r[idx_scan], datetime):
+            groups.setdefault(r[idx_scan], []).append(row_hash(r))
+    return {minute: b"".join(sorted(digests)) for minute, digests in groups.items()}
+
+
+def _pointer_snapshot(cur_t):
+    cur_t.execute(
+        "SELECT SnapshotID FROM Import_1C.SnapshotPointer WITH (READCOMMITTED) WHERE TableName = ?",
+        (POINTER_NAME,),
+    )
+    row = cur_t.fetchone()
+    return str(row[0]) if row and row[0] else None
+
+
+def _snapshot_id(cur_t):
+    return _pointer_snapshot(cur_t) or str(uuid.uuid4())
+
+
+def _load_staging(cur_t, snapshot_id, columns_1c, rows_1c):
+    cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
+
+    if rows_1c:
+        insert_cols  = ['SnapshotID'] + list(columns_1c)
+        placeholders = ",".join(["?"] * len(insert_cols))
+        insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
+        payload = [(snapshot_id,) + tuple(r) for r in rows_1c]
+        cur_t.fast_executemany = True
+        cur_t.executemany(insert_sql, payload)
 
 
 class FactScanCopy(BaseMigration):
@@ -42,6 +88,19 @@ class FactScanCopy(BaseMigration):
     script_name      = "Fact Scan Copy (1C)"
     interval_seconds = 60
     category         = "continuous"
+    incremental      = True
+    reconcile_every  = 15   # full 14-day window every 15 cycles
+    diff_keys        = ("OnlyDate",)   # per-day content hash: refresh only changed days
+    adaptive             = True
+    min_interval_seconds = 30
+    max_interval_seconds = 600
+    calendar_aware       = True
+
+    def __init__(self):
+        super().__init__()
+        # Per-minute content of the rows last shipped; lets an incremental
+        # cycle tell a re-read of the overlap from real new scans
+        self._shipped: dict | None = None
 
     def run_once(self) -> int:
         conn_1c = conn_t = cur_1c = cur_t = None
@@ -52,9 +111,11 @@ class FactScanCopy(BaseMigration):
             cur_t   = conn_t.cursor()
             cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 60000;")
 
-            today          = datetime.today().date()
+            now            = datetime.now()
+            today          = now.date()
             date_to_real   = today
-            date_from_real = today - timedelta(days=WINDOW_DAYS - 1)
+            # Only the open tail of the window; sealed days stay as they are
+            date_from_real = SEALED.open_from(self, cur_t, today - timedelta(days=WINDOW_DAYS - 1), now)
 
             start_4025  = dt_date(date_from_real.year + 2000, date_from_real.month, date_from_real.day)
             finish_4025 = dt_date(date_to_real.year + 2000,   date_to_real.month,   date_to_real.day)
@@ -64,69 +125,160 @@ class FactScanCopy(BaseMigration):
                 finish_day=finish_4025.strftime("%Y-%m-%d"),
             )
 
-            cur_1c.execute(query)
-            columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c    = cur_1c.fetchall()
+            columns_1c, rows_1c = fetch_rows(cur_1c, query)
 
-            # Normalize ScanMinute dates
-            idx_scan = columns_1c.index("ScanMinute") if "ScanMinute" in columns_1c else -1
-            rows_1c = [
-                tuple(
-                    _normalize_date_like(v) if i == idx_scan else v
-                    for i, v in enumerate(row)
-                )
-                for row in rows_1c
-            ]
-
-            # Ensure OnlyDate column
-            if "OnlyDate" not in columns_1c and idx_scan >= 0:
-                columns_1c = list(columns_1c) + ["OnlyDate"]
-                rows_1c = [
-                    tuple(list(r) + [r[idx_scan].date() if isinstance(r[idx_scan], datetime) else r[idx_scan]])
-                    for r in rows_1c
-                ]
-
-            changed_dates = {r[-1] for r in rows_1c} if rows_1c else set()
-
-            # SnapshotID
-            cur_t.execute(
-                "SELECT SnapshotID FROM Import_1C.SnapshotPointer WITH (READCOMMITTED) WHERE TableName = ?",
-                (POINTER_NAME,),
-            )
-            row = cur_t.fetchone()
-            snapshot_id = str(row[0]) if row and row[0] else str(uuid.uuid4())
-
-            cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-
-            if rows_1c:
-                insert_cols  = ['SnapshotID'] + list(columns_1c)
-                placeholders = ",".join(["?"] * len(insert_cols))
-                insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-                payload = [(snapshot_id,) + tuple(r) for r in rows_1c]
-                cur_t.fast_executemany = True
-                cur_t.executemany(insert_sql, payload)
+            columns_1c, rows_1c, idx_scan = _prep_rows(columns_1c, rows_1c)
+
+            # Rows are tagged with the pointer snapshot; a full sync switching to
+            # a new one leaves no baseline, so every day of the window is rewritten
+            pointer = _pointer_snapshot(cur_t)
+
+            # TV caches only for days whose content changed since the previous
+            # full cycle (days touched by incremental cycles in between show up
+            # as changed again — a harmless extra refresh)
+            day_diff = self.differ.diff(columns_1c, rows_1c, (pointer, date_from_real, date_to_real))
+            if day_diff.has_baseline:
+                self.get_logger().info(f"[DIFF] days {day_diff.summary()}")
+                changed_dates = {key[0] for key in day_diff.changed_keys}
+            else:
+                changed_dates = {r[-1] for r in rows_1c}
+
+            # Partition-switch mode needs the pointer snapshot (rows keep its ID)
+            # and a partition of its own for every day to replace
+            parts = None
+            if pointer and SWITCH.available(cur_t):
+                if ensure_boundaries(cur_t, today):
+                    conn_t.commit()
+                days = changed_dates if day_diff.has_baseline else {
+                    date_from_real + timedelta(days=i) for i in range((date_to_real - date_from_real).days + 1)
+                }
+                parts = SWITCH.partitions(cur_t, days)
+
+            if parts is not None:
+                with metrics.phase("staging_insert"):
+                    SWITCH.load(cur_t, parts, ["SnapshotID"] + list(columns_1c),
+                                [(pointer, *r) for r in rows_1c])
+                conn_t.commit()
+
+                self.acquire_applock(cur_t, LOCK_NAME)
+                # A full sync may have switched the pointer after it was read:
+                # the _SwitchIn rows then carry the old ID and would vanish from
+                # _Current — reload the whole window through staging instead
+                current = _pointer_snapshot(cur_t)
+                if current == pointer:
+                    with metrics.phase("snapshot_switch"):
+                        SWITCH.switch(cur_t, parts)
+                else:
+                    self.get_logger().warning(
+                        f"[SWITCH] pointer moved {pointer} → {current} during the load — staging fallback")
+                    conn_t.rollback()
+                    pointer, parts = current, None
+
+            if parts is None:
+                snapshot_id = pointer or str(uuid.uuid4())
+                with metrics.phase("staging_insert"):
+                    _load_staging(cur_t, snapshot_id, columns_1c, rows_1c)
+                conn_t.commit()
+
+                cur_t.execute(f"SELECT TOP(1) 1 FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
+                if not cur_t.fetchone():
+                    return 0
+
+                self.acquire_applock(cur_t, LOCK_NAME)
+                with metrics.phase("snapshot_switch"):
+                    cur_t.execute(
+                        f"DELETE FROM {TABLE_TARGET} WHERE SnapshotID = ? AND OnlyDate BETWEEN ? AND ?",
+                        (snapshot_id, date_from_real, date_to_real),
+                    )
+                    cur_t.execute(
+                        "EXEC Import_1C.sp_SwitchSnapshot_FactScan_OnAssembly"
+                        " @SnapshotID=?, @DateFrom=?, @DateTo=?, @Full=0, @CleanupPrev=1",
+                        (snapshot_id, date_from_real, date_to_real),
+                    )
+            mark = _max_scan_minute(rows_1c, idx_scan)
+            if mark is not None:
+                self.save_watermark(cur_t, CDC_SOURCE, mark)
+            SEALED.advance(self, cur_t, now)
+            self.queue_refreshes(cur_t, changed_dates)
             conn_t.commit()
+            self.differ.accept(day_diff)
+            self._shipped = _minute_hashes(rows_1c, idx_scan) if idx_scan >= 0 else None
+            self.cycle_changed = day_diff.has_baseline and bool(changed_dates)
 
-            cur_t.execute(f"SELECT TOP(1) 1 FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-            if not cur_t.fetchone():
-                return 0
+            return len(rows_1c)
+        finally:
+            for obj in (cur_1c, cur_t, conn_1c, conn_t):
+                try:
+                    if obj: obj.close()
+                except Exception:
+                    pass
 
-            self.acquire_applock(cur_t, "Migration_FactScan_OnAssembly")
-            cur_t.execute(
-                f"DELETE FROM {TABLE_TARGET} WHERE SnapshotID = ? AND OnlyDate BETWEEN ? AND ?",
-                (snapshot_id, date_from_real, date_to_real),
-            )
-            cur_t.execute(
-                "EXEC Import_1C.sp_SwitchSnapshot_FactScan_OnAssembly"
-                " @SnapshotID=?, @DateFrom=?, @DateTo=?, @Full=0, @CleanupPrev=1",
-                (snapshot_id, date_from_real, date_to_real),
+    def run_incremental(self) -> int:
+        """Re-aggregate only the minutes from the stored period mark on."""
+        conn_1c = conn_t = cur_1c = cur_t = None
+        try:
+            conn_1c = get_1c_connection()
+            conn_t  = get_target_connection()
+            cur_1c  = conn_1c.cursor()
+            cur_t   = conn_t.cursor()
+            cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 60000;")
+
+            mark = self.load_watermark(cur_t, CDC_SOURCE)
+            if not isinstance(mark, datetime):
+                conn_t.rollback()
+                return self.run_once()
+
+            since_real = mark - CDC_OVERLAP
+            since_1c   = since_real.replace(year=since_real.year + 2000)
+            query = QUERY_FACTSCAN_ONASSEMBLY_SINCE_TEMPLATE.format(
+                since=since_1c.strftime("%Y-%m-%d %H:%M:%S"),
             )
+
+            columns_1c, rows_1c = fetch_rows(cur_1c, query)
+            columns_1c, rows_1c, idx_scan = _prep_rows(columns_1c, rows_1c)
+
+            # The overlap always re-reads the watermark minute itself: compare
+            # per minute with what was shipped and write only on a real change
+            fresh = _minute_hashes(rows_1c, idx_scan) if idx_scan >= 0 else {}
+            if self._shipped is None:
+                if not rows_1c:
+                    conn_t.commit()
+                    self.cycle_changed = False
+                    return 0
+                changed_minutes = set(fresh)
+            else:
+                shipped = {m: h for m, h in self._shipped.items() if m >= since_real}
+                changed_minutes = {m for m in fresh.keys() | shipped.keys() if fresh.get(m) != shipped.get(m)}
+            if not changed_minutes:
+                conn_t.commit()
+                self.cycle_changed = False
+                return 0
+            changed_dates = {m.date() for m in changed_minutes}
+
+            snapshot_id = _snapshot_id(cur_t)
+            with metrics.phase("staging_insert"):
+                _load_staging(cur_t, snapshot_id, columns_1c, rows_1c)
             conn_t.commit()
 
-            for d in sorted(changed_dates):
-                cur_t.execute("EXEC Production_TV.sp_Refresh_Cache_Fact_Day  @date=?", (d,))
-                cur_t.execute("EXEC Production_TV.sp_Refresh_Cache_Fact_Takt @date=?", (d,))
+            self.acquire_applock(cur_t, LOCK_NAME)
+            with metrics.phase("snapshot_switch"):
+                cur_t.execute(
+                    f"DELETE FROM {TABLE_TARGET} WHERE SnapshotID = ? AND ScanMinute >= ?",
+                    (snapshot_id, since_real),
+                )
+                col_list = ", ".join(['SnapshotID'] + list(columns_1c))
+                cur_t.execute(
+                    f"INSERT INTO {TABLE_TARGET} ({col_list}) "
+                    f"SELECT {col_list} FROM {TABLE_STAGING} WHERE SnapshotID = ?",
+                    (snapshot_id,),
+                )
+                cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
+            self.save_watermark(cur_t, CDC_SOURCE, max(mark, _max_scan_minute(rows_1c, idx_scan) or mark))
+            self.queue_refreshes(cur_t, changed_dates)
             conn_t.commit()
+            # The mark never moves back, so later cycles compare only minutes >= since_real
+            self._shipped = fresh
+            self.cycle_changed = True
 
             return len(rows_1c)
         finally:
@@ -48,3 +48,11 @@ GROUP BY
     DATEADD(YEAR,-2000, SCAN_CTE.ScanMinute),
     WC_T._Fld51315, PO_T._Number, WS._Number, OR_T._Number, NM_T._Fld62053, NM_T._Fld51315;
 """
+
+# Incremental variant: scans registered since the period mark (the register
+# is append-only; minutes from the mark on are re-aggregated and replaced).
+_WINDOW_FILTER = "WHERE CAST(A._Fld108081 AS date) BETWEEN '{start_day}' AND '{finish_day}'"
+assert _WINDOW_FILTER in QUERY_FACTSCAN_ONASSEMBLY_TEMPLATE
+QUERY_FACTSCAN_ONASSEMBLY_SINCE_TEMPLATE = QUERY_FACTSCAN_ONASSEMBLY_TEMPLATE.replace(
+    _WINDOW_FILTER, "WHERE A._Fld108081 >= '{since}'"
+)
@@ -6,11 +6,15 @@ sys.path.insert(0, _MIG_ROOT)
 sys.path.insert(0, os.path.dirname(__file__))
 
 import uuid
-from datetime import datetime, date as dt_date
+from datetime import datetime
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
+from core.stream import stream_to_staging
+from core.transform import ColumnTransform, shift_1c
 from sql import QUERY_LABOR_COST_TEMPLATE
 
+DATE_RULES = ColumnTransform({'Date': shift_1c})
+
 
 class LaborCostCopy(BaseMigration):
     script_id        = "1c_labor_cost"
@@ -30,29 +34,12 @@ class LaborCostCopy(BaseMigration):
             cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 60000;")
 
             cur_1c.execute(QUERY_LABOR_COST_TEMPLATE)
-            columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c    = cur_1c.fetchall()
-
-            if not rows_1c:
-                return 0
-
-            idx_date = columns_1c.index('Date')
-            rows_shifted = []
-            for row in rows_1c:
-                row = list(row)
-                if isinstance(row[idx_date], dt_date):
-                    row[idx_date] = row[idx_date].replace(year=row[idx_date].year - 2000)
-                rows_shifted.append(tuple(row))
 
             snapshot_id = str(uuid.uuid4())
             cur_t.execute(f"DELETE FROM {self.TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-
-            insert_cols  = ['SnapshotID'] + columns_1c
-            placeholders = ",".join(["?"] * len(insert_cols))
-            insert_sql   = f"INSERT INTO {self.TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-            payload = [(snapshot_id,) + tuple(row) for row in rows_shifted]
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            loaded = stream_to_staging(cur_1c, cur_t, self.TABLE_STAGING, snapshot_id, rules=DATE_RULES)
+            if not loaded:
+                return 0
             conn_t.commit()
 
             cur_t.execute(
@@ -60,7 +47,7 @@ class LaborCostCopy(BaseMigration):
                 (snapshot_id,)
             )
             conn_t.commit()
-            return len(rows_shifted)
+            return loaded
         finally:
             for obj in (cur_1c, cur_t, conn_1c, conn_t):
                 try:
@@ -8,19 +8,18 @@ _MIG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..',
 sys.path.insert(0, _MIG_ROOT)
 sys.path.insert(0, os.path.dirname(__file__))
 
+from core import metrics
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
-from sql import QUERY_MATERIALS_MOVE_WINDOW_TEMPLATE
+from core.stream import stream_to_staging
+from core.transform import ColumnTransform, shift_1c_date
+from sql import QUERY_MATERIALS_MOVE_WINDOW_TEMPLATE, QUERY_MATERIALS_MOVE_CHANGES_TEMPLATE
 
 WINDOW_DAYS   = 60
 TABLE_STAGING = "Import_1C.stg_Materials_Move"
-
-
-def _shift_date_minus_2000(y):
-    shifted = y.replace(year=y.year - 2000)
-    if hasattr(shifted, 'date'):
-        return shifted.date()
-    return shifted
+TABLE_TARGET  = "Import_1C.Materials_Move"
+CDC_SOURCE    = "_Document1655X1"
+DATE_RULES    = ColumnTransform({'Doc_Date': shift_1c_date})
 
 
 def _ensure_snapshot_id(cur_t):
@@ -58,11 +57,35 @@ def _ensure_snapshot_id(cur_t):
     return new_snap
 
 
+def _window_bounds():
+    today          = datetime.today().date()
+    date_to_real   = today
+    date_from_real = today - timedelta(days=WINDOW_DAYS)
+
+    datetime_from_4025 = datetime(
+        year=date_from_real.year + 2000, month=date_from_real.month, day=date_from_real.day,
+        hour=0, minute=0, second=0
+    )
+    datetime_to_4025 = datetime(
+        year=date_to_real.year + 2000, month=date_to_real.month, day=date_to_real.day,
+        hour=23, minute=59, second=59
+    )
+    return (date_from_real, date_to_real,
+            datetime_from_4025.strftime("%Y-%m-%d %H:%M:%S"),
+            datetime_to_4025.strftime("%Y-%m-%d %H:%M:%S"))
+
+
 class MaterialsMoveCopy(BaseMigration):
     script_id        = "1c_materials_move"
     script_name      = "1C Materials Move (60-day window)"
     interval_seconds = 600
     category         = "continuous"
+    incremental      = True
+    reconcile_every  = 12   # full 60-day window every 12 cycles (catches physical deletes)
+    adaptive             = True
+    min_interval_seconds = 300
+    max_interval_seconds = 3600
+    calendar_aware       = True
 
     def run_once(self) -> int:
         conn_1c = conn_t = cur_1c = cur_t = None
@@ -74,55 +97,21 @@ class MaterialsMoveCopy(BaseMigration):
 
             cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 60000;")
 
-            today          = datetime.today().date()
-            date_to_real   = today
-            date_from_real = today - timedelta(days=WINDOW_DAYS)
-
-            datetime_from_4025 = datetime(
-                year=date_from_real.year + 2000, month=date_from_real.month, day=date_from_real.day,
-                hour=0, minute=0, second=0
-            )
-            datetime_to_4025 = datetime(
-                year=date_to_real.year + 2000, month=date_to_real.month, day=date_to_real.day,
-                hour=23, minute=59, second=59
-            )
+            date_from_real, date_to_real, date_from_1c, date_to_1c = _window_bounds()
 
+            version_mark = self.source_rowversion(cur_1c)
             query = QUERY_MATERIALS_MOVE_WINDOW_TEMPLATE.format(
-                date_from=datetime_from_4025.strftime("%Y-%m-%d %H:%M:%S"),
-                date_to=datetime_to_4025.strftime("%Y-%m-%d %H:%M:%S")
+                date_from=date_from_1c,
+                date_to=date_to_1c
             )
 
             cur_1c.execute(query)
-            columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c = cur_1c.fetchall()
-
-            if not rows_1c:
-                return 0
-
-            date_fields  = ['Doc_Date']
-            date_indices = {f: columns_1c.index(f) for f in date_fields if f in columns_1c}
-
-            if date_indices:
-                prepped = []
-                for row in rows_1c:
-                    row = list(row)
-                    for field, idx in date_indices.items():
-                        if row[idx] is not None:
-                            row[idx] = _shift_date_minus_2000(row[idx])
-                    prepped.append(tuple(row))
-                rows_1c = prepped
 
             snapshot_id = _ensure_snapshot_id(cur_t)
 
             cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-
-            insert_cols  = ['SnapshotID'] + columns_1c
-            placeholders = ",".join(["?"] * len(insert_cols))
-            insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-
-            payload = [(snapshot_id,) + tuple(row) for row in rows_1c]
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            if not stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id, rules=DATE_RULES):
+                return 0
             conn_t.commit()
 
             cur_t.execute(f"SELECT TOP (1) 1 FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
@@ -130,30 +119,32 @@ class MaterialsMoveCopy(BaseMigration):
                 return 0
 
             self.acquire_applock(cur_t, "Migration_Materials_Move")
-            cur_t.execute(
-                """
-                DELETE FROM Import_1C.Materials_Move
-                WHERE SnapshotID = ?
-                  AND Doc_Date BETWEEN ? AND ?;
-                """,
-                (snapshot_id, date_from_real, date_to_real)
-            )
-
-            cur_t.execute(
-                """
-                EXEC Import_1C.sp_SwitchSnapshot_Materials_Move
-                  @SnapshotID  = ?,
-                  @DateFrom    = ?,
-                  @DateTo      = ?,
-                  @Full        = 0,
-                  @CleanupPrev = 1;
-                """,
-                (snapshot_id, date_from_real, date_to_real)
-            )
-            conn_t.commit()
-
-            cur_t.execute("EXEC QC.sp_Refresh_Defects_Movement")
+            with metrics.phase("snapshot_switch"):
+                cur_t.execute(
+                    """
+                    DELETE FROM Import_1C.Materials_Move
+                    WHERE SnapshotID = ?
+                      AND Doc_Date BETWEEN ? AND ?;
+                    """,
+                    (snapshot_id, date_from_real, date_to_real)
+                )
+
+                cur_t.execute(
+                    """
+                    EXEC Import_1C.sp_SwitchSnapshot_Materials_Move
+                      @SnapshotID  = ?,
+                      @DateFrom    = ?,
+                      @DateTo      = ?,
+                      @Full        = 0,
+                      @CleanupPrev = 1;
+                    """,
+                    (snapshot_id, date_from_real, date_to_real)
+                )
+            self.save_watermark(cur_t, CDC_SOURCE, version_mark)
+            self.queue_refreshes(cur_t)
             conn_t.commit()
+            # Reconcile pass re-reads everything; the change rate comes from incremental cycles
+            self.cycle_changed = False
 
             cur_t.execute("SELECT COUNT(*) FROM Import_1C.vw_Materials_Move_Current")
             final_count = cur_t.fetchone()[0]
@@ -166,6 +157,67 @@ class MaterialsMoveCopy(BaseMigration):
                 except Exception:
                     pass
 
+    def run_incremental(self) -> int:
+        """Re-read only documents of the window changed since the stored rowversion."""
+        conn_1c = conn_t = cur_1c = cur_t = None
+        try:
+            conn_1c = get_1c_connection()
+            conn_t  = get_target_connection()
+            cur_1c  = conn_1c.cursor()
+            cur_t   = conn_t.cursor()
+
+            cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 60000;")
+
+            since = self.load_watermark(cur_t, CDC_SOURCE)
+            if not isinstance(since, (bytes, bytearray)):
+                conn_t.rollback()
+                return self.run_once()
+
+            _, _, date_from_1c, date_to_1c = _window_bounds()
+
+            version_mark = self.source_rowversion(cur_1c)
+            query = QUERY_MATERIALS_MOVE_CHANGES_TEMPLATE.format(
+                date_from=date_from_1c,
+                date_to=date_to_1c,
+                since_version="0x" + bytes(since).hex(),
+            )
+
+            cur_1c.execute(query)
+            columns_1c = [c[0] for c in cur_1c.description]
+            idx_doc = columns_1c.index("Doc_ID")
+            changed_docs = set()
+
+            def collect(row):
+                changed_docs.add(row[idx_doc])   # read back only after the stream is done
+                return row
+
+            snapshot_id = _ensure_snapshot_id(cur_t)
+
+            cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
+            loaded = stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id,
+                                       transform=collect, rules=DATE_RULES)
+            if not loaded:
+                conn_t.rollback()
+                self.save_watermark(cur_t, CDC_SOURCE, version_mark)
+                conn_t.commit()
+                return 0
+            conn_t.commit()
+
+            self.acquire_applock(cur_t, "Migration_Materials_Move")
+            self.apply_changes(cur_t, TABLE_STAGING, TABLE_TARGET, snapshot_id,
+                               "Doc_ID", changed_docs, columns_1c)
+            self.save_watermark(cur_t, CDC_SOURCE, version_mark)
+            self.queue_refreshes(cur_t)
+            conn_t.commit()
+
+            return loaded
+        finally:
+            for obj in [cur_1c, cur_t, conn_1c, conn_t]:
+                try:
+                    if obj: obj.close()
+                except Exception:
+                    pass
+
 
 if __name__ == "__main__":
     MaterialsMoveCopy().run()
@@ -52,3 +52,10 @@ LEFT JOIN _Reference937X1 AS Parent_Warehouse_T2 ON Warehouse_T2._ParentIDRRef =
 WHERE Materials_Move_T._Date_Time >= '{date_from}'
   AND Materials_Move_T._Date_Time <= '{date_to}'
 """
+
+# Incremental variant: only documents of the window changed since the
+# rowversion mark (1C bumps _Version on every document write).
+QUERY_MATERIALS_MOVE_CHANGES_TEMPLATE = (
+    QUERY_MATERIALS_MOVE_WINDOW_TEMPLATE.rstrip()
+    + "\n  AND Materials_Move_T._Version >= {since_version}\n"
+)
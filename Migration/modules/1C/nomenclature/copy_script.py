@@ -9,6 +9,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
+from core.stream import stream_to_staging
 from sql import QUERY_NOMENCLATURE_REFERENCE_TEMPLATE
 
 TABLE_STAGING = "Import_1C.stg_Nomenclature_Reference"
@@ -32,22 +33,12 @@ class NomenclatureCopy(BaseMigration):
 
             cur_1c.execute(QUERY_NOMENCLATURE_REFERENCE_TEMPLATE)
             columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c = cur_1c.fetchall()
-
-            if not rows_1c:
-                return 0
 
             snapshot_id = str(uuid.uuid4())
 
             cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-
-            insert_cols  = ['SnapshotID'] + columns_1c
-            placeholders = ",".join(["?"] * len(insert_cols))
-            insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-
-            payload = [(snapshot_id,) + tuple(row) for row in rows_1c]
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            if not stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id):
+                return 0
             conn_t.commit()
 
             cur_t.execute(
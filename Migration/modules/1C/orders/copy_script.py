@@ -2,42 +2,27 @@
 import sys
 import os
 import uuid
-from datetime import datetime, date as dt_date, datetime as dt_datetime
+from datetime import datetime
 
 _MIG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 sys.path.insert(0, _MIG_ROOT)
 sys.path.insert(0, os.path.dirname(__file__))
 
+from core import metrics
 from core.base import BaseMigration
-from core.db import get_1c_connection, get_target_connection
+from core.db import fetch_rows, get_1c_connection, get_target_connection
+from core.transform import ColumnTransform, shift_1c_or_null
 from sql import QUERY_ORDER_1C
 
 TABLE_STAGING = "Import_1C.stg_Order_1C_v2"
-SHIFT_YEARS   = 2000
-ZERO_DATE     = dt_date(2001, 1, 1)
 
-DATE_COLS = {
+# Empty 1C date → NULL, the rest -2000 years
+DATE_RULES = ColumnTransform(dict.fromkeys([
     "OrderDate", "OrderConformDay", "RunOrderDay",
     "OrderShipmentDay", "OrderShipmentDay_OR_T2", "PlannedShipmentDay",
     "CloseWork_StartDay", "CloseWork_FinishDay", "ScanStartDay", "ScanFinishDay",
     "ShipmentDate",
-}
-
-
-def _shift_and_normalize(value):
-    if isinstance(value, dt_datetime):
-        if value.date() == ZERO_DATE:
-            return None
-    if isinstance(value, dt_date) and not isinstance(value, dt_datetime):
-        if value == ZERO_DATE:
-            return None
-
-    if isinstance(value, dt_datetime):
-        return value.replace(year=value.year - SHIFT_YEARS) if value.year >= 4000 else value
-    if isinstance(value, dt_date):
-        return value.replace(year=value.year - SHIFT_YEARS) if value.year >= 4000 else value
-
-    return value
+], shift_1c_or_null))
 
 
 class OrderCopy(BaseMigration):
@@ -45,6 +30,11 @@ class OrderCopy(BaseMigration):
     script_name      = "1C Orders full refresh"
     interval_seconds = 120
     category         = "continuous"
+    diff_keys        = ("OrderID", "NomenclatureID")
+    adaptive             = True
+    min_interval_seconds = 60
+    max_interval_seconds = 900
+    calendar_aware       = True
 
     def run_once(self) -> int:
         conn_1c = conn_t = cur_1c = cur_t = None
@@ -55,21 +45,27 @@ class OrderCopy(BaseMigration):
             cur_t   = conn_t.cursor()
             cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 60000;")
 
-            cur_1c.execute(QUERY_ORDER_1C)
-            cols = [c[0] for c in cur_1c.description]
-            rows = cur_1c.fetchall()
+            cols, rows = fetch_rows(cur_1c, QUERY_ORDER_1C)
 
             if not rows:
                 return 0
 
-            idx_to_shift = [i for i, name in enumerate(cols) if name in DATE_COLS]
-            prepped = []
-            for row in rows:
-                r = list(row)
-                for idx in idx_to_shift:
-                    r[idx] = _shift_and_normalize(r[idx])
-                prepped.append(tuple(r))
-            rows = prepped
+            rows = DATE_RULES.apply(cols, rows)
+
+            # Hash-diff against the previous cycle: nothing changed — no new snapshot
+            cur_t.execute("""
+                SELECT SnapshotID
+                FROM Import_1C.SnapshotPointer WITH (READCOMMITTED)
+                WHERE TableName = 'Import_1C.Order_1C_v2'
+            """)
+            row = cur_t.fetchone()
+            current_snap = str(row[0]) if row and row[0] is not None else None
+            diff = self.differ.diff(cols, rows, current_snap)
+            if diff.is_empty:
+                self.get_logger().info(f"[DIFF] {diff.summary()} — snapshot switch skipped")
+                return 0
+            if diff.has_baseline:
+                self.get_logger().info(f"[DIFF] {diff.summary()}")
 
             snap = str(uuid.uuid4())
 
@@ -80,8 +76,9 @@ class OrderCopy(BaseMigration):
             insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
 
             payload = [(snap,) + tuple(r) for r in rows]
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            with metrics.phase("staging_insert"):
+                cur_t.fast_executemany = True
+                cur_t.executemany(insert_sql, payload)
 
             cur_t.execute(f"""
                 ;WITH d AS (
@@ -97,13 +94,23 @@ class OrderCopy(BaseMigration):
             """, (snap,))
             conn_t.commit()
 
-            cur_t.execute("""
-                EXEC Import_1C.sp_SwitchSnapshot_Order_1C_v2
-                  @SnapshotID = ?, @CleanupPrev = 1;
-            """, (snap,))
+            with metrics.phase("snapshot_switch"):
+                cur_t.execute("""
+                    EXEC Import_1C.sp_SwitchSnapshot_Order_1C_v2
+                      @SnapshotID = ?, @CleanupPrev = 1;
+                """, (snap,))
             conn_t.commit()
+            self.differ.accept(diff, token=snap)
 
             cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snap,))
+            # Shipment-rule flags on Market / Security_Scheme / ProductTagZh
+            # (no-op unless the rules use them)
+            cur_t.execute(
+                """
+                IF OBJECT_ID(N'Orders.sp_Refresh_ShipmentRule_Flags', N'P') IS NOT NULL
+                    EXEC Orders.sp_Refresh_ShipmentRule_Flags @IfStale = 1;
+                """
+            )
             conn_t.commit()
 
             return len(rows)
@@ -1,4 +1,4 @@
-"""Copies Daily_PlanFact from 1C into the target DB (60-day rolling window)."""
+"""Copies Daily_PlanFact from 1C into the target DB (60-day rolling window, open days only)."""
 import sys
 import os
 import uuid
@@ -8,16 +8,20 @@ _MIG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..',
 sys.path.insert(0, _MIG_ROOT)
 sys.path.insert(0, os.path.dirname(__file__))
 
+from core import metrics
 from core.base import BaseMigration
-from core.db import get_1c_connection, get_target_connection
+from core.db import fetch_rows, get_1c_connection, get_target_connection
+from core.sealed import SealRule, SealedDays
+from core.transform import ColumnTransform, shift_1c
 from sql import QUERY_DAILY_PLANFACT_TEMPLATE
 
 WINDOW_DAYS   = 60
 TABLE_STAGING = "Import_1C.stg_Daily_PlanFact"
-
-
-def _shift_onlydate_minus_2000(y):
-    return y.replace(year=y.year - 2000)
+TABLE_TARGET  = "Import_1C.Daily_PlanFact"
+DATE_RULES    = ColumnTransform({'OnlyDate': shift_1c})
+BUSINESS_KEY  = ("OnlyDate", "WorkCentorID", "WorkNumberID", "ProductionOrderID", "NomenclatureID")
+# Plans are fixed 12 h into the day; facts get corrected through the next day
+SEALED        = SealedDays("Daily_PlanFact", SealRule(after_days=2, at_hour=6))
 
 
 def _ensure_snapshot_id(cur_t):
@@ -78,6 +82,11 @@ class PlanFactCopy(BaseMigration):
     script_name      = "1C Daily PlanFact (60-day window)"
     interval_seconds = 60
     category         = "continuous"
+    diff_keys        = BUSINESS_KEY
+    adaptive             = True
+    min_interval_seconds = 30
+    max_interval_seconds = 900
+    calendar_aware       = True
 
     def run_once(self) -> int:
         conn_1c = conn_t = cur_1c = cur_t = None
@@ -89,9 +98,11 @@ class PlanFactCopy(BaseMigration):
 
             cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 60000;")
 
-            today          = datetime.today().date()
+            now            = datetime.now()
+            today          = now.date()
             date_to_real   = today
-            date_from_real = today - timedelta(days=WINDOW_DAYS)
+            # Only the open tail of the window; sealed days stay as they are
+            date_from_real = SEALED.open_from(self, cur_t, today - timedelta(days=WINDOW_DAYS), now)
 
             finish_4025 = dt_date(year=date_to_real.year   + 2000, month=date_to_real.month,   day=date_to_real.day)
             start_4025  = dt_date(year=date_from_real.year + 2000, month=date_from_real.month, day=date_from_real.day)
@@ -101,24 +112,17 @@ class PlanFactCopy(BaseMigration):
                 finish_day=finish_4025.strftime("%Y-%m-%d")
             )
 
-            cur_1c.execute(query)
-            columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c = cur_1c.fetchall()
+            columns_1c, rows_1c = fetch_rows(cur_1c, query)
 
             if not rows_1c:
                 return 0
 
+            rows_1c = DATE_RULES.apply(columns_1c, rows_1c)
+
             changed_dates = set()
             if 'OnlyDate' in columns_1c:
                 idx_onlydate = columns_1c.index('OnlyDate')
-                prepped = []
-                for row in rows_1c:
-                    row = list(row)
-                    if isinstance(row[idx_onlydate], dt_date):
-                        row[idx_onlydate] = _shift_onlydate_minus_2000(row[idx_onlydate])
-                        changed_dates.add(row[idx_onlydate])
-                    prepped.append(tuple(row))
-                rows_1c = prepped
+                changed_dates = {r[idx_onlydate] for r in rows_1c if isinstance(r[idx_onlydate], dt_date)}
             else:
                 d = date_from_real
                 while d <= date_to_real:
@@ -127,53 +131,66 @@ class PlanFactCopy(BaseMigration):
 
             snapshot_id = _ensure_snapshot_id(cur_t)
 
+            # Hash-diff: only keys that changed since the previous cycle are shipped
+            diff = self.differ.diff(columns_1c, rows_1c, (snapshot_id, date_from_real, date_to_real))
+            if diff.is_empty:
+                SEALED.advance(self, cur_t, now)
+                conn_t.commit()
+                self.get_logger().info(f"[DIFF] {diff.summary()} — snapshot switch skipped")
+                return 0
+            if diff.has_baseline:
+                self.get_logger().info(f"[DIFF] {diff.summary()}")
+                rows_1c = diff.changed_rows
+                changed_dates = {key[0] for key in diff.changed_keys}
+
             cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
 
             insert_cols  = ['SnapshotID'] + columns_1c
             placeholders = ",".join(["?"] * len(insert_cols))
             insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
             payload      = [(snapshot_id,) + tuple(r) for r in rows_1c]
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            with metrics.phase("staging_insert"):
+                if payload:
+                    cur_t.fast_executemany = True
+                    cur_t.executemany(insert_sql, payload)
 
             _dedupe_staging(cur_t, snapshot_id)
             conn_t.commit()
 
-            cur_t.execute(f"SELECT TOP (1) 1 FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-            if cur_t.fetchone() is None:
-                return 0
+            if not diff.has_baseline:
+                cur_t.execute(f"SELECT TOP (1) 1 FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
+                if cur_t.fetchone() is None:
+                    return 0
 
             self.acquire_applock(cur_t, "Migration_Daily_PlanFact")
-            cur_t.execute(
-                """
-                DELETE FROM Import_1C.Daily_PlanFact
-                WHERE SnapshotID = ?
-                  AND OnlyDate BETWEEN ? AND ?;
-                """,
-                (snapshot_id, date_from_real, date_to_real)
-            )
-
-            cur_t.execute(
-                """
-                EXEC Import_1C.sp_SwitchSnapshot_Daily_PlanFact
-                  @SnapshotID = ?, @DateFrom = ?, @DateTo = ?, @Full = 0, @CleanupPrev = 1;
-                """,
-                (snapshot_id, date_from_real, date_to_real)
-            )
-
-            if changed_dates:
-                for d in sorted(changed_dates):
-                    cur_t.execute("EXEC Production_TV.sp_Refresh_Cache_Plan_Base @date = ?", (d,))
-                    cur_t.execute("EXEC Production_TV.sp_Refresh_Cache_OrderSlots_Day @date = ?", (d,))
-            conn_t.commit()
-
-            cur_t.execute("EXEC QC.sp_Refresh_Production_Output_Cost")
+            if diff.has_baseline:
+                self.apply_changes(cur_t, TABLE_STAGING, TABLE_TARGET, snapshot_id,
+                                   BUSINESS_KEY, diff.changed_keys, columns_1c)
+            else:
+                with metrics.phase("snapshot_switch"):
+                    cur_t.execute(
+                        """
+                        DELETE FROM Import_1C.Daily_PlanFact
+                        WHERE SnapshotID = ?
+                          AND OnlyDate BETWEEN ? AND ?;
+                        """,
+                        (snapshot_id, date_from_real, date_to_real)
+                    )
+
+                    cur_t.execute(
+                        """
+                        EXEC Import_1C.sp_SwitchSnapshot_Daily_PlanFact
+                          @SnapshotID = ?, @DateFrom = ?, @DateTo = ?, @Full = 0, @CleanupPrev = 1;
+                        """,
+                        (snapshot_id, date_from_real, date_to_real)
+                    )
+
+            SEALED.advance(self, cur_t, now)
+            self.queue_refreshes(cur_t, changed_dates)
             conn_t.commit()
+            self.differ.accept(diff)
 
-            cur_t.execute("SELECT COUNT(*) FROM QC.Production_Output_Cost")
-            output_count = cur_t.fetchone()[0]
-
-            return output_count
+            return len(rows_1c)
         finally:
             for obj in [cur_1c, cur_t, conn_1c, conn_t]:
                 try:
@@ -9,10 +9,13 @@ import uuid
 from datetime import date as dt_date
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
+from core.stream import stream_to_staging
+from core.transform import ColumnTransform, shift_1c
 from sql import QUERY_DAILY_PLANFACT_TEMPLATE
 
 TABLE_STAGING = "Import_1C.stg_Daily_PlanFact"
 START_4025    = "4025-01-01"
+DATE_RULES    = ColumnTransform({'OnlyDate': shift_1c})
 
 
 class PlanFactFullSync(BaseMigration):
@@ -37,32 +40,24 @@ class PlanFactFullSync(BaseMigration):
             )
             cur_1c.execute(query)
             columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c    = cur_1c.fetchall()
-
-            if not rows_1c:
-                return 0
 
             changed_dates = set()
             idx_date = columns_1c.index('OnlyDate') if 'OnlyDate' in columns_1c else None
-            shifted = []
-            for row in rows_1c:
-                row = list(row)
+
+            def _collect_dates(row):
                 if idx_date is not None and isinstance(row[idx_date], dt_date):
-                    row[idx_date] = row[idx_date].replace(year=row[idx_date].year - 2000)
                     changed_dates.add(row[idx_date])
-                shifted.append(tuple(row))
+                return row
 
             snapshot_id = str(uuid.uuid4())
 
-            # Deduplicate in staging
-            insert_cols  = ['SnapshotID'] + columns_1c
-            placeholders = ','.join(['?'] * len(insert_cols))
-            insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-            payload      = [(snapshot_id,) + r for r in shifted]
-
             cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            loaded = stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id,
+                                       rules=DATE_RULES, transform=_collect_dates)
+            if not loaded:
+                return 0
+
+            # Deduplicate in staging
 
             cur_t.execute(
                 f"""
@@ -86,18 +81,10 @@ class PlanFactFullSync(BaseMigration):
                 "EXEC Import_1C.sp_SwitchSnapshot_Daily_PlanFact @SnapshotID=?, @Full=1, @CleanupPrev=1",
                 (snapshot_id,)
             )
+            self.queue_refreshes(cur_t, changed_dates)
             conn_t.commit()
 
-            if changed_dates:
-                for d in sorted(changed_dates):
-                    cur_t.execute("EXEC Production_TV.sp_Refresh_Cache_Plan_Base @date=?", (d,))
-                    cur_t.execute("EXEC Production_TV.sp_Refresh_Cache_OrderSlots_Day @date=?", (d,))
-                conn_t.commit()
-
-            cur_t.execute("EXEC QC.sp_Refresh_Production_Output_Cost")
-            conn_t.commit()
-
-            return len(shifted)
+            return loaded
         finally:
             for obj in (cur_1c, cur_t, conn_1c, conn_t):
                 try:
@@ -8,16 +8,12 @@ sys.path.insert(0, os.path.dirname(__file__))
 import uuid
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
+from core.stream import stream_to_staging
+from core.transform import ColumnTransform, shift_1c_date
 from sql import QUERY_PRICE_LIST_TEMPLATE
 
 TABLE_STAGING = "Import_1C.stg_Price_List"
-
-
-def _shift_minus_2000(v):
-    shifted = v.replace(year=v.year - 2000)
-    if hasattr(shifted, 'date'):
-        return shifted.date()
-    return shifted
+DATE_RULES = ColumnTransform({'Date': shift_1c_date})
 
 
 class PriceListFullSync(BaseMigration):
@@ -35,29 +31,12 @@ class PriceListFullSync(BaseMigration):
             cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 120000;")
 
             cur_1c.execute(QUERY_PRICE_LIST_TEMPLATE)
-            columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c    = cur_1c.fetchall()
-
-            if not rows_1c:
-                return 0
-
-            idx_date = columns_1c.index('Date') if 'Date' in columns_1c else None
-            shifted = []
-            for row in rows_1c:
-                row = list(row)
-                if idx_date is not None and row[idx_date] is not None:
-                    row[idx_date] = _shift_minus_2000(row[idx_date])
-                shifted.append(tuple(row))
-
-            snapshot_id  = str(uuid.uuid4())
-            insert_cols  = ['SnapshotID'] + columns_1c
-            placeholders = ','.join(['?'] * len(insert_cols))
-            insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-            payload      = [(snapshot_id,) + r for r in shifted]
 
+            snapshot_id = str(uuid.uuid4())
             cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            loaded = stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id, rules=DATE_RULES)
+            if not loaded:
+                return 0
             conn_t.commit()
 
             self.acquire_applock(cur_t, "Migration_Price_List")
@@ -65,9 +44,10 @@ class PriceListFullSync(BaseMigration):
                 "EXEC Import_1C.sp_SwitchSnapshot_Price_List @SnapshotID=?, @Full=1, @CleanupPrev=1",
                 (snapshot_id,)
             )
+            self.queue_refreshes(cur_t)
             conn_t.commit()
 
-            return len(shifted)
+            return loaded
         finally:
             for obj in (cur_1c, cur_t, conn_1c, conn_t):
                 try:
@@ -8,19 +8,17 @@ _MIG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..',
 sys.path.insert(0, _MIG_ROOT)
 sys.path.insert(0, os.path.dirname(__file__))
 
+from core import metrics
 from core.base import BaseMigration
-from core.db import get_1c_connection, get_target_connection
+from core.db import fetch_rows, get_1c_connection, get_target_connection
+from core.transform import ColumnTransform, shift_1c_date
 from sql import QUERY_QC_CARDS_WINDOW_TEMPLATE
 
 WINDOW_DAYS   = 60
 TABLE_STAGING = "Import_1C.stg_QC_Cards"
-
-
-def _shift_date_minus_2000(y):
-    shifted = y.replace(year=y.year - 2000)
-    if hasattr(shifted, 'date'):
-        return shifted.date()
-    return shifted
+TABLE_TARGET  = "Import_1C.QC_Cards"
+BUSINESS_KEY  = ("DocID",)
+DATE_RULES    = ColumnTransform(dict.fromkeys(['Create_Date', 'Status_Date', 'Work_FinishDate'], shift_1c_date))
 
 
 def _ensure_snapshot_id(cur_t):
@@ -63,6 +61,11 @@ class QCCardsCopy(BaseMigration):
     script_name      = "1C QC Cards (60-day window)"
     interval_seconds = 600
     category         = "continuous"
+    diff_keys        = BUSINESS_KEY
+    adaptive             = True
+    min_interval_seconds = 300
+    max_interval_seconds = 3600
+    calendar_aware       = True
 
     def run_once(self) -> int:
         conn_1c = conn_t = cur_1c = cur_t = None
@@ -86,28 +89,25 @@ class QCCardsCopy(BaseMigration):
                 date_to=datetime_to_4025.strftime("%Y-%m-%d %H:%M:%S")
             )
 
-            cur_1c.execute(query)
-            columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c = cur_1c.fetchall()
+            columns_1c, rows_1c = fetch_rows(cur_1c, query)
 
             if not rows_1c:
                 return 0
 
-            date_fields  = ['Create_Date', 'Status_Date', 'Work_FinishDate']
-            date_indices = {f: columns_1c.index(f) for f in date_fields if f in columns_1c}
-
-            if date_indices:
-                prepped = []
-                for row in rows_1c:
-                    row = list(row)
-                    for field, idx in date_indices.items():
-                        if row[idx] is not None:
-                            row[idx] = _shift_date_minus_2000(row[idx])
-                    prepped.append(tuple(row))
-                rows_1c = prepped
+            rows_1c = DATE_RULES.apply(columns_1c, rows_1c)
 
             snapshot_id = _ensure_snapshot_id(cur_t)
 
+            # Hash-diff: only cards that changed since the previous cycle are shipped
+            diff = self.differ.diff(columns_1c, rows_1c, (snapshot_id, date_from_real, date_to_real))
+            if diff.is_empty:
+                conn_t.commit()
+                self.get_logger().info(f"[DIFF] {diff.summary()} — snapshot switch skipped")
+                return 0
+            if diff.has_baseline:
+                self.get_logger().info(f"[DIFF] {diff.summary()}")
+                rows_1c = diff.changed_rows
+
             cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
 
             insert_cols  = ['SnapshotID'] + columns_1c
@@ -115,39 +115,46 @@ class QCCardsCopy(BaseMigration):
             insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
 
             payload = [(snapshot_id,) + tuple(row) for row in rows_1c]
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            with metrics.phase("staging_insert"):
+                if payload:
+                    cur_t.fast_executemany = True
+                    cur_t.executemany(insert_sql, payload)
             conn_t.commit()
 
-            cur_t.execute(f"SELECT TOP (1) 1 FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-            if cur_t.fetchone() is None:
-                return 0
+            if not diff.has_baseline:
+                cur_t.execute(f"SELECT TOP (1) 1 FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
+                if cur_t.fetchone() is None:
+                    return 0
 
             self.acquire_applock(cur_t, "Migration_QC_Cards")
-            cur_t.execute(
-                """
-                DELETE FROM Import_1C.QC_Cards
-                WHERE SnapshotID = ?
-                  AND Create_Date BETWEEN ? AND ?;
-                """,
-                (snapshot_id, date_from_real, date_to_real)
-            )
-
-            cur_t.execute(
-                """
-                EXEC Import_1C.sp_SwitchSnapshot_QC_Cards
-                  @SnapshotID  = ?,
-                  @DateFrom    = ?,
-                  @DateTo      = ?,
-                  @Full        = 0,
-                  @CleanupPrev = 1;
-                """,
-                (snapshot_id, date_from_real, date_to_real)
-            )
-            conn_t.commit()
-
-            cur_t.execute("EXEC QC.sp_Refresh_QC_Cards_Summary")
+            if diff.has_baseline:
+                self.apply_changes(cur_t, TABLE_STAGING, TABLE_TARGET, snapshot_id,
+                                   BUSINESS_KEY, diff.changed_keys, columns_1c)
+            else:
+                with metrics.phase("snapshot_switch"):
+                    cur_t.execute(
+                        """
+                        DELETE FROM Import_1C.QC_Cards
+                        WHERE SnapshotID = ?
+                          AND Create_Date BETWEEN ? AND ?;
+                        """,
+                        (snapshot_id, date_from_real, date_to_real)
+                    )
+
+                    cur_t.execute(
+                        """
+                        EXEC Import_1C.sp_SwitchSnapshot_QC_Cards
+                          @SnapshotID  = ?,
+                          @DateFrom    = ?,
+                          @DateTo      = ?,
+                          @Full        = 0,
+                          @CleanupPrev = 1;
+                        """,
+                        (snapshot_id, date_from_real, date_to_real)
+                    )
+            self.queue_refreshes(cur_t)
             conn_t.commit()
+            self.differ.accept(diff)
 
             cur_t.execute("SELECT COUNT(*) FROM Import_1C.vw_QC_Cards_Current")
             final_count = cur_t.fetchone()[0]
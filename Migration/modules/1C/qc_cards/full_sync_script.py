@@ -8,17 +8,12 @@ sys.path.insert(0, os.path.dirname(__file__))
 import uuid
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
+from core.stream import stream_to_staging
+from core.transform import ColumnTransform, shift_1c_date
 from sql import QUERY_QC_CARDS_TEMPLATE
 
 TABLE_STAGING  = "Import_1C.stg_QC_Cards"
-DATE_FIELDS    = ['Create_Date', 'Status_Date', 'Work_FinishDate']
-
-
-def _shift_minus_2000(v):
-    shifted = v.replace(year=v.year - 2000)
-    if hasattr(shifted, 'date'):
-        return shifted.date()
-    return shifted
+DATE_RULES     = ColumnTransform(dict.fromkeys(['Create_Date', 'Status_Date', 'Work_FinishDate'], shift_1c_date))
 
 
 class QCCardsFullSync(BaseMigration):
@@ -36,30 +31,12 @@ class QCCardsFullSync(BaseMigration):
             cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 120000;")
 
             cur_1c.execute(QUERY_QC_CARDS_TEMPLATE)
-            columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c    = cur_1c.fetchall()
-
-            if not rows_1c:
-                return 0
-
-            date_indices = {f: columns_1c.index(f) for f in DATE_FIELDS if f in columns_1c}
-            shifted = []
-            for row in rows_1c:
-                row = list(row)
-                for idx in date_indices.values():
-                    if row[idx] is not None:
-                        row[idx] = _shift_minus_2000(row[idx])
-                shifted.append(tuple(row))
-
-            snapshot_id  = str(uuid.uuid4())
-            insert_cols  = ['SnapshotID'] + columns_1c
-            placeholders = ','.join(['?'] * len(insert_cols))
-            insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-            payload      = [(snapshot_id,) + r for r in shifted]
 
+            snapshot_id = str(uuid.uuid4())
             cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            loaded = stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id, rules=DATE_RULES)
+            if not loaded:
+                return 0
             conn_t.commit()
 
             self.acquire_applock(cur_t, "Migration_QC_Cards")
@@ -67,12 +44,10 @@ class QCCardsFullSync(BaseMigration):
                 "EXEC Import_1C.sp_SwitchSnapshot_QC_Cards @SnapshotID=?, @Full=1, @CleanupPrev=1",
                 (snapshot_id,)
             )
+            self.queue_refreshes(cur_t)
             conn_t.commit()
 
-            cur_t.execute("EXEC QC.sp_Refresh_QC_Cards_Summary")
-            conn_t.commit()
-
-            return len(shifted)
+            return loaded
         finally:
             for obj in (cur_1c, cur_t, conn_1c, conn_t):
                 try:
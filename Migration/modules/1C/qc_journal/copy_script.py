@@ -10,17 +10,13 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
+from core.stream import stream_to_staging
+from core.transform import ColumnTransform, shift_1c_date
 from sql import QUERY_QC_JOURNAL_WINDOW_TEMPLATE
 
 WINDOW_DAYS   = 60
 TABLE_STAGING = "Import_1C.stg_QC_Journal"
-
-
-def _shift_date_minus_2000(y):
-    shifted = y.replace(year=y.year - 2000)
-    if hasattr(shifted, 'date'):
-        return shifted.date()
-    return shifted
+DATE_RULES    = ColumnTransform({'Date': shift_1c_date})
 
 
 def _ensure_snapshot_id(cur_t):
@@ -87,32 +83,12 @@ class QCJournalCopy(BaseMigration):
             )
 
             cur_1c.execute(query)
-            columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c    = cur_1c.fetchall()
-
-            if not rows_1c:
-                return 0
-
-            if 'Date' in columns_1c:
-                idx_date = columns_1c.index('Date')
-                prepped = []
-                for row in rows_1c:
-                    row = list(row)
-                    if row[idx_date] is not None:
-                        row[idx_date] = _shift_date_minus_2000(row[idx_date])
-                    prepped.append(tuple(row))
-                rows_1c = prepped
 
             snapshot_id = _ensure_snapshot_id(cur_t)
 
             cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-
-            insert_cols  = ['SnapshotID'] + columns_1c
-            placeholders = ",".join(["?"] * len(insert_cols))
-            insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-            payload      = [(snapshot_id,) + tuple(row) for row in rows_1c]
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            if not stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id, rules=DATE_RULES):
+                return 0
             conn_t.commit()
 
             cur_t.execute(f"SELECT TOP (1) 1 FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
@@ -133,9 +109,7 @@ class QCJournalCopy(BaseMigration):
                 """,
                 (snapshot_id, date_from_real, date_to_real)
             )
-            conn_t.commit()
-
-            cur_t.execute("EXEC QC.sp_Refresh_LQC_Journal")
+            self.queue_refreshes(cur_t)
             conn_t.commit()
 
             cur_t.execute("SELECT COUNT(*) FROM Import_1C.vw_QC_Journal_Current")
@@ -5,21 +5,25 @@ _MIG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..',
 sys.path.insert(0, _MIG_ROOT)
 sys.path.insert(0, os.path.dirname(__file__))
 
-import uuid
 from datetime import date as dt_date
 from core.base import BaseMigration
-from core.db import get_1c_connection, get_target_connection
+from core.db import get_target_connection
+from core.partition import PartitionedFullSync, to_1c_date
+from core.stream import stream_to_staging
+from core.transform import ColumnTransform, shift_1c_date
 from sql import QUERY_QC_JOURNAL_WINDOW_TEMPLATE
 
 TABLE_STAGING = "Import_1C.stg_QC_Journal"
-START_4025 = "4025-01-01 00:00:00"
+START_REAL = dt_date(2025, 1, 1)   # 4025-01-01 in 1C
+DATE_RULES = ColumnTransform({'Date': shift_1c_date})
 
 
-def _shift_minus_2000(v):
-    shifted = v.replace(year=v.year - 2000)
-    if hasattr(shifted, 'date'):
-        return shifted.date()
-    return shifted
+def _load_partition(cur_1c, cur_t, snapshot_id, part) -> int:
+    cur_1c.execute(QUERY_QC_JOURNAL_WINDOW_TEMPLATE.format(
+        date_from=f"{to_1c_date(part.date_from)} 00:00:00",
+        date_to=f"{to_1c_date(part.date_to)} 23:59:59",
+    ))
+    return stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id, rules=DATE_RULES)
 
 
 class QCJournalFullSync(BaseMigration):
@@ -28,59 +32,29 @@ class QCJournalFullSync(BaseMigration):
     category    = "scheduled"
 
     def run_once(self) -> int:
-        conn_1c = conn_t = cur_1c = cur_t = None
+        # Partitions by date are loaded in parallel; a failed one is resumed next run
+        sync = PartitionedFullSync(self, TABLE_STAGING, START_REAL, dt_date.today(), _load_partition)
+        snapshot_id, loaded = sync.load()
+
+        conn_t = cur_t = None
         try:
-            conn_1c = get_1c_connection()
-            conn_t  = get_target_connection()
-            cur_1c  = conn_1c.cursor()
-            cur_t   = conn_t.cursor()
+            conn_t = get_target_connection()
+            cur_t  = conn_t.cursor()
             cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 120000;")
 
-            today    = dt_date.today()
-            end_4025 = f"{today.year + 2000}-{today.month:02d}-{today.day:02d} 23:59:59"
-
-            query = QUERY_QC_JOURNAL_WINDOW_TEMPLATE.format(
-                date_from=START_4025, date_to=end_4025
-            )
-            cur_1c.execute(query)
-            columns_1c = [c[0] for c in cur_1c.description]
-            rows_1c    = cur_1c.fetchall()
-
-            if not rows_1c:
-                return 0
-
-            idx_date = columns_1c.index('Date') if 'Date' in columns_1c else None
-            shifted = []
-            for row in rows_1c:
-                row = list(row)
-                if idx_date is not None and row[idx_date] is not None:
-                    row[idx_date] = _shift_minus_2000(row[idx_date])
-                shifted.append(tuple(row))
-
-            snapshot_id  = str(uuid.uuid4())
-            insert_cols  = ['SnapshotID'] + columns_1c
-            placeholders = ','.join(['?'] * len(insert_cols))
-            insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-            payload      = [(snapshot_id,) + r for r in shifted]
-
-            cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
-            conn_t.commit()
-
-            self.acquire_applock(cur_t, "Migration_QC_Journal")
-            cur_t.execute(
-                "EXEC Import_1C.sp_SwitchSnapshot_QC_Journal @SnapshotID=?, @Full=1, @CleanupPrev=1",
-                (snapshot_id,)
-            )
-            conn_t.commit()
-
-            cur_t.execute("EXEC QC.sp_Refresh_LQC_Journal")
+            if loaded:
+                self.acquire_applock(cur_t, "Migration_QC_Journal")
+                cur_t.execute(
+                    "EXEC Import_1C.sp_SwitchSnapshot_QC_Journal @SnapshotID=?, @Full=1, @CleanupPrev=1",
+                    (snapshot_id,)
+                )
+                self.queue_refreshes(cur_t)
+            sync.finish(cur_t)
             conn_t.commit()
 
-            return len(shifted)
+            return loaded
         finally:
-            for obj in (cur_1c, cur_t, conn_1c, conn_t):
+            for obj in (cur_t, conn_t):
                 try:
                     if obj: obj.close()
                 except Exception:
@@ -2,7 +2,7 @@
 import sys
 import os
 import uuid
-from datetime import datetime, timedelta, date as dt_date, datetime as dt_datetime
+from datetime import datetime, timedelta, date as dt_date
 
 _MIG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 sys.path.insert(0, _MIG_ROOT)
@@ -10,18 +10,29 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
-from sql import QUERY_SHIPMENTS_TEMPLATE
+from core.stream import fetch_batches, stream_to_staging
+from core.transform import shift_1c
+from sql import (
+    QUERY_SHIPMENTS_TEMPLATE,
+    QUERY_SHIPMENTS_CHANGES_TEMPLATE,
+    QUERY_SHIPMENTS_CHANGED_KEYS_TEMPLATE,
+)
 
 WINDOW_DAYS   = 60
 TABLE_STAGING = "Import_1C.stg_Shipments"
+TABLE_TARGET  = "Import_1C.Shipments"
+CDC_SOURCE    = "_Document1772X1"
 
-
-def _shift_minus_2000(v):
-    if isinstance(v, dt_date) and not isinstance(v, dt_datetime):
-        return v.replace(year=v.year - 2000)
-    if isinstance(v, dt_datetime):
-        return v.replace(year=v.year - 2000)
-    return v
+STAGING_COLUMNS = [
+    'SpendingOrder_ID', 'SpendingOrder_No', 'Comment', 'RecipientID', 'TSD_ID',
+    'SpendingOrder_Date_Real', 'NomenclatureID', 'OrderID_SpendingOrder_TableProduct',
+    'SpendingOrder_QTY', 'ShipmentDate_Fact_Real', 'ContainerID_TSD', 'RealizationDocID',
+    'RealizationDate_Real', 'RealizationDoc', 'PartnerID', 'ContainerID_Realization',
+    'CI_NoID', 'CI_No', 'OrderNo_SpendingOrder_TableProduct', 'Article_number', 'Name_CN', 'CBM',
+    'ContainerNO_Realization', 'Recipient_Name', 'Partner_Name',
+    'UnitPrice', 'PriceTypeID', 'PriceTypeName', 'CNYRate',
+    'SnapshotID'
+]
 
 
 def _ensure_pointer(cur_t):
@@ -59,69 +70,29 @@ def _ensure_pointer(cur_t):
     return new_snap
 
 
-def _load_staging(cur_t, snapshot_id, cols, rows):
-    colset   = {c: i for i, c in enumerate(cols)}
-    idx_SOD  = colset.get('SpendingOrder_Date')
-    idx_ShipF = colset.get('ShipmentDate_Fact')
-    idx_RealD = colset.get('RealizationDate')
-
-    insert_cols = [
-        'SpendingOrder_ID', 'SpendingOrder_No', 'Comment', 'RecipientID', 'TSD_ID',
-        'SpendingOrder_Date_Real', 'NomenclatureID', 'OrderID_SpendingOrder_TableProduct',
-        'SpendingOrder_QTY', 'ShipmentDate_Fact_Real', 'ContainerID_TSD', 'RealizationDocID',
-        'RealizationDate_Real', 'RealizationDoc', 'PartnerID', 'ContainerID_Realization',
-        'CI_NoID', 'CI_No', 'OrderNo_SpendingOrder_TableProduct', 'Article_number', 'Name_CN', 'CBM',
-        'ContainerNO_Realization', 'Recipient_Name', 'Partner_Name',
-        'UnitPrice', 'PriceTypeID', 'PriceTypeName', 'CNYRate',
-        'SnapshotID'
+# Staging columns filled from a 1C date column shifted by -2000 years
+_SHIFTED = {
+    'SpendingOrder_Date_Real': 'SpendingOrder_Date',
+    'ShipmentDate_Fact_Real':  'ShipmentDate_Fact',
+    'RealizationDate_Real':    'RealizationDate',
+}
+LOAD_COLUMNS = [c for c in STAGING_COLUMNS if c != 'SnapshotID']
+
+
+def _staging_row(cols):
+    """Row transform for stream_to_staging: 1C row → LOAD_COLUMNS values."""
+    colset = {c: i for i, c in enumerate(cols)}
+    getters = [
+        (colset.get(_SHIFTED[c]), True) if c in _SHIFTED else (colset[c], False)
+        for c in LOAD_COLUMNS
     ]
-    placeholders = ",".join(["?"] * len(insert_cols))
-    sql = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
-
-    payload = []
-    for r in rows:
-        r = list(r)
-        sod_real   = _shift_minus_2000(r[idx_SOD])   if idx_SOD   is not None else None
-        shipf_real = _shift_minus_2000(r[idx_ShipF]) if idx_ShipF is not None else None
-        reald_real = _shift_minus_2000(r[idx_RealD]) if idx_RealD is not None else None
-
-        row_out = [
-            r[colset.get('SpendingOrder_ID')],
-            r[colset.get('SpendingOrder_No')],
-            r[colset.get('Comment')],
-            r[colset.get('RecipientID')],
-            r[colset.get('TSD_ID')],
-            sod_real,
-            r[colset.get('NomenclatureID')],
-            r[colset.get('OrderID_SpendingOrder_TableProduct')],
-            r[colset.get('SpendingOrder_QTY')],
-            shipf_real,
-            r[colset.get('ContainerID_TSD')],
-            r[colset.get('RealizationDocID')],
-            reald_real,
-            r[colset.get('RealizationDoc')],
-            r[colset.get('PartnerID')],
-            r[colset.get('ContainerID_Realization')],
-            r[colset.get('CI_NoID')],
-            r[colset.get('CI_No')],
-            r[colset.get('OrderNo_SpendingOrder_TableProduct')],
-            r[colset.get('Article_number')],
-            r[colset.get('Name_CN')],
-            r[colset.get('CBM')],
-            r[colset.get('ContainerNO_Realization')],
-            r[colset.get('Recipient_Name')],
-            r[colset.get('Partner_Name')],
-            r[colset.get('UnitPrice')],
-            r[colset.get('PriceTypeID')],
-            r[colset.get('PriceTypeName')],
-            r[colset.get('CNYRate')],
-            snapshot_id
-        ]
-        payload.append(tuple(row_out))
-
-    if payload:
-        cur_t.fast_executemany = True
-        cur_t.executemany(sql, payload)
+
+    def transform(r):
+        return tuple(
+            None if i is None else (shift_1c(r[i]) if shift else r[i])
+            for i, shift in getters
+        )
+    return transform
 
 
 def _dedupe_staging(cur_t, snapshot_id):
@@ -142,11 +113,23 @@ def _dedupe_staging(cur_t, snapshot_id):
     )
 
 
+def _window_bounds():
+    today          = datetime.today().date()
+    date_to_real   = today
+    date_from_real = today - timedelta(days=WINDOW_DAYS)
+
+    start_4025  = dt_date(year=date_from_real.year + 2000, month=date_from_real.month, day=date_from_real.day)
+    finish_4025 = dt_date(year=date_to_real.year   + 2000, month=date_to_real.month,   day=date_to_real.day)
+    return date_from_real, date_to_real, start_4025.strftime("%Y-%m-%d"), finish_4025.strftime("%Y-%m-%d")
+
+
 class ShipmentsCopy(BaseMigration):
     script_id        = "1c_shipments"
     script_name      = "1C Shipments (60-day window)"
     interval_seconds = 60
     category         = "continuous"
+    incremental      = True
+    reconcile_every  = 30   # full 60-day window every 30 minutes (catches physical deletes)
 
     def run_once(self) -> int:
         conn_1c = conn_t = cur_1c = cur_t = None
@@ -157,29 +140,24 @@ class ShipmentsCopy(BaseMigration):
             cur_t   = conn_t.cursor()
             cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 60000;")
 
-            today          = datetime.today().date()
-            date_to_real   = today
-            date_from_real = today - timedelta(days=WINDOW_DAYS)
-
-            start_4025  = dt_date(year=date_from_real.year + 2000, month=date_from_real.month, day=date_from_real.day)
-            finish_4025 = dt_date(year=date_to_real.year   + 2000, month=date_to_real.month,   day=date_to_real.day)
+            date_from_real, date_to_real, start_1c, finish_1c = _window_bounds()
 
+            version_mark = self.source_rowversion(cur_1c)
             query = QUERY_SHIPMENTS_TEMPLATE.format(
-                start_day=start_4025.strftime("%Y-%m-%d"),
-                finish_day=finish_4025.strftime("%Y-%m-%d")
+                start_day=start_1c,
+                finish_day=finish_1c
             )
 
+            snapshot_id = _ensure_pointer(cur_t)
+            cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
+
             cur_1c.execute(query)
             cols = [c[0] for c in cur_1c.description]
-            rows = cur_1c.fetchall()
-
-            if not rows:
+            loaded = stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id,
+                                       transform=_staging_row(cols), columns=LOAD_COLUMNS)
+            if not loaded:
                 return 0
 
-            snapshot_id = _ensure_pointer(cur_t)
-
-            cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-            _load_staging(cur_t, snapshot_id, cols, rows)
             _dedupe_staging(cur_t, snapshot_id)
             conn_t.commit()
 
@@ -204,9 +182,91 @@ class ShipmentsCopy(BaseMigration):
                 """,
                 (snapshot_id, date_from_real, date_to_real)
             )
+            # Shipment-rule flags for the refreshed window, same transaction as the switch
+            cur_t.execute(
+                """
+                IF OBJECT_ID(N'Orders.sp_Refresh_ShipmentRule_Flags', N'P') IS NOT NULL
+                    EXEC Orders.sp_Refresh_ShipmentRule_Flags @DateFrom = ?, @DateTo = ?;
+                """,
+                (date_from_real, date_to_real)
+            )
+            self.save_watermark(cur_t, CDC_SOURCE, version_mark)
+            conn_t.commit()
+
+            return loaded
+        finally:
+            for obj in [cur_1c, cur_t, conn_1c, conn_t]:
+                try:
+                    if obj: obj.close()
+                except Exception:
+                    pass
+
+    def run_incremental(self) -> int:
+        """Re-read only spending orders of the window changed since the stored rowversion."""
+        conn_1c = conn_t = cur_1c = cur_t = None
+        try:
+            conn_1c = get_1c_connection()
+            conn_t  = get_target_connection()
+            cur_1c  = conn_1c.cursor()
+            cur_t   = conn_t.cursor()
+            cur_t.execute("SET XACT_ABORT ON; SET LOCK_TIMEOUT 60000;")
+
+            since = self.load_watermark(cur_t, CDC_SOURCE)
+            if not isinstance(since, (bytes, bytearray)):
+                conn_t.rollback()
+                return self.run_once()
+
+            date_from_real, date_to_real, start_1c, finish_1c = _window_bounds()
+            since_literal = "0x" + bytes(since).hex()
+
+            version_mark = self.source_rowversion(cur_1c)
+            cur_1c.execute(QUERY_SHIPMENTS_CHANGED_KEYS_TEMPLATE.format(
+                since_version=since_literal, start_day=start_1c, finish_day=finish_1c,
+            ))
+            changed_keys = set()
+            for batch in fetch_batches(cur_1c):
+                changed_keys.update(r[0] for r in batch)
+
+            snapshot_id = _ensure_pointer(cur_t)
+            cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
+
+            cur_1c.execute(QUERY_SHIPMENTS_CHANGES_TEMPLATE.format(
+                since_version=since_literal, start_day=start_1c, finish_day=finish_1c,
+            ))
+            cols = [c[0] for c in cur_1c.description]
+            to_staging = _staging_row(cols)
+            idx_so = cols.index("SpendingOrder_ID")
+
+            def transform(r):
+                changed_keys.add(r[idx_so])   # read back only after the stream is done
+                return to_staging(r)
+
+            loaded = stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id,
+                                       transform=transform, columns=LOAD_COLUMNS)
+
+            if not changed_keys:
+                conn_t.rollback()
+                self.save_watermark(cur_t, CDC_SOURCE, version_mark)
+                conn_t.commit()
+                return 0
+
+            _dedupe_staging(cur_t, snapshot_id)
+            conn_t.commit()
+
+            self.acquire_applock(cur_t, "Migration_Shipments")
+            self.apply_changes(cur_t, TABLE_STAGING, TABLE_TARGET, snapshot_id,
+                               "SpendingOrder_ID", changed_keys, STAGING_COLUMNS)
+            cur_t.execute(
+                """
+                IF OBJECT_ID(N'Orders.sp_Refresh_ShipmentRule_Flags', N'P') IS NOT NULL
+                    EXEC Orders.sp_Refresh_ShipmentRule_Flags @DateFrom = ?, @DateTo = ?;
+                """,
+                (date_from_real, date_to_real)
+            )
+            self.save_watermark(cur_t, CDC_SOURCE, version_mark)
             conn_t.commit()
 
-            return len(rows)
+            return loaded
         finally:
             for obj in [cur_1c, cur_t, conn_1c, conn_t]:
                 try:
@@ -6,24 +6,19 @@ sys.path.insert(0, _MIG_ROOT)
 sys.path.insert(0, os.path.dirname(__file__))
 
 import uuid
-from datetime import date as dt_date, datetime as dt_datetime
+from datetime import date as dt_date
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
+from core.stream import stream_to_staging
+from core.transform import shift_1c
 from sql import QUERY_SHIPMENTS_TEMPLATE
 
 TABLE_STAGING = "Import_1C.stg_Shipments"
 START_4025    = "4025-01-01"
 
 
-def _shift_minus_2000(v):
-    if isinstance(v, dt_date) and not isinstance(v, dt_datetime):
-        return v.replace(year=v.year - 2000)
-    if isinstance(v, dt_datetime):
-        return v.replace(year=v.year - 2000)
-    return v
-
-
-def _build_payload(cols, rows, snapshot_id):
+def _row_builder(cols):
+    """(insert columns, row → values) for streaming into stg_Shipments."""
     colset    = {c: i for i, c in enumerate(cols)}
     idx_SOD   = colset.get('SpendingOrder_Date')
     idx_ShipF = colset.get('ShipmentDate_Fact')
@@ -36,26 +31,24 @@ def _build_payload(cols, rows, snapshot_id):
         'RealizationDate_Real', 'RealizationDoc', 'PartnerID', 'ContainerID_Realization',
         'CI_NoID', 'CI_No', 'OrderNo_SpendingOrder_TableProduct', 'Article_number',
         'Name_CN', 'CBM', 'ContainerNO_Realization', 'Recipient_Name', 'Partner_Name',
-        'UnitPrice', 'PriceTypeID', 'PriceTypeName', 'CNYRate', 'SnapshotID',
+        'UnitPrice', 'PriceTypeID', 'PriceTypeName', 'CNYRate',
     ]
 
-    payload = []
-    for r in rows:
-        r = list(r)
-        payload.append(tuple([
+    def build(r):
+        return (
             r[colset.get('SpendingOrder_ID')],
             r[colset.get('SpendingOrder_No')],
             r[colset.get('Comment')],
             r[colset.get('RecipientID')],
             r[colset.get('TSD_ID')],
-            _shift_minus_2000(r[idx_SOD])   if idx_SOD   is not None else None,
+            shift_1c(r[idx_SOD])   if idx_SOD   is not None else None,
             r[colset.get('NomenclatureID')],
             r[colset.get('OrderID_SpendingOrder_TableProduct')],
             r[colset.get('SpendingOrder_QTY')],
-            _shift_minus_2000(r[idx_ShipF]) if idx_ShipF is not None else None,
+            shift_1c(r[idx_ShipF]) if idx_ShipF is not None else None,
             r[colset.get('ContainerID_TSD')],
             r[colset.get('RealizationDocID')],
-            _shift_minus_2000(r[idx_RealD]) if idx_RealD is not None else None,
+            shift_1c(r[idx_RealD]) if idx_RealD is not None else None,
             r[colset.get('RealizationDoc')],
             r[colset.get('PartnerID')],
             r[colset.get('ContainerID_Realization')],
@@ -72,9 +65,8 @@ def _build_payload(cols, rows, snapshot_id):
             r[colset.get('PriceTypeID')],
             r[colset.get('PriceTypeName')],
             r[colset.get('CNYRate')],
-            snapshot_id,
-        ]))
-    return insert_cols, payload
+        )
+    return insert_cols, build
 
 
 class ShipmentsFullSync(BaseMigration):
@@ -99,20 +91,15 @@ class ShipmentsFullSync(BaseMigration):
             )
             cur_1c.execute(query)
             cols = [c[0] for c in cur_1c.description]
-            rows = cur_1c.fetchall()
-
-            if not rows:
-                return 0
 
             snapshot_id = str(uuid.uuid4())
-            insert_cols, payload = _build_payload(cols, rows, snapshot_id)
-
-            placeholders = ','.join(['?'] * len(insert_cols))
-            insert_sql   = f"INSERT INTO {TABLE_STAGING} ({', '.join(insert_cols)}) VALUES ({placeholders})"
+            insert_cols, build = _row_builder(cols)
 
             cur_t.execute(f"DELETE FROM {TABLE_STAGING} WHERE SnapshotID = ?", (snapshot_id,))
-            cur_t.fast_executemany = True
-            cur_t.executemany(insert_sql, payload)
+            loaded = stream_to_staging(cur_1c, cur_t, TABLE_STAGING, snapshot_id,
+                                       transform=build, columns=insert_cols)
+            if not loaded:
+                return 0
 
             cur_t.execute(
                 """
@@ -136,9 +123,16 @@ class ShipmentsFullSync(BaseMigration):
                 "EXEC Import_1C.sp_SwitchSnapshot_Shipments @SnapshotID=?, @Full=1, @CleanupPrev=1",
                 (snapshot_id,)
             )
+            # Full re-flag of shipment rules after the full switch
+            cur_t.execute(
+                """
+                IF OBJECT_ID(N'Orders.sp_Refresh_ShipmentRule_Flags', N'P') IS NOT NULL
+                    EXEC Orders.sp_Refresh_ShipmentRule_Flags;
+                """
+            )
             conn_t.commit()
 
-            return len(rows)
+            return loaded
         finally:
             for obj in (cur_1c, cur_t, conn_1c, conn_t):
                 try:
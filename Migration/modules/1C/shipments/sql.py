@@ -126,3 +126,27 @@ LEFT JOIN _Reference677X1 AS Recipient_Table1
 WHERE s.SpendingOrder_Date >= @StartDay
   AND s.SpendingOrder_Date <  DATEADD(DAY, 1, @FinishDay);
 """
+
+# Incremental variant: only spending orders of the window whose own document,
+# TSD or realization changed since the rowversion mark.
+_WINDOW_FILTER = "      AND SpendingOrder_Table._Fld39754RRef = 0x90B4D31C4315BD014E644108EEB19BE0\n"
+assert _WINDOW_FILTER in QUERY_SHIPMENTS_TEMPLATE
+QUERY_SHIPMENTS_CHANGES_TEMPLATE = QUERY_SHIPMENTS_TEMPLATE.replace(
+    _WINDOW_FILTER,
+    _WINDOW_FILTER
+    + "      AND SpendingOrder_Table._Date_Time >= @StartDay\n"
+    + "      AND SpendingOrder_Table._Date_Time <  DATEADD(DAY, 1, @FinishDay)\n"
+    + "      AND (SpendingOrder_Table._Version >= {since_version}\n"
+    + "           OR TSD_Table._Version >= {since_version}\n"
+    + "           OR Realization_Tabel._Version >= {since_version})\n",
+)
+
+# Spending orders of the window written since the mark — including unposted /
+# marked ones, which must disappear from the target.
+QUERY_SHIPMENTS_CHANGED_KEYS_TEMPLATE = r"""
+SELECT _IDRRef AS SpendingOrder_ID
+FROM _Document1772X1
+WHERE _Version >= {since_version}
+  AND _Date_Time >= '{start_day}'
+  AND _Date_Time <  DATEADD(DAY, 1, '{finish_day}');
+"""
@@ -1,4 +1,5 @@
 """Copies WorkCenter_1C from 1C into the target DB (full table replace, scheduled)."""
+import itertools
 import sys
 import os
 
@@ -8,6 +9,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from core.base import BaseMigration
 from core.db import get_1c_connection, get_target_connection
+from core.stream import fetch_batches
 from sql import QUERY_WORKCENTER_1C
 
 SCHEMA     = 'Import_1C'
@@ -41,9 +43,10 @@ class WorkCenterCopy(BaseMigration):
 
             cur_src = conn_src.cursor()
             cur_src.execute(QUERY_WORKCENTER_1C)
-            rows = cur_src.fetchall()
+            batches = fetch_batches(cur_src)
+            first = next(batches, None)
 
-            if not rows:
+            if not first:
                 return 0
 
             cols_sql  = ", ".join(f"[{n}] {t}" for n, t in COLUMNS)
@@ -57,15 +60,17 @@ class WorkCenterCopy(BaseMigration):
             src_cols = [d[0] for d in cur_src.description]
             idx_map  = [src_cols.index(c[0]) for c in COLUMNS]
 
-            data = [tuple(row[i] for i in idx_map) for row in rows]
-
             placeholders = ", ".join("?" for _ in COLUMNS)
             sql_insert   = f"INSERT INTO {FULL_TABLE} VALUES ({placeholders})"
             cur_target.fast_executemany = True
-            cur_target.executemany(sql_insert, data)
+
+            loaded = 0
+            for batch in itertools.chain([first], batches):
+                cur_target.executemany(sql_insert, [tuple(row[i] for i in idx_map) for row in batch])
+                loaded += len(batch)
             conn_target.commit()
 
-            return len(data)
+            return loaded
         finally:
             for obj in [cur_src, cur_target, conn_src, conn_target]:
                 try:
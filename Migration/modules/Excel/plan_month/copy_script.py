@@ -1,7 +1,6 @@
-"""Month Plan Excel Sync — watches PlanDATA.xlsx for changes and uploads to Plan schema (every 60 s)."""
+"""Month Plan Excel Sync — watches PlanDATA.xlsx and applies per-sheet row diffs to the Plan schema (every 60 s)."""
 import sys
 import os
-import math
 
 _MIG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 sys.path.insert(0, _MIG_ROOT)
@@ -10,6 +9,8 @@ import pandas as pd
 
 from core.base import BaseMigration
 from core.db import get_target_connection
+from core.diff import RowDiffer
+from core.excel import WorkbookSnapshot, file_stat, frame_rows, load_table_diff
 
 EXCEL_PATH = r'\\192.168.110.14\departments\Planning\Work\Aikerim\PlanDATA.xlsx'
 
@@ -31,23 +32,17 @@ DB_COLUMNS = ['PlanDate', 'Line', 'FactoryNumber', 'Name', 'PINumber',
               'MonthPlanPcs', 'LaborIntensity', 'TimeFundMP', 'StaffMP',
               'LargeGroup', 'OrderRegion']
 
-_last_mtime: float = 0.0
+PLAN_KEY = ('PlanDate', 'Line', 'FactoryNumber')
 
-
-def _coerce(v):
-    """Convert pandas NaN / float NaN to None for pyodbc."""
-    if v is None:
-        return None
-    try:
-        if math.isnan(v):
-            return None
-    except TypeError:
-        pass
-    return v
+# sheet → (usecols, target table)
+SHEETS = {
+    'Heaters': (range(11),     "Plan.Month_Plan_Heaters"),
+    'WH':      (range(1, 12),  "Plan.Month_Plan_WH"),
+}
 
 
-def _read_sheet(sheet_name: str, usecols) -> pd.DataFrame:
-    df = pd.read_excel(EXCEL_PATH, sheet_name=sheet_name, usecols=usecols)
+def _read_sheet(book: WorkbookSnapshot, sheet_name: str, usecols) -> pd.DataFrame:
+    df = book.read_sheet(sheet_name, usecols=usecols)
 
     missing = set(COLUMN_MAPPING.keys()) - set(df.columns)
     if missing:
@@ -65,44 +60,47 @@ def _read_sheet(sheet_name: str, usecols) -> pd.DataFrame:
     return df[DB_COLUMNS].reset_index(drop=True)
 
 
-def _upload(cur, table: str, df: pd.DataFrame) -> None:
-    placeholders = ', '.join(['?'] * len(DB_COLUMNS))
-    cols_str     = ', '.join(DB_COLUMNS)
-    insert_sql   = f"INSERT INTO {table} ({cols_str}) VALUES ({placeholders})"
-
-    cur.execute(f"TRUNCATE TABLE {table}")
-
-    rows = [tuple(_coerce(v) for v in row) for row in df.itertuples(index=False, name=None)]
-    cur.fast_executemany = True
-    cur.executemany(insert_sql, rows)
-
-
 class PlanMonthCopy(BaseMigration):
     script_id        = "excel_plan_month"
     script_name      = "Month Plan Excel Sync"
     interval_seconds = 60
     category         = "continuous"
 
-    def run_once(self) -> int:
-        global _last_mtime
+    def __init__(self):
+        super().__init__()
+        self._stat: tuple | None = None
+        self._sheet_hashes: dict[str, bytes] = {}
+        self._differs = {sheet: RowDiffer(PLAN_KEY) for sheet in SHEETS}
 
-        try:
-            mtime = os.path.getmtime(EXCEL_PATH)
-        except OSError as e:
-            raise FileNotFoundError(f"Excel file not accessible: {EXCEL_PATH}") from e
+    def run_once(self) -> int:
+        stat = file_stat(EXCEL_PATH)
+        if stat == self._stat:
+            return 0
 
-        if mtime <= _last_mtime:
+        book    = WorkbookSnapshot.read(EXCEL_PATH)
+        missing = SHEETS.keys() - book.sheet_hashes.keys()
+        if missing:
+            raise ValueError(f"Missing sheets in Excel: {missing}")
+        changed = book.changed_sheets(self._sheet_hashes) & SHEETS.keys()
+        if not changed:
+            # File touched (saved, copied) without any change to our sheets
+            self._stat = stat
             return 0
 
-        df_heaters = _read_sheet('Heaters', range(11))
-        df_wh      = _read_sheet('WH',      range(1, 12))
+        frames = {
+            sheet: _read_sheet(book, sheet, SHEETS[sheet][0])
+            for sheet in changed
+        }
 
+        diffs = {}
         conn = get_target_connection()
         try:
             cur = conn.cursor()
             cur.execute("SET XACT_ABORT ON;")
-            _upload(cur, "Plan.Month_Plan_Heaters", df_heaters)
-            _upload(cur, "Plan.Month_Plan_WH",      df_wh)
+            for sheet, df in frames.items():
+                table = SHEETS[sheet][1]
+                diffs[sheet] = load_table_diff(cur, table, DB_COLUMNS, frame_rows(df), self._differs[sheet])
+                self.get_logger().info(f"[DIFF] {sheet}: {diffs[sheet].summary()}")
             conn.commit()
         finally:
             try:
@@ -114,8 +112,11 @@ class PlanMonthCopy(BaseMigration):
             except Exception:
                 pass
 
-        _last_mtime = mtime
-        return len(df_heaters) + len(df_wh)
+        for sheet, diff in diffs.items():
+            self._differs[sheet].accept(diff)
+            self._sheet_hashes[sheet] = book.sheet_hashes[sheet]
+        self._stat = stat
+        return sum(len(d.changed_rows) for d in diffs.values())
 
 
 if __name__ == "__main__":
@@ -1,7 +1,6 @@
-"""Product Time Excel Sync — watches handbook xlsx for changes and uploads to Ref schema (every 60 s)."""
+"""Product Time Excel Sync — watches handbook xlsx and applies per-sheet row diffs to the Ref schema (every 60 s)."""
 import sys
 import os
-import math
 
 _MIG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 sys.path.insert(0, _MIG_ROOT)
@@ -10,25 +9,12 @@ import pandas as pd
 
 from core.base import BaseMigration
 from core.db import get_target_connection
+from core.diff import RowDiffer
+from core.excel import WorkbookSnapshot, file_stat, frame_rows, load_table_diff
 
 EXCEL_PATH = r'\\192.168.110.14\departments\Planning\Work\Aikerim\成品型式手册Справочник Моделей.xlsx'
 
-_last_mtime: float = 0.0
-
-
-def _coerce(v):
-    """Convert pandas NaN / float NaN to None for pyodbc."""
-    if v is None:
-        return None
-    try:
-        if math.isnan(v):
-            return None
-    except TypeError:
-        pass
-    return v
-
-
-def _read_product_guide() -> pd.DataFrame:
+def _read_product_guide(book: WorkbookSnapshot) -> pd.DataFrame:
     col_map = {
         'Workshop':             'Workshop',
         'Factory number':       'FactoryNumber',
@@ -43,8 +29,7 @@ def _read_product_guide() -> pd.DataFrame:
         'Firmware':             'Firmware',
         'Displacement':         'Displacement',
     }
-    df = pd.read_excel(EXCEL_PATH, sheet_name='Sheet1', usecols=range(12), dtype=str,
-                       keep_default_na=False)
+    df = book.read_sheet('Sheet1', usecols=range(12), dtype=str, keep_default_na=False)
 
     missing = set(col_map.keys()) - set(df.columns)
     if missing:
@@ -57,34 +42,28 @@ def _read_product_guide() -> pd.DataFrame:
     return df.reset_index(drop=True)
 
 
-def _read_timeloss_guide() -> pd.DataFrame:
-    df = pd.read_excel(EXCEL_PATH, sheet_name='WorkShop Name',
-                       usecols='A:D', header=0, dtype=str, keep_default_na=False)
+def _read_timeloss_guide(book: WorkbookSnapshot) -> pd.DataFrame:
+    df = book.read_sheet('WorkShop Name', usecols='A:D', header=0, dtype=str, keep_default_na=False)
     df.columns = ['WorkShop_TimeLoss', 'Line_Name_TimeLoss',
                   'WorkShop_PowerQuery', 'Line_Name_PowerQuery']
     df = df[df['WorkShop_TimeLoss'].str.strip() != ''].reset_index(drop=True)
     return df.replace({'': None})
 
 
-def _read_1c_guide() -> pd.DataFrame:
-    df = pd.read_excel(EXCEL_PATH, sheet_name='WorkShop Name',
-                       usecols='F:I', header=0, dtype=str, keep_default_na=False)
+def _read_1c_guide(book: WorkbookSnapshot) -> pd.DataFrame:
+    df = book.read_sheet('WorkShop Name', usecols='F:I', header=0, dtype=str, keep_default_na=False)
     df.columns = ['WorkShop_1C', 'Line_Name_1C',
                   'WorkShop_PowerQuery', 'Line_Name_PowerQuery']
     df = df[df['WorkShop_1C'].str.strip() != ''].reset_index(drop=True)
     return df.replace({'': None})
 
 
-def _upload(cur, table: str, df: pd.DataFrame) -> None:
-    cols          = list(df.columns)
-    placeholders  = ', '.join(['?'] * len(cols))
-    insert_sql    = f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({placeholders})"
-
-    cur.execute(f"TRUNCATE TABLE {table}")
-
-    rows = [tuple(_coerce(v) for v in row) for row in df.itertuples(index=False, name=None)]
-    cur.fast_executemany = True
-    cur.executemany(insert_sql, rows)
+# target table → (sheet, reader, business key)
+TABLES = {
+    "Ref.Product_Guide":           ('Sheet1',        _read_product_guide,  ('FactoryNumber',)),
+    "Ref.WorkShop_TimeLoss_Guide": ('WorkShop Name', _read_timeloss_guide, ('WorkShop_TimeLoss', 'Line_Name_TimeLoss')),
+    "Ref.WorkShop_1C_Guide":       ('WorkShop Name', _read_1c_guide,       ('WorkShop_1C', 'Line_Name_1C')),
+}
 
 
 class ProductTimeCopy(BaseMigration):
@@ -93,29 +72,54 @@ class ProductTimeCopy(BaseMigration):
     interval_seconds = 60
     category         = "continuous"
 
-    def run_once(self) -> int:
-        global _last_mtime
+    def __init__(self):
+        super().__init__()
+        self._stat: tuple | None = None
+        self._sheet_hashes: dict[str, bytes] = {}
+        self._differs = {table: RowDiffer(key) for table, (_, _, key) in TABLES.items()}
 
-        try:
-            mtime = os.path.getmtime(EXCEL_PATH)
-        except OSError as e:
-            raise FileNotFoundError(f"Excel file not accessible: {EXCEL_PATH}") from e
+    def run_once(self) -> int:
+        stat = file_stat(EXCEL_PATH)
+        if stat == self._stat:
+            return 0
 
-        if mtime <= _last_mtime:
+        book    = WorkbookSnapshot.read(EXCEL_PATH)
+        sheets  = {sheet for sheet, _, _ in TABLES.values()}
+        missing = sheets - book.sheet_hashes.keys()
+        if missing:
+            raise ValueError(f"Missing sheets in Excel: {missing}")
+        changed = book.changed_sheets(self._sheet_hashes) & sheets
+        if not changed:
+            # File touched (saved, copied) without any change to our sheets
+            self._stat = stat
             return 0
 
-        df_product  = _read_product_guide()
-        df_timeloss = _read_timeloss_guide()
-        df_1c       = _read_1c_guide()
+        frames = {
+            table: reader(book)
+            for table, (sheet, reader, _) in TABLES.items()
+            if sheet in changed
+        }
 
+        diffs = {}
         conn = get_target_connection()
         try:
             cur = conn.cursor()
             cur.execute("SET XACT_ABORT ON;")
-            _upload(cur, "Ref.Product_Guide",           df_product)
-            _upload(cur, "Ref.WorkShop_TimeLoss_Guide", df_timeloss)
-            _upload(cur, "Ref.WorkShop_1C_Guide",       df_1c)
+            for table, df in frames.items():
+                diffs[table] = load_table_diff(cur, table, list(df.columns), frame_rows(df), self._differs[table])
+                self.get_logger().info(f"[DIFF] {table}: {diffs[table].summary()}")
             conn.commit()
+
+            guide = diffs.get("Ref.Product_Guide")
+            if guide is not None and not guide.is_empty:
+                # Shipment-rule flags on LargeGroup / GroupName (no-op unless the rules use them)
+                cur.execute(
+                    """
+                    IF OBJECT_ID(N'Orders.sp_Refresh_ShipmentRule_Flags', N'P') IS NOT NULL
+                        EXEC Orders.sp_Refresh_ShipmentRule_Flags @IfStale = 1;
+                    """
+                )
+                conn.commit()
         finally:
             try:
                 cur.close()
@@ -126,8 +130,12 @@ class ProductTimeCopy(BaseMigration):
             except Exception:
                 pass
 
-        _last_mtime = mtime
-        return len(df_product) + len(df_timeloss) + len(df_1c)
+        for table, diff in diffs.items():
+            self._differs[table].accept(diff)
+        for sheet in changed:
+            self._sheet_hashes[sheet] = book.sheet_hashes[sheet]
+        self._stat = stat
+        return sum(len(d.changed_rows) for d in diffs.values())
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ import os
 import datetime
 import json
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 _MIG_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
 sys.path.insert(0, _MIG_ROOT)
@@ -12,12 +13,11 @@ sys.path.insert(0, os.path.dirname(__file__))
 import requests
 from urllib3.util.retry import Retry
 from requests.adapters import HTTPAdapter
-import sqlalchemy
-from sqlalchemy import create_engine, types
-import pandas as pd
 
+from core import metrics
 from core.base import BaseMigration
-from core.config import MES_ACCESS_KEY_ID, MES_ACCESS_KEY_SECRET, TARGET_SQLALCHEMY_URL
+from core.config import MES_ACCESS_KEY_ID, MES_ACCESS_KEY_SECRET
+from core.db import get_target_connection
 
 SIM_CARDS = [
     "898604B7192270274525",
@@ -37,7 +37,16 @@ SIM_CARDS = [
     "898604B7192270274567",
 ]
 
-_API_URL = "https://a.lightmes.cn/lightmesapi/open/trilightSummary/getTimecountMessagesByTimeSim"
+_API_URL = os.getenv(
+    "MES_API_URL",
+    "https://a.lightmes.cn/lightmesapi/open/trilightSummary/getTimecountMessagesByTimeSim",
+)
+
+FETCH_WORKERS   = 8    # concurrent API requests (one pooled connection each)
+REQUEST_TIMEOUT = 10
+
+TABLE_TARGET = "MES.All_SIM_Results_TEMP"
+COLUMNS      = ['success', 'code', 'message', 'sim', 'sim_card', 'duration', 'endtime', 'sno']
 
 _SIM_STATS_SCRIPT = os.path.join(
     os.path.dirname(__file__), '..', '..', '..', '..',
@@ -45,154 +54,127 @@ _SIM_STATS_SCRIPT = os.path.join(
 )
 
 
-def _send_api_request(logger) -> int:
-    headers = {
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[201, 401, 403, 404])
+    adapter = HTTPAdapter(max_retries=retries, pool_connections=1, pool_maxsize=FETCH_WORKERS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({
         'Content-Type': 'application/json',
         'AccessKeyId': MES_ACCESS_KEY_ID,
         'AccessKeySecret': MES_ACCESS_KEY_SECRET,
-    }
+    })
+    return session
 
-    engine = create_engine(
-        TARGET_SQLALCHEMY_URL,
-        connect_args={'autocommit': False},
-    )
 
-    session = requests.Session()
-    retries = Retry(total=3, backoff_factor=0.3, status_forcelist=[201, 401, 403, 404])
-    session.mount('https://', HTTPAdapter(max_retries=retries))
+def _fetch_sim(session: requests.Session, sim: str, start_str: str, end_str: str):
+    payload = {
+        "sim": sim,
+        "startTime": f"{start_str} 23:59:59",
+        "endTime":   f"{end_str} 00:00:00",
+    }
+    response = session.post(url=_API_URL, data=json.dumps(payload), timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
 
+def _parse_endtime(value):
+    """Unix seconds (string or number) → naive UTC datetime; formatted strings parsed as is."""
+    if value is None or value == '':
+        return None
     try:
-        current_date = datetime.datetime.now()
-        start_date   = current_date - datetime.timedelta(days=3)
-        current_date_str = current_date.strftime("%Y-%m-%d")
-        start_date_str   = start_date.strftime("%Y-%m-%d")
-        logger.info(f"Query time range: {start_date_str} to {current_date_str}")
-
-        batch_records = []
-
-        for sim in SIM_CARDS:
-            logger.info(f"Processing SIM card: {sim}")
-            payload = {
-                "sim": sim,
-                "startTime": f"{start_date_str} 23:59:59",
-                "endTime":   f"{current_date_str} 00:00:00",
-            }
-
-            try:
-                response = session.post(url=_API_URL, headers=headers, data=json.dumps(payload), timeout=10)
-                response.raise_for_status()
-                result = response.json()
-
-                def _process_data(data):
-                    if isinstance(data, dict):
-                        if 'count' in data:
-                            del data['count']
-                        if 'countMessages' in data:
-                            for msg in data['countMessages']:
-                                if 'endtime' in msg and isinstance(msg['endtime'], str):
-                                    try:
-                                        ts = int(msg['endtime'])
-                                        dt = datetime.datetime.fromtimestamp(ts, datetime.timezone.utc)
-                                        msg['endtime'] = dt.strftime("%Y-%m-%d %H:%M:%S")
-                                    except (ValueError, TypeError):
-                                        pass
-                        for key, value in list(data.items()):
-                            _process_data(value)
-                    elif isinstance(data, list):
-                        for item in data:
-                            _process_data(item)
-
-                _process_data(result)
-
-                def _process_json_data(json_data):
-                    records = []
-                    if not isinstance(json_data, list):
-                        json_data = [json_data]
-                    for item in json_data:
-                        success      = item.get('success')
-                        code         = item.get('code')
-                        message      = item.get('message')
-                        sim_card     = item.get('sim_card', sim)
-                        sim_value    = item.get('data', {}).get('sim')
-                        count_msgs   = item.get('data', {}).get('countMessages', [])
-                        for msg in count_msgs:
-                            endtime_str = msg.get('endtime')
-                            formatted_endtime = None
-                            if endtime_str:
-                                try:
-                                    formatted_endtime = datetime.datetime.strptime(endtime_str, '%Y-%m-%d %H:%M:%S')
-                                except ValueError:
-                                    try:
-                                        formatted_endtime = datetime.datetime.strptime(endtime_str, '%Y-%m-%d %H:%M:%S.%f')
-                                    except ValueError:
-                                        formatted_endtime = endtime_str
-                            records.append({
-                                'success':  success,
-                                'code':     code,
-                                'message':  message,
-                                'sim':      sim_value,
-                                'sim_card': sim_card,
-                                'duration': msg.get('duration'),
-                                'endtime':  formatted_endtime,
-                                'sno':      msg.get('sno'),
-                            })
-                    return records
-
-                batch_records.extend(_process_json_data(result))
-                logger.info(f"SIM card {sim} data successfully retrieved and processed")
-
-            except requests.exceptions.RequestException as e:
-                logger.error(f"SIM card {sim} request failed: {str(e)}")
-                continue
-            except json.JSONDecodeError:
-                logger.error(f"SIM card {sim} response parsing failed: Invalid JSON format")
-                continue
-
-        with engine.connect() as conn:
-            try:
-                conn.execute(sqlalchemy.text("TRUNCATE TABLE MES.All_SIM_Results_TEMP"))
-                conn.commit()
-                logger.info("MES.All_SIM_Results_TEMP cleared")
-            except Exception as e:
-                logger.error(f"Error clearing table: {e}")
-                conn.rollback()
-
-        if batch_records:
-            df = pd.DataFrame(batch_records)
-            expected_columns = ['success', 'code', 'message', 'sim', 'sim_card', 'duration', 'endtime', 'sno']
-            df = df[expected_columns]
-            for col in ['success', 'code', 'message', 'sim', 'sim_card', 'duration', 'sno']:
-                df[col] = df[col].astype(str)
-            if 'endtime' in df.columns:
-                df['endtime'] = pd.to_datetime(df['endtime'], utc=True).dt.tz_localize(None)
-
-            df.to_sql(
-                'All_SIM_Results_TEMP',
-                engine,
-                schema='MES',
-                if_exists='append',
-                index=False,
-                dtype={
-                    'success':  types.NVARCHAR(255),
-                    'code':     types.INT,
-                    'message':  types.NVARCHAR(255),
-                    'sim':      types.NVARCHAR(255),
-                    'sim_card': types.NVARCHAR(255),
-                    'duration': types.INT,
-                    'endtime':  types.DateTime,
-                    'sno':      types.INT,
-                }
+        ts = int(value)
+    except (ValueError, TypeError):
+        pass
+    else:
+        return datetime.datetime.fromtimestamp(ts, datetime.timezone.utc).replace(tzinfo=None)
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M:%S.%f'):
+        try:
+            return datetime.datetime.strptime(str(value), fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _iter_rows(result, sim: str):
+    """Flatten one API response into rows in COLUMNS order."""
+    items = result if isinstance(result, list) else [result]
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        data     = item.get('data') or {}
+        success  = item.get('success')
+        code     = _to_int(item.get('code'))
+        message  = item.get('message')
+        sim_card = item.get('sim_card', sim)
+        for msg in data.get('countMessages') or ():
+            yield (
+                None if success is None else str(success),
+                code,
+                message,
+                data.get('sim'),
+                sim_card,
+                _to_int(msg.get('duration')),
+                _parse_endtime(msg.get('endtime')),
+                _to_int(msg.get('sno')),
             )
-            records_count = len(batch_records)
-            logger.info(f"Successfully wrote {records_count} records to database!")
-        else:
-            records_count = 0
-            logger.info("No valid data retrieved, skipping insert")
 
-        return records_count
 
+def _fetch_all(logger) -> list[tuple]:
+    """Query every SIM card concurrently; a failed card is logged and skipped."""
+    current_date = datetime.datetime.now()
+    start_date   = current_date - datetime.timedelta(days=3)
+    end_str   = current_date.strftime("%Y-%m-%d")
+    start_str = start_date.strftime("%Y-%m-%d")
+    logger.info(f"Query time range: {start_str} to {end_str} ({len(SIM_CARDS)} SIM cards)")
+
+    rows: list[tuple] = []
+    session = _make_session()
+    try:
+        with ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="mes-fetch") as pool:
+            futures = {sim: pool.submit(_fetch_sim, session, sim, start_str, end_str) for sim in SIM_CARDS}
+            for sim, future in futures.items():
+                try:
+                    sim_rows = list(_iter_rows(future.result(), sim))
+                except requests.exceptions.RequestException as e:
+                    logger.error(f"SIM card {sim} request failed: {e}")
+                    continue
+                except ValueError:
+                    logger.error(f"SIM card {sim} response parsing failed: Invalid JSON format")
+                    continue
+                rows.extend(sim_rows)
+                logger.info(f"SIM card {sim}: {len(sim_rows)} records")
     finally:
         session.close()
+    return rows
+
+
+def _load(rows: list[tuple]) -> None:
+    """Replace the table contents in one transaction (readers never see it empty)."""
+    conn = get_target_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SET XACT_ABORT ON;")
+        cur.execute(f"DELETE FROM {TABLE_TARGET}")
+        if rows:
+            cur.fast_executemany = True
+            cur.executemany(
+                f"INSERT INTO {TABLE_TARGET} ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows,
+            )
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
 
 
 def _run_sim_statistics(logger) -> bool:
@@ -230,7 +212,14 @@ class OeeMouldCopy(BaseMigration):
 
     def run_once(self) -> int:
         logger = self.get_logger()
-        records_count = _send_api_request(logger)
+        with metrics.phase("source_query"):
+            rows = _fetch_all(logger)
+        metrics.current().add_rows(rows)
+
+        with metrics.phase("staging_insert"):
+            _load(rows)
+        records_count = len(rows)
+        logger.info(f"Successfully wrote {records_count} records to {TABLE_TARGET}")
 
         if records_count > 0:
             _run_sim_statistics(logger)
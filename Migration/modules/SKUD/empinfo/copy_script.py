@@ -1,4 +1,4 @@
-"""Syncs employee info from SKUD into Import_SKUD.empinfo via MERGE (every 2 minutes)."""
+"""Syncs employee info from SKUD into Import_SKUD.empinfo via one bulk MERGE (every 2 minutes)."""
 import sys
 import os
 
@@ -7,7 +7,8 @@ sys.path.insert(0, _MIG_ROOT)
 sys.path.insert(0, os.path.dirname(__file__))
 
 from core.base import BaseMigration
-from core.db import get_skud_connection, get_target_connection
+from core.db import fetch_rows, get_skud_connection, get_target_connection
+from core.upsert import bulk_merge
 from sql import QUERY_empinfo
 
 SCHEMA     = 'Import_SKUD'
@@ -62,6 +63,10 @@ class EmpinfoCopy(BaseMigration):
     interval_seconds = 120
     category         = "continuous"
 
+    def __init__(self):
+        super().__init__()
+        self._schema_ready = False   # DDL checks once per process, not every cycle
+
     def run_once(self) -> int:
         conn_src = conn_target = cur_src = cur_target = None
         try:
@@ -70,42 +75,30 @@ class EmpinfoCopy(BaseMigration):
             cur_src     = conn_src.cursor()
             cur_target  = conn_target.cursor()
 
-            _ensure_schema_exists(cur_target)
-            _ensure_table_exists(cur_target)
-            conn_target.commit()
+            if not self._schema_ready:
+                _ensure_schema_exists(cur_target)
+                _ensure_table_exists(cur_target)
+                conn_target.commit()
+                self._schema_ready = True
 
-            cur_src.execute(QUERY_empinfo)
-            rows = cur_src.fetchall()
+            src_cols, rows = fetch_rows(cur_src, QUERY_empinfo)
 
             if not rows:
                 return 0
 
-            src_cols = [d[0] for d in cur_src.description]
-            idx_map  = [src_cols.index(c[0]) for c in COLUMNS]
-            data     = [tuple(row[i] for i in idx_map) for row in rows]
-
-            col_names  = [c[0] for c in COLUMNS]
-            col_list   = ", ".join(f"[{c}]" for c in col_names)
-            param_list = ", ".join("?" * len(COLUMNS))
-            update_set = ", ".join(f"target.[{c}] = source.[{c}]" for c in col_names if c != 'empcode')
-
-            merge_sql = f"""
-            MERGE {FULL_TABLE} AS target
-            USING (VALUES ({param_list})) AS source ({col_list})
-            ON target.empcode = source.empcode
-            WHEN MATCHED THEN
-                UPDATE SET {update_set}, LastUpdated = GETDATE()
-            WHEN NOT MATCHED THEN
-                INSERT ({col_list}, LastUpdated)
-                VALUES ({param_list}, GETDATE());
-            """
-
-            for row in data:
-                cur_target.execute(merge_sql, row + row)
+            idx_map   = [src_cols.index(c[0]) for c in COLUMNS]
+            data      = [tuple(row[i] for i in idx_map) for row in rows]
+            col_names = [c[0] for c in COLUMNS]
 
+            counts = bulk_merge(cur_target, FULL_TABLE, col_names, data,
+                                key_columns=("empcode",), touch_column="LastUpdated")
             conn_target.commit()
 
-            return len(data)
+            self.get_logger().info(
+                f"[MERGE] {len(data)} rows: {counts['inserted']} inserted, "
+                f"{counts['updated']} updated"
+            )
+            return counts["inserted"] + counts["updated"]
 
         finally:
             for obj in [cur_src, cur_target, conn_src, conn_target]:
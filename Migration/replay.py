@@ -0,0 +1,139 @@
+"""
+replay.py — record the source result sets of a real cycle, replay them offline.
+
+Modules can't be exercised without the live 1C / SKUD servers.  ``record``
+runs one cycle of a script against the real servers and saves everything it
+read from them to compressed fixtures (core/db.py, ``record_source``);
+``replay`` runs the cycle again with the sources served from those fixtures
+and the target DB from the usual DB_TARGET_* settings — point them at a local
+copy of WeChat_APP (init.sql + the Import_1C objects) first, replay writes to
+it like a real cycle.
+
+Each replayed run uses a fresh script instance (no diff baseline) and prints
+its per-phase timings (core/metrics.py phases); the summary gives the median
+of every phase and the rows per second, so transform / load changes can be
+compared on the same data.
+
+Usage:
+    python replay.py record 1c_fact_scan
+    python replay.py replay 1c_fact_scan --repeat 5
+    python replay.py replay 1c_fact_scan --incremental
+    python replay.py replay 1c_fact_scan --fixtures D:/fixtures/2026-10
+
+Fixtures: <fixtures>/<script_id>.<source>.pkl.gz, default FIXTURE_DIR.  They
+hold production data — keep them out of the repository.
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+MIGRATION_ROOT = Path(__file__).parent
+FIXTURE_DIR    = MIGRATION_ROOT / "fixtures"
+SOURCES        = ("1c", "skud")
+
+sys.path.insert(0, str(MIGRATION_ROOT))
+
+from core import metrics                                             # noqa: E402
+from core.db import record_source, replay_source, save_captures      # noqa: E402
+from core.supervisor import load_migration_class                     # noqa: E402
+
+
+def _fixture_path(fixtures: Path, script_id: str, source: str) -> Path:
+    return fixtures / f"{script_id}.{source}.pkl.gz"
+
+
+def _load_script(script_id: str):
+    from scripts_config import SCRIPTS
+
+    for cfg in SCRIPTS:
+        if cfg["id"] == script_id:
+            return load_migration_class(MIGRATION_ROOT / cfg["script"], f"replay_{script_id}")
+    raise SystemExit(f"Unknown script id '{script_id}' (see scripts_config.py)")
+
+
+def _run(cls, run_no: int, incremental: bool) -> tuple[metrics.CycleMetrics, int, float]:
+    """One cycle of a fresh instance; (metrics, records, seconds)."""
+    script = cls()
+    cycle_metrics = metrics.CycleMetrics(script.script_id, run_no, "replay")
+    metrics.set_current(cycle_metrics)
+    t0 = time.perf_counter()
+    try:
+        records = script.run_incremental() if incremental else script.run_once()
+    finally:
+        metrics.set_current(None)
+    return cycle_metrics, records if isinstance(records, int) else 0, time.perf_counter() - t0
+
+
+def _report(run_no: int, m: metrics.CycleMetrics, records: int, seconds: float) -> None:
+    phases = "  ".join(f"{p}={m.phases[p] * 1000:.0f}ms" for p in metrics.PHASES if p in m.phases)
+    print(f"run {run_no}: {seconds * 1000:.0f} ms, {records} records, "
+          f"{m.rows_fetched} rows fetched  {phases}")
+
+
+def record(script_id: str, fixtures: Path, incremental: bool) -> None:
+    cls = _load_script(script_id)
+    for source in SOURCES:
+        record_source(source, _fixture_path(fixtures, script_id, source))
+    try:
+        m, records, seconds = _run(cls, 1, incremental)
+    finally:
+        saved = save_captures()
+    _report(1, m, records, seconds)
+    for path in saved:
+        print(f"fixture: {path} ({path.stat().st_size / 1024:.0f} KiB)")
+    if not saved:
+        print("nothing was read from 1C / SKUD — no fixture written")
+
+
+def replay(script_id: str, fixtures: Path, repeat: int, incremental: bool) -> None:
+    cls = _load_script(script_id)
+    loaded = []
+    for source in SOURCES:
+        path = _fixture_path(fixtures, script_id, source)
+        if path.exists():
+            loaded.append(replay_source(source, path))
+    if not loaded:
+        raise SystemExit(f"No fixtures for '{script_id}' in {fixtures} — run 'record' first")
+
+    runs = []
+    try:
+        for run_no in range(1, repeat + 1):
+            for fixture in loaded:
+                fixture.rewind()
+            m, records, seconds = _run(cls, run_no, incremental)
+            _report(run_no, m, records, seconds)
+            runs.append((m, seconds))
+    finally:
+        save_captures()   # nothing to save; stops replaying
+
+    total = statistics.median(seconds for _, seconds in runs)
+    rows = runs[-1][0].rows_fetched
+    print(f"\nmedian of {len(runs)} runs: {total * 1000:.0f} ms, "
+          f"{rows / total if total else 0:.0f} rows/s")
+    for p in metrics.PHASES:
+        times = [m.phases[p] for m, _ in runs if p in m.phases]
+        if times:
+            print(f"  {p:<16} {statistics.median(times) * 1000:8.0f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Record / replay source result sets of a migration script")
+    parser.add_argument("action", choices=("record", "replay"))
+    parser.add_argument("script_id", help="id from scripts_config.py, e.g. 1c_fact_scan")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURE_DIR, help="fixture directory")
+    parser.add_argument("--repeat", type=int, default=3, help="replayed runs (replay only)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="run_incremental() instead of run_once()")
+    args = parser.parse_args()
+
+    if args.action == "record":
+        record(args.script_id, args.fixtures, args.incremental)
+    else:
+        replay(args.script_id, args.fixtures, max(1, args.repeat), args.incremental)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,16 +5,28 @@ Reads SCRIPTS from scripts_config.py where category == "continuous",
 launches each as a subprocess, and auto-restarts on failure with
 exponential back-off (30 s → 60 s → … up to 300 s).
 
-Every COMMAND_POLL_INTERVAL seconds the main loop checks
-Migration.ScriptStatus for pending commands:
+Admin commands arrive over the local control channel (core/control.py,
+port RUNNER_PORT) and are handled by the main loop as soon as they come:
   - restart_requested → kill + restart the process
   - stop_requested    → kill the process, set status = 'stopped'
   - run_now_requested → ignored by runner (handled by scheduler)
+Migration.ScriptStatus is checked for the same flags only at startup and
+every FALLBACK_POLL_SECONDS (commands issued while the runner was down).
+
+Both modes also run the downstream-refresh coordinator (core/refresh.py):
+every REFRESH_TICK seconds it drains Migration.RefreshQueue and rebuilds each
+derived cache declared in scripts_config.DERIVED_REFRESHES once per burst.
+
+In-process mode (--inprocess) runs the same scripts as threads of this
+process instead (core/supervisor.py): one interpreter, shared connection
+pools per server (POOL_SIZES), at most INPROCESS_WORKERS cycles at a time.
 
 Usage:
     python runner.py
+    python runner.py --inprocess
 """
 
+import argparse
 import logging
 import os
 import subprocess
@@ -26,7 +38,12 @@ from pathlib import Path
 MIGRATION_ROOT = Path(__file__).parent
 BASE_BACKOFF        = 30
 MAX_BACKOFF         = 300
-COMMAND_POLL_INTERVAL = 10   # seconds between DB command checks
+REFRESH_TICK          = 5    # seconds between Migration.RefreshQueue drains
+METRICS_PURGE_INTERVAL = 3600   # seconds between Migration.CycleMetrics purges
+
+# --inprocess: worker threads and connections per server shared by all jobs
+INPROCESS_WORKERS = 6
+POOL_SIZES        = {"1c": 4, "target": 2 * INPROCESS_WORKERS, "skud": 2}
 
 logging.basicConfig(
     level=logging.INFO,
@@ -40,16 +57,30 @@ logger = logging.getLogger("runner")
 
 
 def _get_conn():
-    """Return a pyodbc connection to the target DB (for command polling)."""
+    """Return a pyodbc connection to the target DB (for command flags and status)."""
     sys.path.insert(0, str(MIGRATION_ROOT))
     from core.db import get_target_connection
     return get_target_connection()
 
 
+def _dispatch(managed: dict, script_id: str, command: str) -> None:
+    """Act on one admin command; `managed` is script_id → ManagedProcess (or InProcessJob)."""
+    mp = managed.get(script_id)
+    if mp is None:
+        return
+
+    if command == "restart_requested":
+        logger.info(f"[{script_id}] Restart requested via admin panel")
+        mp.restart()
+    elif command == "stop_requested":
+        logger.info(f"[{script_id}] Stop requested via admin panel")
+        mp.stop_permanently()
+
+
 def _poll_commands(managed: dict) -> None:
     """
-    Check Migration.ScriptStatus for command flags and act on them.
-    `managed` is a dict of script_id → ManagedProcess.
+    Fallback: act on command flags left in Migration.ScriptStatus
+    (written while the runner or its control channel was unavailable).
     """
     try:
         conn = _get_conn()
@@ -70,17 +101,7 @@ def _poll_commands(managed: dict) -> None:
         conn.close()
 
         for row in rows:
-            script_id, command = row[0], row[1]
-            mp = managed.get(script_id)
-            if mp is None:
-                continue
-
-            if command == "restart_requested":
-                logger.info(f"[{script_id}] Restart requested via admin panel")
-                mp.restart()
-            elif command == "stop_requested":
-                logger.info(f"[{script_id}] Stop requested via admin panel")
-                mp.stop_permanently()
+            _dispatch(managed, row[0], row[1])
 
     except Exception as e:
         logger.warning(f"Command poll failed: {e}")
@@ -119,7 +140,7 @@ class ManagedProcess:
                 self.process.kill()
 
     def restart(self) -> None:
-        """Kill + relaunch; reset backoff. Called by command poller."""
+        """Kill + relaunch; reset backoff. Called on an admin command."""
         self._kill()
         self.backoff = BASE_BACKOFF
         self._permanently_stopped = False
@@ -174,7 +195,82 @@ class ManagedProcess:
             time.sleep(5)
 
 
+def _refresh_loop(stop: threading.Event) -> None:
+    """Drain the downstream-refresh queue (and purge old metrics) until ``stop`` is set."""
+    sys.path.insert(0, str(MIGRATION_ROOT))
+    from core import metrics
+    from core.refresh import RefreshCoordinator
+
+    coordinator = RefreshCoordinator()
+    last_purge = 0.0
+    while not stop.wait(REFRESH_TICK):
+        try:
+            coordinator.drain()
+        except Exception as e:
+            logger.warning(f"Refresh queue drain failed: {e}")
+        if time.monotonic() - last_purge >= METRICS_PURGE_INTERVAL:
+            last_purge = time.monotonic()
+            try:
+                metrics.purge()
+            except Exception as e:
+                logger.warning(f"Metrics purge failed: {e}")
+
+
+def _command_loop(managed: dict, tick=None) -> None:
+    """
+    Main loop: wait for control-channel commands (waking every second for
+    ``tick``) and fall back to the DB flags every FALLBACK_POLL_SECONDS.
+    """
+    sys.path.insert(0, str(MIGRATION_ROOT))
+    from core.control import FALLBACK_POLL_SECONDS, RUNNER_PORT, ControlServer
+
+    control = ControlServer(RUNNER_PORT, managed.keys(), logger=logger)
+    control.start()
+    _poll_commands(managed)
+    last_poll = time.monotonic()
+    try:
+        while True:
+            if tick is not None:
+                tick()
+            command = control.get(timeout=1)
+            if command is not None:
+                _dispatch(managed, *command)
+            now = time.monotonic()
+            if now - last_poll >= FALLBACK_POLL_SECONDS:
+                _poll_commands(managed)
+                last_poll = now
+    finally:
+        control.close()
+
+
+def run_inprocess(continuous: list[dict]) -> None:
+    """Supervise all continuous scripts as in-process jobs (see core/supervisor.py)."""
+    sys.path.insert(0, str(MIGRATION_ROOT))
+    from core.db import close_pools, enable_pooling
+    from core.supervisor import Supervisor
+
+    enable_pooling(POOL_SIZES)
+    supervisor = Supervisor(continuous, MIGRATION_ROOT, workers=INPROCESS_WORKERS)
+    logger.info(
+        f"Runner started in-process — supervising {len(supervisor.jobs)} jobs "
+        f"on {INPROCESS_WORKERS} workers (PID={os.getpid()})"
+    )
+
+    try:
+        _command_loop(supervisor.jobs, tick=supervisor.tick)
+    except KeyboardInterrupt:
+        logger.info("Runner stopping… waiting for running cycles")
+        supervisor.shutdown()
+        close_pools()
+        logger.info("Runner stopped")
+
+
 def main() -> None:
+    parser = argparse.ArgumentParser(description="Supervisor for continuous migration scripts")
+    parser.add_argument("--inprocess", action="store_true",
+                        help="run all scripts as threads of this process")
+    args = parser.parse_args()
+
     (MIGRATION_ROOT / "logs").mkdir(exist_ok=True)
 
     from scripts_config import SCRIPTS
@@ -184,6 +280,18 @@ def main() -> None:
         logger.warning("No continuous scripts found in scripts_config.py")
         return
 
+    refresh_stop = threading.Event()
+    threading.Thread(
+        target=_refresh_loop, args=(refresh_stop,), daemon=True, name="refresh-coordinator"
+    ).start()
+
+    if args.inprocess:
+        try:
+            run_inprocess(continuous)
+        finally:
+            refresh_stop.set()
+        return
+
     managed: dict[str, ManagedProcess] = {}
     threads: list[threading.Thread] = []
 
@@ -198,16 +306,11 @@ def main() -> None:
 
     logger.info(f"Runner started — supervising {len(managed)} scripts")
 
-    last_poll = 0.0
     try:
-        while True:
-            now = time.monotonic()
-            if now - last_poll >= COMMAND_POLL_INTERVAL:
-                _poll_commands(managed)
-                last_poll = now
-            time.sleep(1)
+        _command_loop(managed)
     except KeyboardInterrupt:
         logger.info("Runner stopping…")
+        refresh_stop.set()
         for mp in managed.values():
             mp._kill()
         logger.info("Runner stopped")
@@ -4,9 +4,22 @@ scheduler.py — Cron-like scheduler for one-shot / periodic migration scripts.
 Reads SCRIPTS from scripts_config.py where category == "scheduled",
 uses the `schedule` library to fire each script at the configured time.
 
-Also polls Migration.ScriptStatus every COMMAND_POLL_INTERVAL seconds for:
+Admin commands arrive over the local control channel (core/control.py,
+port SCHEDULER_PORT) and are handled as soon as they come:
   - run_now_requested → trigger the script immediately
   - stop_requested    → mark the script as stopped (no process to kill for scheduler)
+Migration.ScriptStatus is checked for the same flags only at startup and
+every FALLBACK_POLL_SECONDS (commands issued while the scheduler was down).
+
+Runs go through one JobExecutor:
+  - one run per script at a time — a schedule trigger that fires while the
+    previous run is still going is skipped (``"on_overlap": "queue"`` in the
+    script config queues it instead); a run-now is queued as one follow-up run;
+  - at most MAX_HEAVY_JOBS heavy runs at once (every scheduled script unless
+    ``"heavy": False``) — the others wait for a slot;
+  - each run is written to Migration.CycleMetrics as ``job:<id>`` (mode =
+    trigger, status success/error/timeout/skipped, QueueWaitMs = time spent
+    waiting for a slot, DurationMs = wait + run).
 
 Supported schedule_type values:
   "daily"    — every day at HH:MM
@@ -29,7 +42,9 @@ from datetime import datetime
 import schedule
 
 MIGRATION_ROOT        = Path(__file__).parent
-COMMAND_POLL_INTERVAL = 15  # seconds between DB command checks
+SCHEDULE_TICK         = 5   # seconds between schedule.run_pending() calls
+MAX_HEAVY_JOBS        = 2   # heavy runs (1C full syncs) at the same time
+JOB_TIMEOUT           = 7200  # hard timeout of one run, seconds
 
 (MIGRATION_ROOT / "logs").mkdir(exist_ok=True)
 
@@ -65,8 +80,8 @@ def _update_status(script_id: str, status: str) -> None:
         logger.warning(f"[{script_id}] DB status update failed: {e}")
 
 
-def _run_script(script_id: str, script_path: Path) -> None:
-    """Fire a scheduled script as a subprocess and wait for completion."""
+def _run_script(script_id: str, script_path: Path) -> str:
+    """Run a scheduled script as a subprocess and wait; returns success / error / timeout."""
     logger.info(f"[{script_id}] Running…")
     env = {**os.environ, "PYTHONPATH": str(MIGRATION_ROOT)}
     try:
@@ -74,31 +89,116 @@ def _run_script(script_id: str, script_path: Path) -> None:
             [sys.executable, "-u", str(script_path)],
             cwd=str(MIGRATION_ROOT),
             env=env,
-            timeout=7200,  # 2-hour hard timeout
+            timeout=JOB_TIMEOUT,
         )
         if result.returncode == 0:
             logger.info(f"[{script_id}] Completed OK")
-        else:
-            logger.error(f"[{script_id}] Exited with code {result.returncode}")
+            return "success"
+        logger.error(f"[{script_id}] Exited with code {result.returncode}")
+        return "error"
     except subprocess.TimeoutExpired:
-        logger.error(f"[{script_id}] Timed out after 2 h")
+        logger.error(f"[{script_id}] Timed out after {JOB_TIMEOUT // 3600} h")
+        return "timeout"
     except Exception as e:
         logger.error(f"[{script_id}] Error: {e}")
-
-
-def _make_job(script_id: str, script_path: Path):
-    """Return a job function that runs the script in a background thread."""
+        return "error"
+
+
+class JobExecutor:
+    """Single-instance runs per script, a cap on heavy runs, queue-or-skip on overlap."""
+
+    def __init__(self, max_heavy: int = MAX_HEAVY_JOBS):
+        self._heavy_slots = threading.BoundedSemaphore(max_heavy)
+        self._lock = threading.Lock()
+        self._jobs: dict[str, dict] = {}     # script_id → {"path", "heavy", "queue_scheduled"}
+        self._active: set[str] = set()       # running or waiting for a slot
+        self._pending: dict[str, str] = {}   # script_id → trigger of the queued follow-up run
+
+    def register(self, cfg: dict) -> None:
+        self._jobs[cfg["id"]] = {
+            "path":            MIGRATION_ROOT / cfg["script"],
+            "heavy":           cfg.get("heavy", True),
+            "queue_scheduled": cfg.get("on_overlap", "skip") == "queue",
+        }
+
+    def submit(self, script_id: str, trigger: str = "schedule") -> bool:
+        """Start a run, or queue / skip it if the script is busy.  False if skipped."""
+        job = self._jobs[script_id]
+        with self._lock:
+            if script_id in self._active:
+                if trigger == "run_now" or job["queue_scheduled"]:
+                    if script_id not in self._pending:
+                        self._pending[script_id] = trigger
+                        logger.info(f"[{script_id}] Still running — {trigger} run queued")
+                    return True
+                logger.warning(f"[{script_id}] Still running — {trigger} trigger skipped")
+                skipped = True
+            else:
+                self._active.add(script_id)
+                skipped = False
+        if skipped:
+            self._record(script_id, trigger, "skipped")
+            return False
+        threading.Thread(
+            target=self._work, args=(script_id, trigger), daemon=True, name=f"job-{script_id}"
+        ).start()
+        return True
+
+    def _work(self, script_id: str, trigger: str) -> None:
+        while True:
+            try:
+                self._run(script_id, trigger)
+            finally:
+                with self._lock:
+                    trigger = self._pending.pop(script_id, None)
+                    if trigger is None:
+                        self._active.discard(script_id)
+            if trigger is None:
+                return
+
+    def _run(self, script_id: str, trigger: str) -> None:
+        from core import metrics
+
+        job = self._jobs[script_id]
+        run_metrics = metrics.CycleMetrics(f"job:{script_id}", mode=trigger)
+        t0 = time.monotonic()
+        if job["heavy"]:
+            with run_metrics.phase("queue_wait"):
+                self._heavy_slots.acquire()
+        waited = time.monotonic() - t0
+        if waited >= 1:
+            logger.info(f"[{script_id}] Waited {waited:.0f}s for a heavy-job slot")
+        status = "error"
+        try:
+            status = _run_script(script_id, job["path"])
+        finally:
+            if job["heavy"]:
+                self._heavy_slots.release()
+            metrics.record(run_metrics, status)
+            logger.info(
+                f"[{script_id}] {trigger} run: {status}, "
+                f"waited {waited:.0f}s, ran {time.monotonic() - t0 - waited:.0f}s"
+            )
+
+    @staticmethod
+    def _record(script_id: str, trigger: str, status: str) -> None:
+        from core import metrics
+        metrics.record(metrics.CycleMetrics(f"job:{script_id}", mode=trigger), status)
+
+
+_executor = JobExecutor()
+
+
+def _make_job(script_id: str):
+    """Return the schedule callback of a script (runs it through the executor)."""
     def job():
-        t = threading.Thread(
-            target=_run_script, args=(script_id, script_path), daemon=True
-        )
-        t.start()
+        _executor.submit(script_id, "schedule")
     return job
 
 
-def _monthly_job(script_id: str, script_path: Path, day: int):
+def _monthly_job(script_id: str, day: int):
     """Wrapper that only executes on the configured day of the month."""
-    inner = _make_job(script_id, script_path)
+    inner = _make_job(script_id)
     def job():
         if datetime.now().day == day:
             logger.info(f"[{script_id}] Monthly trigger — day {day}")
@@ -106,10 +206,29 @@ def _monthly_job(script_id: str, script_path: Path, day: int):
     return job
 
 
+def _dispatch(script_map: dict, script_id: str, command: str) -> None:
+    """Act on one admin command; `script_map` is dict of script_id → Path."""
+    path = script_map.get(script_id)
+    if path is None:
+        return
+
+    if command == "run_now_requested":
+        logger.info(f"[{script_id}] Run-now requested via admin panel")
+        _update_status(script_id, "running")
+        _executor.submit(script_id, "run_now")
+
+    elif command == "stop_requested":
+        # Scheduler scripts are not long-running processes between runs,
+        # so "stop" simply marks them as stopped in DB (skips next scheduled run).
+        logger.info(f"[{script_id}] Stop requested via admin panel — marking stopped")
+        _update_status(script_id, "stopped")
+
+
 def _poll_commands(script_map: dict) -> None:
     """
-    Check Migration.ScriptStatus for run_now_requested / stop_requested commands.
-    `script_map` is dict of script_id → Path.
+    Fallback: act on run_now_requested / stop_requested flags left in
+    Migration.ScriptStatus (written while the scheduler or its control
+    channel was unavailable).
     """
     try:
         conn = _get_conn()
@@ -130,22 +249,7 @@ def _poll_commands(script_map: dict) -> None:
         conn.close()
 
         for row in rows:
-            script_id, command = row[0], row[1]
-            path = script_map.get(script_id)
-            if path is None:
-                continue
-
-            if command == "run_now_requested":
-                logger.info(f"[{script_id}] Run-now requested via admin panel")
-                _update_status(script_id, "running")
-                job = _make_job(script_id, path)
-                job()
-
-            elif command == "stop_requested":
-                # Scheduler scripts are not long-running processes between runs,
-                # so "stop" simply marks them as stopped in DB (skips next scheduled run).
-                logger.info(f"[{script_id}] Stop requested via admin panel — marking stopped")
-                _update_status(script_id, "stopped")
+            _dispatch(script_map, row[0], row[1])
 
     except Exception as e:
         logger.warning(f"Command poll failed: {e}")
@@ -168,19 +272,20 @@ def main() -> None:
         t     = cfg.get("time", "02:00")
 
         script_map[sid] = path
+        _executor.register(cfg)
 
         if stype == "daily":
-            schedule.every().day.at(t).do(_make_job(sid, path))
+            schedule.every().day.at(t).do(_make_job(sid))
             logger.info(f"[{sid}] Scheduled daily at {t}")
 
         elif stype == "weekly":
             weekday = cfg.get("weekday", "sunday")
-            getattr(schedule.every(), weekday).at(t).do(_make_job(sid, path))
+            getattr(schedule.every(), weekday).at(t).do(_make_job(sid))
             logger.info(f"[{sid}] Scheduled weekly on {weekday} at {t}")
 
         elif stype == "monthly":
             day = cfg.get("day", 1)
-            schedule.every().day.at(t).do(_monthly_job(sid, path, day))
+            schedule.every().day.at(t).do(_monthly_job(sid, day))
             logger.info(f"[{sid}] Scheduled monthly on day {day} at {t}")
 
         else:
@@ -188,17 +293,28 @@ def main() -> None:
 
     logger.info(f"Scheduler started — {len(scheduled)} job(s) registered")
 
-    last_poll = 0.0
+    sys.path.insert(0, str(MIGRATION_ROOT))
+    from core.control import FALLBACK_POLL_SECONDS, SCHEDULER_PORT, ControlServer
+
+    control = ControlServer(SCHEDULER_PORT, script_map.keys(), logger=logger)
+    control.start()
+    _poll_commands(script_map)
+    last_poll = time.monotonic()
     try:
         while True:
             schedule.run_pending()
+            # Wait for a command instead of sleeping — it is handled at once
+            command = control.get(timeout=SCHEDULE_TICK)
+            if command is not None:
+                _dispatch(script_map, *command)
             now = time.monotonic()
-            if now - last_poll >= COMMAND_POLL_INTERVAL:
+            if now - last_poll >= FALLBACK_POLL_SECONDS:
                 _poll_commands(script_map)
                 last_poll = now
-            time.sleep(5)
     except KeyboardInterrupt:
         logger.info("Scheduler stopped")
+    finally:
+        control.close()
 
 
 if __name__ == "__main__":
@@ -9,6 +9,16 @@ For scheduled scripts, set:
   time:          "HH:MM"               (daily / weekly / monthly)
   weekday:       "monday"…"sunday"     (weekly only)
   day:           1..28                 (monthly only)
+  heavy:         False                 not counted against MAX_HEAVY_JOBS
+                                       (default True — 1C full syncs)
+  on_overlap:    "skip" | "queue"      schedule trigger while the previous
+                                       run is still going (default "skip")
+
+Downstream dependencies:
+  refreshes:     ["tv_fact_day", ...]  ids from DERIVED_REFRESHES that this
+                                       import feeds; queued by the script,
+                                       run coalesced by runner.py
+                                       (see core/refresh.py)
 """
 
 SCRIPTS = [
@@ -20,6 +30,7 @@ SCRIPTS = [
         "name":             "BOM Copy (1C)",
         "category":         "continuous",
         "script":           "modules/1C/bom/copy_script.py",
+        "refreshes":        ["qc_repainting_bom"],
         "interval_seconds": 86400,
     },
     {
@@ -34,6 +45,7 @@ SCRIPTS = [
         "name":             "Fact Scan Copy (1C)",
         "category":         "continuous",
         "script":           "modules/1C/fact_scan/copy_script.py",
+        "refreshes":        ["tv_fact_day", "tv_fact_takt"],
         "interval_seconds": 60,
     },
     {
@@ -48,6 +60,7 @@ SCRIPTS = [
         "name":             "Materials Move Copy (1C)",
         "category":         "continuous",
         "script":           "modules/1C/materials_move/copy_script.py",
+        "refreshes":        ["qc_defects_movement"],
         "interval_seconds": 600,
     },
     {
@@ -76,6 +89,7 @@ SCRIPTS = [
         "name":             "Plan-Fact Copy (1C)",
         "category":         "continuous",
         "script":           "modules/1C/plan_fact/copy_script.py",
+        "refreshes":        ["tv_plan_base", "tv_order_slots_day", "qc_output_cost"],
         "interval_seconds": 60,
     },
     {
@@ -83,6 +97,7 @@ SCRIPTS = [
         "name":             "Price List Copy (1C)",
         "category":         "continuous",
         "script":           "modules/1C/price_list/copy_script.py",
+        "refreshes":        ["qc_output_cost"],
         "interval_seconds": 86400,
     },
     {
@@ -90,6 +105,7 @@ SCRIPTS = [
         "name":             "QC Cards Copy (1C)",
         "category":         "continuous",
         "script":           "modules/1C/qc_cards/copy_script.py",
+        "refreshes":        ["qc_cards_summary"],
         "interval_seconds": 600,
     },
     {
@@ -97,6 +113,7 @@ SCRIPTS = [
         "name":             "QC Journal Copy (1C)",
         "category":         "continuous",
         "script":           "modules/1C/qc_journal/copy_script.py",
+        "refreshes":        ["qc_lqc_journal"],
         "interval_seconds": 60,
     },
     {
@@ -127,6 +144,7 @@ SCRIPTS = [
         "name":          "BOM Full Sync (1C)",
         "category":      "scheduled",
         "script":        "modules/1C/bom/full_sync_script.py",
+        "refreshes":     ["qc_repainting_bom"],
         "schedule_type": "weekly",
         "weekday":       "sunday",
         "time":          "03:00",
@@ -136,6 +154,7 @@ SCRIPTS = [
         "name":          "Materials Move Full Sync (1C)",
         "category":      "scheduled",
         "script":        "modules/1C/materials_move/full_sync_script.py",
+        "refreshes":     ["qc_defects_movement"],
         "schedule_type": "weekly",
         "weekday":       "sunday",
         "time":          "03:20",
@@ -145,6 +164,7 @@ SCRIPTS = [
         "name":          "QC Journal Full Sync (1C)",
         "category":      "scheduled",
         "script":        "modules/1C/qc_journal/full_sync_script.py",
+        "refreshes":     ["qc_lqc_journal"],
         "schedule_type": "weekly",
         "weekday":       "sunday",
         "time":          "03:40",
@@ -154,6 +174,7 @@ SCRIPTS = [
         "name":          "QC Cards Full Sync (1C)",
         "category":      "scheduled",
         "script":        "modules/1C/qc_cards/full_sync_script.py",
+        "refreshes":     ["qc_cards_summary"],
         "schedule_type": "weekly",
         "weekday":       "sunday",
         "time":          "04:00",
@@ -172,6 +193,7 @@ SCRIPTS = [
         "name":          "Price List Full Sync (1C)",
         "category":      "scheduled",
         "script":        "modules/1C/price_list/full_sync_script.py",
+        "refreshes":     ["qc_output_cost"],
         "schedule_type": "weekly",
         "weekday":       "sunday",
         "time":          "04:40",
@@ -181,6 +203,7 @@ SCRIPTS = [
         "name":          "Plan-Fact Full Sync (1C)",
         "category":      "scheduled",
         "script":        "modules/1C/plan_fact/full_sync_script.py",
+        "refreshes":     ["tv_plan_base", "tv_order_slots_day", "qc_output_cost"],
         "schedule_type": "weekly",
         "weekday":       "sunday",
         "time":          "05:00",
@@ -190,6 +213,7 @@ SCRIPTS = [
         "name":          "Fact Scan Full Sync (1C)",
         "category":      "scheduled",
         "script":        "modules/1C/fact_scan/full_sync_script.py",
+        "refreshes":     ["tv_fact_day", "tv_fact_takt"],
         "schedule_type": "weekly",
         "weekday":       "sunday",
         "time":          "05:20",
@@ -240,6 +264,7 @@ SCRIPTS = [
         "script":           "modules/MES/oee_mould/copy_script.py",
         "schedule_type":    "daily",
         "time":             "00:30",
+        "heavy":            False,
     },
     {
         "id":               "mes_oee_mould_1230",
@@ -248,5 +273,60 @@ SCRIPTS = [
         "script":           "modules/MES/oee_mould/copy_script.py",
         "schedule_type":    "daily",
         "time":             "12:30",
+        "heavy":            False,
+    },
+]
+
+
+# ── Derived refreshes (downstream of the imports above) ───────────────────────
+# Run by runner.py once per burst of imports (core/refresh.py).  Listed in
+# execution order; per_date refreshes take @date and run once per queued date,
+# or — with exec_dates — once for all queued dates (JSON array, set-based;
+# sql/tv_cache_refresh_dates.sql).
+
+DERIVED_REFRESHES = [
+    {
+        "id":         "tv_plan_base",
+        "exec":       "EXEC Production_TV.sp_Refresh_Cache_Plan_Base @date = ?",
+        "exec_dates": "EXEC Production_TV.sp_Refresh_Cache_Plan_Base_Dates @DatesJson = ?",
+        "per_date":   True,
+    },
+    {
+        "id":         "tv_order_slots_day",
+        "exec":       "EXEC Production_TV.sp_Refresh_Cache_OrderSlots_Day @date = ?",
+        "exec_dates": "EXEC Production_TV.sp_Refresh_Cache_OrderSlots_Day_Dates @DatesJson = ?",
+        "per_date":   True,
+    },
+    {
+        "id":         "tv_fact_day",
+        "exec":       "EXEC Production_TV.sp_Refresh_Cache_Fact_Day @date = ?",
+        "exec_dates": "EXEC Production_TV.sp_Refresh_Cache_Fact_Day_Dates @DatesJson = ?",
+        "per_date":   True,
+    },
+    {
+        "id":         "tv_fact_takt",
+        "exec":       "EXEC Production_TV.sp_Refresh_Cache_Fact_Takt @date = ?",
+        "exec_dates": "EXEC Production_TV.sp_Refresh_Cache_Fact_Takt_Dates @DatesJson = ?",
+        "per_date":   True,
+    },
+    {
+        "id":       "qc_output_cost",
+        "exec":     "EXEC QC.sp_Refresh_Production_Output_Cost",
+    },
+    {
+        "id":       "qc_cards_summary",
+        "exec":     "EXEC QC.sp_Refresh_QC_Cards_Summary",
+    },
+    {
+        "id":       "qc_lqc_journal",
+        "exec":     "EXEC QC.sp_Refresh_LQC_Journal",
+    },
+    {
+        "id":       "qc_defects_movement",
+        "exec":     "EXEC QC.sp_Refresh_Defects_Movement",
+    },
+    {
+        "id":       "qc_repainting_bom",
+        "exec":     "EXEC QC.sp_Refresh_QC_Repainting_Bom",
     },
 ]
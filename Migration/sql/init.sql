@@ -51,3 +51,148 @@ BEGIN
     PRINT 'Table Migration.ScriptStatus already exists.';
 END
 GO
+
+-- 3. Create high-water mark table for incremental (CDC) sync
+--    One row per (script, source): RowVersionMark for 1C rowversion
+--    (_Version) sources, PeriodMark for period/date-column sources.
+IF NOT EXISTS (
+    SELECT 1
+    FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_SCHEMA = 'Migration'
+      AND TABLE_NAME   = 'SyncWatermark'
+)
+BEGIN
+    CREATE TABLE Migration.SyncWatermark (
+        ScriptID          NVARCHAR(100)   NOT NULL,
+        SourceName        NVARCHAR(128)   NOT NULL,           -- source table / logical source
+        RowVersionMark    BINARY(8)       NULL,               -- MIN_ACTIVE_ROWVERSION() at read time
+        PeriodMark        DATETIME2(0)    NULL,               -- last period value read
+        UpdatedAt         DATETIME        NOT NULL DEFAULT GETDATE(),
+
+        CONSTRAINT PK_Migration_SyncWatermark PRIMARY KEY (ScriptID, SourceName)
+    );
+
+    PRINT 'Table Migration.SyncWatermark created.';
+END
+ELSE
+BEGIN
+    PRINT 'Table Migration.SyncWatermark already exists.';
+END
+GO
+
+-- 4. Create queue of downstream refreshes (derived caches)
+--    Imports insert requests in their data transaction; runner.py runs each
+--    refresh once per burst and deletes the rows (see core/refresh.py).
+IF NOT EXISTS (
+    SELECT 1
+    FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_SCHEMA = 'Migration'
+      AND TABLE_NAME   = 'RefreshQueue'
+)
+BEGIN
+    CREATE TABLE Migration.RefreshQueue (
+        QueueID           BIGINT IDENTITY(1,1) NOT NULL,
+        RefreshID         NVARCHAR(100)   NOT NULL,           -- DERIVED_REFRESHES id
+        RefreshDate       DATE            NULL,               -- NULL for whole-table refreshes
+        RequestedBy       NVARCHAR(100)   NULL,               -- ScriptID of the import
+        RequestedAt       DATETIME2(3)    NOT NULL DEFAULT SYSDATETIME(),
+
+        CONSTRAINT PK_Migration_RefreshQueue PRIMARY KEY (QueueID)
+    );
+
+    CREATE INDEX IX_Migration_RefreshQueue_RefreshID
+        ON Migration.RefreshQueue (RefreshID, QueueID) INCLUDE (RefreshDate, RequestedAt);
+
+    PRINT 'Table Migration.RefreshQueue created.';
+END
+ELSE
+BEGIN
+    PRINT 'Table Migration.RefreshQueue already exists.';
+END
+GO
+
+-- 5. Create per-cycle telemetry table
+--    One row per cycle (or per downstream refresh run, ScriptID 'refresh:<id>',
+--    or per scheduler run, ScriptID 'job:<id>'):
+--    phase timings in ms (NULL = phase not run), rows and estimated bytes
+--    fetched from the source.  Written in batches by core/metrics.py.
+IF NOT EXISTS (
+    SELECT 1
+    FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_SCHEMA = 'Migration'
+      AND TABLE_NAME   = 'CycleMetrics'
+)
+BEGIN
+    CREATE TABLE Migration.CycleMetrics (
+        MetricID          BIGINT IDENTITY(1,1) NOT NULL,
+        ScriptID          NVARCHAR(100)   NOT NULL,
+        CycleNo           INT             NOT NULL,
+        Mode              NVARCHAR(20)    NOT NULL,           -- 'full' | 'incremental'
+        Status            NVARCHAR(20)    NOT NULL,           -- 'success' | 'error'
+        StartedAt         DATETIME2(3)    NOT NULL,
+        DurationMs        INT             NOT NULL,
+        Records           INT             NOT NULL DEFAULT 0,
+        RowsFetched       INT             NOT NULL DEFAULT 0,
+        BytesFetched      BIGINT          NOT NULL DEFAULT 0,
+        SourceQueryMs     INT             NULL,
+        TransformMs       INT             NULL,
+        StagingInsertMs   INT             NULL,
+        ApplockWaitMs     INT             NULL,
+        SnapshotSwitchMs  INT             NULL,
+        RefreshMs         INT             NULL,
+        QueueWaitMs       INT             NULL,           -- scheduler 'job:<id>' rows
+
+        CONSTRAINT PK_Migration_CycleMetrics PRIMARY KEY (MetricID)
+    );
+
+    CREATE INDEX IX_Migration_CycleMetrics_Script_Started
+        ON Migration.CycleMetrics (ScriptID, StartedAt);
+
+    PRINT 'Table Migration.CycleMetrics created.';
+END
+ELSE
+BEGIN
+    PRINT 'Table Migration.CycleMetrics already exists.';
+END
+GO
+
+IF COL_LENGTH('Migration.CycleMetrics', 'QueueWaitMs') IS NULL
+BEGIN
+    ALTER TABLE Migration.CycleMetrics ADD QueueWaitMs INT NULL;
+    PRINT 'Column Migration.CycleMetrics.QueueWaitMs added.';
+END
+GO
+
+-- 6. Create progress table of partitioned full syncs
+--    One row per date partition of the running full sync of a script
+--    (see core/partition.py).  CompletedAt is set in the transaction that
+--    commits the partition's staging rows; a failed run keeps its rows and
+--    the next run resumes the missing partitions under the same SnapshotID.
+--    Rows are deleted when the snapshot is switched.
+IF NOT EXISTS (
+    SELECT 1
+    FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_SCHEMA = 'Migration'
+      AND TABLE_NAME   = 'FullSyncPartition'
+)
+BEGIN
+    CREATE TABLE Migration.FullSyncPartition (
+        ScriptID          NVARCHAR(100)    NOT NULL,
+        PartitionNo       INT              NOT NULL,
+        SnapshotID        UNIQUEIDENTIFIER NOT NULL,
+        DateFrom          DATE             NOT NULL,           -- inclusive, real dates
+        DateTo            DATE             NOT NULL,           -- inclusive
+        RunStartedAt      DATETIME2(0)     NOT NULL DEFAULT SYSDATETIME(),
+        CompletedAt       DATETIME2(0)     NULL,               -- NULL = not loaded yet
+        RowsLoaded        INT              NULL,
+
+        CONSTRAINT PK_Migration_FullSyncPartition PRIMARY KEY (ScriptID, PartitionNo)
+    );
+
+    PRINT 'Table Migration.FullSyncPartition created.';
+END
+ELSE
+BEGIN
+    PRINT 'Table Migration.FullSyncPartition already exists.';
+END
+GO
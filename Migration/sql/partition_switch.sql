@@ -0,0 +1,155 @@
+-- Migration/sql/partition_switch.sql
+-- Optional: day partitioning of Import_1C tables for the partition-switch
+-- mode of the copy scripts (core/switch.py).  Instead of
+--   DELETE FROM target WHERE SnapshotID = ? AND OnlyDate BETWEEN ... + sp_SwitchSnapshot_*
+-- a cycle switches only the changed day partitions in and out (metadata only).
+--
+-- Run in a maintenance window on the target (WeChat_APP) database, with the
+-- copy and full-sync scripts of the table stopped: partitioning rebuilds the
+-- table and all its indexes.  The scripts detect the objects on their own
+-- and fall back to the DELETE path while they are missing.
+-- Safe to run multiple times (IF NOT EXISTS guards).
+-- ============================================================
+
+-- 1. Partition function and scheme: one partition per day (RANGE RIGHT)
+--    from 2025-01-01 to today + 30 days.  Later days are added by the
+--    scripts (core/switch.ensure_boundaries) by splitting the empty last
+--    partition.
+IF NOT EXISTS (SELECT 1 FROM sys.partition_functions WHERE name = 'pf_Import1C_Day')
+BEGIN
+    CREATE PARTITION FUNCTION pf_Import1C_Day (DATE) AS RANGE RIGHT FOR VALUES ('2025-01-01');
+    CREATE PARTITION SCHEME ps_Import1C_Day AS PARTITION pf_Import1C_Day ALL TO ([PRIMARY]);
+
+    DECLARE @d DATE = '2025-01-01',
+            @to DATE = DATEADD(DAY, 30, CAST(SYSDATETIME() AS date));
+    WHILE @d < @to
+    BEGIN
+        SET @d = DATEADD(DAY, 1, @d);
+        ALTER PARTITION SCHEME ps_Import1C_Day NEXT USED [PRIMARY];
+        ALTER PARTITION FUNCTION pf_Import1C_Day() SPLIT RANGE (@d);
+    END
+
+    PRINT 'Partition function pf_Import1C_Day / scheme ps_Import1C_Day created.';
+END
+ELSE
+BEGIN
+    PRINT 'Partition function pf_Import1C_Day already exists.';
+END
+GO
+
+-- 2. Procedure that partitions one table by a DATE column:
+--      - creates the empty clones <table>_SwitchIn / <table>_SwitchOut;
+--      - rebuilds the table and every index on ps_Import1C_Day (a heap gets
+--        a clustered index on the date column; unique indexes get the date
+--        column appended to the key, as SQL Server requires for aligned
+--        unique indexes);
+--      - creates the same indexes on both clones (SWITCH needs identical
+--        structure).
+--    Primary keys / unique constraints are not handled — realign them
+--    manually first.
+CREATE OR ALTER PROC Migration.sp_PartitionByDay
+    @Table      SYSNAME,      -- e.g. 'Import_1C.FactScan_OnAssembly'
+    @DateColumn SYSNAME       -- DATE column to partition on
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @obj INT = OBJECT_ID(@Table);
+    IF @obj IS NULL
+        THROW 52201, 'Table not found', 1;
+    IF NOT EXISTS (SELECT 1 FROM sys.columns
+                   WHERE object_id = @obj AND name = @DateColumn
+                     AND TYPE_NAME(system_type_id) = 'date')
+        THROW 52202, 'Date column not found or not of type DATE', 1;
+    IF EXISTS (SELECT 1 FROM sys.indexes
+               WHERE object_id = @obj AND (is_primary_key = 1 OR is_unique_constraint = 1))
+        THROW 52203, 'Primary key / unique constraint present — realign it manually first', 1;
+
+    DECLARE @schema SYSNAME = OBJECT_SCHEMA_NAME(@obj),
+            @name   SYSNAME = OBJECT_NAME(@obj);
+    DECLARE @full NVARCHAR(300) = QUOTENAME(@schema) + N'.' + QUOTENAME(@name),
+            @on   NVARCHAR(300) = N' ON ps_Import1C_Day (' + QUOTENAME(@DateColumn) + N')';
+
+    IF EXISTS (SELECT 1 FROM sys.indexes i
+               JOIN sys.partition_schemes ps ON ps.data_space_id = i.data_space_id
+               WHERE i.object_id = @obj AND i.index_id IN (0, 1) AND ps.name = 'ps_Import1C_Day')
+       AND OBJECT_ID(@full + N'_SwitchIn') IS NOT NULL
+       AND OBJECT_ID(@full + N'_SwitchOut') IS NOT NULL
+    BEGIN
+        PRINT @Table + ' is already partitioned by day.';
+        RETURN;
+    END
+
+    DECLARE @tables TABLE (ord INT, tbl NVARCHAR(300), is_target BIT);
+    INSERT @tables VALUES
+        (1, @full, 1),
+        (2, QUOTENAME(@schema) + N'.' + QUOTENAME(@name + N'_SwitchIn'), 0),
+        (3, QUOTENAME(@schema) + N'.' + QUOTENAME(@name + N'_SwitchOut'), 0);
+
+    -- Index definitions of the table
+    DECLARE @idx TABLE (
+        index_id INT, name SYSNAME, is_unique BIT, type TINYINT, filter NVARCHAR(MAX),
+        keys NVARCHAR(MAX), incl NVARCHAR(MAX), has_date BIT, is_new BIT
+    );
+    INSERT @idx
+    SELECT i.index_id, i.name, i.is_unique, i.type, i.filter_definition,
+           STRING_AGG(CASE WHEN ic.is_included_column = 0
+                           THEN QUOTENAME(c.name) + CASE WHEN ic.is_descending_key = 1 THEN N' DESC' ELSE N'' END
+                      END, N', ') WITHIN GROUP (ORDER BY ic.key_ordinal),
+           STRING_AGG(CASE WHEN ic.is_included_column = 1 THEN QUOTENAME(c.name) END, N', '),
+           MAX(CASE WHEN ic.is_included_column = 0 AND c.name = @DateColumn THEN 1 ELSE 0 END),
+           0
+    FROM sys.indexes i
+    JOIN sys.index_columns ic ON ic.object_id = i.object_id AND ic.index_id = i.index_id
+    JOIN sys.columns c        ON c.object_id = ic.object_id AND c.column_id = ic.column_id
+    WHERE i.object_id = @obj AND i.type IN (1, 2)
+    GROUP BY i.index_id, i.name, i.is_unique, i.type, i.filter_definition;
+
+    IF NOT EXISTS (SELECT 1 FROM @idx WHERE type = 1)
+        INSERT @idx VALUES (1, N'CIX_' + @name + N'_' + @DateColumn, 0, 1, NULL,
+                            QUOTENAME(@DateColumn), NULL, 1, 1);
+
+    -- Empty clones with the same columns
+    DECLARE @sql NVARCHAR(MAX);
+    SELECT @sql = STRING_AGG(CAST(N'SELECT TOP (0) * INTO ' + tbl + N' FROM ' + @full + N';' AS NVARCHAR(MAX)), N' ')
+    FROM @tables WHERE is_target = 0 AND OBJECT_ID(tbl) IS NULL;
+    IF @sql IS NOT NULL
+        EXEC sp_executesql @sql;
+
+    -- Clustered first, then nonclustered; the table itself is rebuilt in place
+    DECLARE @ddl TABLE (ord INT IDENTITY(1,1), stmt NVARCHAR(MAX));
+    INSERT @ddl (stmt)
+    SELECT N'CREATE ' + CASE WHEN x.is_unique = 1 THEN N'UNIQUE ' ELSE N'' END
+         + CASE WHEN x.type = 1 THEN N'CLUSTERED' ELSE N'NONCLUSTERED' END
+         + N' INDEX ' + QUOTENAME(x.name) + N' ON ' + t.tbl
+         + N' (' + x.keys
+         + CASE WHEN x.is_unique = 1 AND x.has_date = 0 THEN N', ' + QUOTENAME(@DateColumn) ELSE N'' END
+         + N')'
+         + ISNULL(N' INCLUDE (' + x.incl + N')', N'')
+         + ISNULL(N' WHERE ' + x.filter, N'')
+         + CASE WHEN t.is_target = 1 AND x.is_new = 0 THEN N' WITH (DROP_EXISTING = ON)' ELSE N'' END
+         + @on
+    FROM @tables t
+    CROSS JOIN @idx x
+    WHERE t.is_target = 1
+       OR NOT EXISTS (SELECT 1 FROM sys.indexes WHERE object_id = OBJECT_ID(t.tbl) AND name = x.name)
+    ORDER BY t.ord, x.type, x.index_id;
+
+    DECLARE @i INT = 1, @n INT = (SELECT COUNT(*) FROM @ddl), @stmt NVARCHAR(MAX);
+    WHILE @i <= @n
+    BEGIN
+        SELECT @stmt = stmt FROM @ddl WHERE ord = @i;
+        PRINT @stmt;
+        EXEC sp_executesql @stmt;
+        SET @i += 1;
+    END
+
+    PRINT @Table + ' partitioned by ' + @DateColumn + '.';
+END
+GO
+
+-- 3. Tables in partition-switch mode
+--    Import_1C.FactScan_OnAssembly — OnlyDate (fact_scan/copy_script.py)
+EXEC Migration.sp_PartitionByDay @Table = 'Import_1C.FactScan_OnAssembly', @DateColumn = 'OnlyDate';
+GO
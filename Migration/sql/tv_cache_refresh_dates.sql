@@ -0,0 +1,318 @@
+-- Migration/sql/tv_cache_refresh_dates.sql
+-- Set-based variants of the Production_TV cache refreshes.
+--
+-- Each *_Dates procedure takes @DatesJson — a JSON array of 'YYYY-MM-DD'
+-- strings — and rebuilds all listed dates in one pass (one DELETE + one
+-- INSERT per cache) instead of one procedure call per date.  Results are
+-- the same as calling the per-date procedure for every date; the per-date
+-- procedures stay in place for the TV admin tools.
+--
+-- Called by the migration refresh coordinator (core/refresh.py) through
+-- "exec_dates" in scripts_config.DERIVED_REFRESHES.
+--
+-- Safe to run multiple times (CREATE OR ALTER).
+-- ============================================================
+
+-- 1. Cache_Status for many dates at once
+CREATE OR ALTER PROCEDURE Production_TV.sp_Update_Cache_Status_Dates
+  @Layer     sysname,
+  @DatesJson nvarchar(max)
+AS
+BEGIN
+  SET NOCOUNT ON;
+
+  DECLARE @Dates TABLE (OnlyDate date PRIMARY KEY);
+  INSERT INTO @Dates (OnlyDate)
+  SELECT DISTINCT CAST([value] AS date) FROM OPENJSON(@DatesJson);
+
+  DECLARE @Counts TABLE (OnlyDate date PRIMARY KEY, Cnt bigint NOT NULL);
+
+  IF @Layer = N'WorkingSpans'
+    INSERT INTO @Counts SELECT d.OnlyDate, (SELECT COUNT(*) FROM Production_TV.Cache_WorkingSpans_Day c WHERE c.OnlyDate = d.OnlyDate) FROM @Dates d;
+  ELSE IF @Layer = N'PlanBase'
+    INSERT INTO @Counts SELECT d.OnlyDate, (SELECT COUNT(*) FROM Production_TV.Cache_Plan_Base c WHERE c.OnlyDate = d.OnlyDate) FROM @Dates d;
+  ELSE IF @Layer = N'OrderSlots'
+    INSERT INTO @Counts SELECT d.OnlyDate, (SELECT COUNT(*) FROM Production_TV.Cache_OrderSlots c WHERE c.OnlyDate = d.OnlyDate) FROM @Dates d;
+  ELSE IF @Layer = N'FactDay'
+    INSERT INTO @Counts SELECT d.OnlyDate, (SELECT COUNT(*) FROM Production_TV.Cache_Fact_Day c WHERE c.OnlyDate = d.OnlyDate) FROM @Dates d;
+  ELSE IF @Layer = N'FactTakt'
+    INSERT INTO @Counts SELECT d.OnlyDate, (SELECT COUNT(*) FROM Production_TV.Cache_Fact_Takt c WHERE c.OnlyDate = d.OnlyDate) FROM @Dates d;
+  ELSE
+    RAISERROR('Unknown layer: %s', 16, 1, @Layer);
+
+  MERGE Production_TV.Cache_Status AS tgt
+  USING (SELECT @Layer AS [Layer], OnlyDate, Cnt FROM @Counts) AS src
+     ON tgt.[Layer] = src.[Layer] AND tgt.OnlyDate = src.OnlyDate
+  WHEN MATCHED THEN
+    UPDATE SET LastRefreshedAt = SYSDATETIME(), [RowCount] = src.Cnt
+  WHEN NOT MATCHED THEN
+    INSERT ([Layer], OnlyDate, LastRefreshedAt, [RowCount])
+    VALUES (src.[Layer], src.OnlyDate, SYSDATETIME(), src.Cnt);
+END;
+GO
+
+-- 2. Plan base (as sp_Refresh_Cache_Plan_Base)
+CREATE OR ALTER PROCEDURE Production_TV.sp_Refresh_Cache_Plan_Base_Dates
+  @DatesJson nvarchar(max)
+AS
+BEGIN
+  SET NOCOUNT ON;
+  SET XACT_ABORT ON;
+
+  CREATE TABLE #Dates (OnlyDate date PRIMARY KEY);
+  INSERT INTO #Dates (OnlyDate)
+  SELECT DISTINCT CAST([value] AS date) FROM OPENJSON(@DatesJson);
+
+  BEGIN TRAN;
+
+  SELECT DISTINCT
+      d.OnlyDate,
+      d.WorkShopName_CH       AS WorkShopID,
+      d.WorkCenter_Custom_CN  AS WorkCenterID,
+      d.Line_No,
+      d.OrderNumber,
+      d.NomenclatureNumber,
+      d.ProductName_CN,
+      CAST(d.Plan_QTY      AS decimal(18,4)) AS Plan_QTY,
+      CAST(d.PlanRealHours AS decimal(18,4)) AS PlanRealHours,
+      UPPER(REPLACE(REPLACE(REPLACE(REPLACE(LTRIM(RTRIM(d.OrderNumber))        ,' ',''),NCHAR(160),''),CHAR(9),''),CHAR(13),'')) AS NormOrder,
+      UPPER(REPLACE(REPLACE(REPLACE(REPLACE(LTRIM(RTRIM(d.NomenclatureNumber)) ,' ',''),NCHAR(160),''),CHAR(9),''),CHAR(13),'')) AS NormArticle
+  INTO #Plan
+  FROM Views_For_Plan.DailyPlan_CustomWS d
+  JOIN #Dates x
+    ON x.OnlyDate = d.OnlyDate
+  JOIN Production_TV.Workshops_Allowlist wa
+    ON wa.IsEnabled = 1
+   AND wa.WorkShopID = d.WorkShopName_CH
+  WHERE d.Line_No IS NOT NULL;
+
+  DELETE c
+  FROM Production_TV.Cache_Plan_Base c
+  JOIN #Dates x ON x.OnlyDate = c.OnlyDate;
+
+  INSERT INTO Production_TV.Cache_Plan_Base
+      (OnlyDate, WorkShopID, WorkCenterID, Line_No, OrderNumber, NomenclatureNumber,
+       ProductName_CN, Plan_QTY, PlanRealHours, NormOrder, NormArticle)
+  SELECT OnlyDate, WorkShopID, WorkCenterID, Line_No, OrderNumber, NomenclatureNumber,
+         ProductName_CN, Plan_QTY, PlanRealHours, NormOrder, NormArticle
+  FROM #Plan;
+
+  COMMIT;
+
+  EXEC Production_TV.sp_Update_Cache_Status_Dates N'PlanBase', @DatesJson;
+END;
+GO
+
+-- 3. Order slots (as sp_Refresh_Cache_OrderSlots_Day)
+CREATE OR ALTER PROCEDURE Production_TV.sp_Refresh_Cache_OrderSlots_Day_Dates
+  @DatesJson nvarchar(max)
+AS
+BEGIN
+  SET NOCOUNT ON;
+  SET XACT_ABORT ON;
+
+  CREATE TABLE #Dates (OnlyDate date PRIMARY KEY);
+  INSERT INTO #Dates (OnlyDate)
+  SELECT DISTINCT CAST([value] AS date) FROM OPENJSON(@DatesJson);
+
+  BEGIN TRAN;
+
+  DELETE c
+  FROM Production_TV.Cache_OrderSlots c
+  JOIN #Dates x ON x.OnlyDate = c.OnlyDate;
+
+  -- every (date, workshop, work center) with working spans on that date
+  ;WITH Pairs AS (
+    SELECT DISTINCT ws.OnlyDate, ws.WorkShopID, ws.WorkCenterID
+    FROM Production_TV.Cache_WorkingSpans_Day ws
+    JOIN #Dates x ON x.OnlyDate = ws.OnlyDate
+  )
+  INSERT INTO Production_TV.Cache_OrderSlots
+    (OnlyDate, WorkShopID, WorkCenterID, Line_No,
+     OrderNumber, NomenclatureNumber, NormOrder, NormArticle,
+     Plan_QTY, PlanRealHours, SlotStart, SlotEnd)
+  SELECT
+     p.OnlyDate,
+     s.WorkShopID, s.WorkCenterID, s.Line_No,
+     s.OrderNumber, s.NomenclatureNumber, s.NormOrder, s.NormArticle,
+     s.Plan_QTY, s.PlanRealHours, s.SlotStart, s.SlotEnd
+  FROM Pairs p
+  CROSS APPLY Production_TV.fn_OrderSlots_Cyclic(p.OnlyDate, p.WorkShopID, p.WorkCenterID) AS s;
+
+  COMMIT;
+
+  EXEC Production_TV.sp_Update_Cache_Status_Dates N'OrderSlots', @DatesJson;
+END;
+GO
+
+-- 4. Fact per day (as sp_Refresh_Cache_Fact_Day)
+CREATE OR ALTER PROCEDURE Production_TV.sp_Refresh_Cache_Fact_Day_Dates
+  @DatesJson nvarchar(max)
+AS
+BEGIN
+  SET NOCOUNT ON;
+  SET XACT_ABORT ON;
+
+  CREATE TABLE #Dates (OnlyDate date PRIMARY KEY);
+  INSERT INTO #Dates (OnlyDate)
+  SELECT DISTINCT CAST([value] AS date) FROM OPENJSON(@DatesJson);
+
+  BEGIN TRAN;
+
+  SELECT
+      f.OnlyDate,
+      f.WorkCenter_CN                       AS WorkCenterID,
+      COALESCE(f.NormOrder,   N'__NULL__')  AS NormOrder,
+      COALESCE(f.NormArticle, N'__NULL__')  AS NormArticle,
+      SUM(f.Scan_QTY)                        AS FactQtyDay,
+      MAX(LTRIM(RTRIM(f.OrderNumber)))       AS OrderNumberRaw,
+      MAX(LTRIM(RTRIM(f.NomenclatureNumber)))AS ArticleNumberRaw
+  INTO #FactDay
+  FROM Import_1C.vw_FactScan_OnAssembly_Current f
+  JOIN #Dates x ON x.OnlyDate = f.OnlyDate
+  WHERE f.WorkCenter_CN IS NOT NULL
+  GROUP BY
+      f.OnlyDate,
+      f.WorkCenter_CN,
+      COALESCE(f.NormOrder,   N'__NULL__'),
+      COALESCE(f.NormArticle, N'__NULL__');
+
+  DELETE c
+  FROM Production_TV.Cache_Fact_Day c
+  JOIN #Dates x ON x.OnlyDate = c.OnlyDate;
+
+  INSERT INTO Production_TV.Cache_Fact_Day
+      (OnlyDate, WorkCenterID, NormOrder, NormArticle, FactQtyDay, OrderNumberRaw, ArticleNumberRaw)
+  SELECT OnlyDate, WorkCenterID, NormOrder, NormArticle, FactQtyDay, OrderNumberRaw, ArticleNumberRaw
+  FROM #FactDay;
+
+  COMMIT;
+
+  EXEC Production_TV.sp_Update_Cache_Status_Dates N'FactDay', @DatesJson;
+END;
+GO
+
+-- 5. Fact takt (as sp_Refresh_Cache_Fact_Takt)
+CREATE OR ALTER PROCEDURE Production_TV.sp_Refresh_Cache_Fact_Takt_Dates
+  @DatesJson nvarchar(max)
+AS
+BEGIN
+  SET NOCOUNT ON;
+  SET XACT_ABORT ON;
+
+  CREATE TABLE #Dates (OnlyDate date PRIMARY KEY);
+  INSERT INTO #Dates (OnlyDate)
+  SELECT DISTINCT CAST([value] AS date) FROM OPENJSON(@DatesJson);
+
+  BEGIN TRAN;
+
+  -- 1) working spans of the dates
+  SELECT
+      ws.OnlyDate,
+      ws.WorkShopID,
+      ws.WorkCenterID,
+      ws.SpanStart,
+      ws.SpanEnd
+  INTO #Spans
+  FROM Production_TV.Cache_WorkingSpans_Day ws
+  JOIN #Dates x ON x.OnlyDate = ws.OnlyDate;
+
+  CREATE CLUSTERED INDEX IX_Spans ON #Spans (OnlyDate, WorkCenterID, SpanStart);
+
+  -- 2) scans inside the spans
+  SELECT
+      s.OnlyDate,
+      s.WorkShopID,
+      s.WorkCenterID,
+      COALESCE(f.NormOrder,   N'__NULL__') AS NormOrder,
+      COALESCE(f.NormArticle, N'__NULL__') AS NormArticle,
+      f.ScanMinute,
+      f.Scan_QTY
+  INTO #FactInSpans
+  FROM #Spans s
+  JOIN Import_1C.vw_FactScan_OnAssembly_Current f
+    ON f.WorkCenter_CN = s.WorkCenterID
+   AND f.OnlyDate      = s.OnlyDate
+   AND f.ScanMinute   >= s.SpanStart
+   AND f.ScanMinute   <  s.SpanEnd;
+
+  -- 3) aggregates per group
+  SELECT
+      OnlyDate,
+      WorkShopID,
+      WorkCenterID,
+      NormOrder,
+      NormArticle,
+      MIN(ScanMinute) AS FirstValidMinute,
+      MAX(ScanMinute) AS LastValidMinute,
+      SUM(Scan_QTY)   AS ValidQty
+  INTO #Agg
+  FROM #FactInSpans
+  GROUP BY
+      OnlyDate,
+      WorkShopID,
+      WorkCenterID,
+      NormOrder,
+      NormArticle;
+
+  -- 4) working seconds within the spans
+  SELECT
+      a.OnlyDate,
+      a.WorkShopID,
+      a.WorkCenterID,
+      a.NormOrder,
+      a.NormArticle,
+      a.FirstValidMinute,
+      a.LastValidMinute,
+      a.ValidQty,
+      SUM(
+          DATEDIFF(
+              SECOND,
+              CASE WHEN s.SpanStart > a.FirstValidMinute THEN s.SpanStart ELSE a.FirstValidMinute END,
+              CASE WHEN s.SpanEnd   < a.LastValidMinute  THEN s.SpanEnd   ELSE a.LastValidMinute  END
+          )
+      ) AS WorkSecBetweenScans
+  INTO #WorkSec
+  FROM #Agg a
+  JOIN #Spans s
+    ON s.OnlyDate     = a.OnlyDate
+   AND s.WorkShopID   = a.WorkShopID
+   AND s.WorkCenterID = a.WorkCenterID
+   AND s.SpanEnd   > a.FirstValidMinute
+   AND s.SpanStart < a.LastValidMinute
+  GROUP BY
+      a.OnlyDate,
+      a.WorkShopID,
+      a.WorkCenterID,
+      a.NormOrder,
+      a.NormArticle,
+      a.FirstValidMinute,
+      a.LastValidMinute,
+      a.ValidQty;
+
+  -- 5) rewrite the cache
+  DELETE c
+  FROM Production_TV.Cache_Fact_Takt c
+  JOIN #Dates x ON x.OnlyDate = c.OnlyDate;
+
+  INSERT INTO Production_TV.Cache_Fact_Takt
+  (OnlyDate, WorkShopID, WorkCenterID, NormOrder, NormArticle,
+   FirstValidMinute, LastValidMinute, ValidQty, WorkSecBetweenScans, TaktFactSec)
+  SELECT
+      OnlyDate,
+      WorkShopID,
+      WorkCenterID,
+      NormOrder,
+      NormArticle,
+      FirstValidMinute,
+      LastValidMinute,
+      ValidQty,
+      WorkSecBetweenScans,
+      CAST(ROUND(CAST(WorkSecBetweenScans AS float) / NULLIF(ValidQty,0), 2) AS decimal(10,2))
+  FROM #WorkSec;
+
+  COMMIT;
+
+  EXEC Production_TV.sp_Update_Cache_Status_Dates N'FactTakt', @DatesJson;
+END;
+GO